@@ -1,32 +1,47 @@
 # ai_comparison.py
 
+import asyncio
+import json
 import os
-from openai import OpenAI
+import random
+import re
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
 
+# openai (un httpx/pydantic modeļi) tiek importēts pirmajā AI izsaukumā, nevis servera startā
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
-class AIComparisonEngine:
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
+import metrics
+from chunking import chunk_text, count_tokens
+from llm_cache import LLMResponseCache, llm_cache
+from rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE, scheduler
+from retrieval import CandidateIndex, requirement_queries
+from workers import run_io
 
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY is missing!")
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+AI_MODEL = os.getenv("AI_MODEL", "gpt-4o-mini")
+# auto – map-reduce tikai tad, ja teksti neietilpst vienā pieprasījumā
+AI_COMPARE_MODE = os.getenv("AI_COMPARE_MODE", "auto")
+AI_SINGLE_PROMPT_MAX_TOKENS = int(os.getenv("AI_SINGLE_PROMPT_MAX_TOKENS", "24000"))
+AI_MAP_CHUNK_TOKENS = int(os.getenv("AI_MAP_CHUNK_TOKENS", "3000"))
+# Kandidāta teksts, kas lielāks par šo, pieprasījumā nonāk tikai kā atlasīti fragmenti
+AI_CANDIDATE_CONTEXT_TOKENS = int(os.getenv("AI_CANDIDATE_CONTEXT_TOKENS", "6000"))
+# Vienlaicīgi OpenAI pieprasījumi no šī procesa (visi salīdzinājumi kopā)
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "32"))
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "60"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "5"))
+AI_BACKOFF_BASE = float(os.getenv("AI_BACKOFF_BASE", "1.0"))
+AI_BACKOFF_MAX = float(os.getenv("AI_BACKOFF_MAX", "30"))
+# Atbildes tokenu novērtējums TPM plānotājam (pēc atbildes tiek izlīdzināts ar usage)
+AI_EXPECTED_OUTPUT_TOKENS = int(os.getenv("AI_EXPECTED_OUTPUT_TOKENS", "700"))
 
-        # Pareizi! Jaunajai OpenAI bibliotēkai nedrīkst dot 'proxies'
-        self.client = OpenAI(api_key=api_key)
+COMPARE_MODES = ("auto", "single", "map_reduce")
 
-    # Vienkārša testa funkcija
-    def test(self):
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "user", "content": "Hello, test successful?"}
-            ]
-        )
-        return response.choices[0].message["content"]
+EventFn = Callable[[Dict[str, Any]], None]
+SYSTEM_PROMPT = "You analyze tender documents."
 
-    # Galvenais salīdzināšanas modulis
-    def compare(self, tender_rules_text, candidate_text):
-        prompt = f"""
+SINGLE_PROMPT = """
 You are an AI expert for procurement document analysis.
 Compare candidate submission with tender rules.
 
@@ -44,12 +59,634 @@ Return structured JSON with fields:
 - final_score: 0-100
 """
 
+MAP_PROMPT = """
+You are an AI expert for procurement document analysis.
+Below is ONE SECTION of the tender rules and the most relevant parts of the
+candidate submission. Evaluate the candidate only against the requirements
+in this section.
+
+Tender rules (section {index} of {total}):
+{tender_chunk}
+
+Candidate submission (relevant excerpts):
+{candidate_context}
+
+Return JSON object with fields:
+- compliance: percentage of this section's requirements met (0-100)
+- strengths: list
+- weaknesses: list
+- missing_documents: list
+- final_score: 0-100
+"""
+
+REQUIREMENTS_PROMPT = """
+You are an AI expert for procurement document analysis.
+Below is ONE SECTION of the tender rules. List every requirement a candidate
+must meet in this section, one requirement per item, in document order.
+
+Tender rules (section {index} of {total}):
+{tender_chunk}
+
+Return JSON object with field:
+- requirements: list of objects with fields
+  - category: one of "qualification", "documents", "technical", "other"
+  - text: the requirement, concise but complete
+"""
+
+REQUIREMENT_CATEGORIES = ("qualification", "documents", "technical", "other")
+
+
+class AIComparisonError(Exception):
+    pass
+
+
+def _is_rate_limit(e: Exception) -> bool:
+    import openai
+
+    return isinstance(e, openai.RateLimitError)
+
+
+def _is_retryable(e: Exception) -> bool:
+    import openai
+
+    if isinstance(e, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = AI_BACKOFF_BASE, cap: float = AI_BACKOFF_MAX) -> float:
+    """Eksponenciāla pauze ar pilnu nejaušību ("full jitter"), lai atkārtojumi neiet viļņos."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AIComparisonEngine:
+    def __init__(self):
+        api_key = os.getenv("OPENAI_API_KEY")
+
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY is missing!")
+
+        self.api_key = api_key
+        self._client = None
+
+        # AsyncOpenAI (httpx) savienojumi ir piesaistīti event loop – katram loop savs klients.
+        # Atkārtojumus veicam paši (ar jitter), tāpēc SDK iebūvētos izslēdzam.
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = \
+            weakref.WeakKeyDictionary()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+
+        self.retries = 0
+
+    @property
+    def client(self):
+        """Sinhronais klients (test()); openai tiek importēts tikai pirmajā lietošanā."""
+        if self._client is None:
+            from openai import OpenAI
+
+            # Pareizi! Jaunajai OpenAI bibliotēkai nedrīkst dot 'proxies'
+            self._client = OpenAI(api_key=self.api_key)
+        return self._client
+
+    # Vienkārša testa funkcija
+    def test(self):
         response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=AI_MODEL,
             messages=[
-                {"role": "system", "content": "You analyze tender documents."},
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": "Hello, test successful?"}
             ]
         )
+        return response.choices[0].message.content
+
+    # =========================================================
+    # Asinhronais OpenAI izsaukums ar atkārtojumiem
+    # =========================================================
+    def _async_client(self) -> "AsyncOpenAI":
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(api_key=self.api_key, timeout=AI_REQUEST_TIMEOUT, max_retries=0)
+            self._async_clients[loop] = client
+        return client
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _chat(
+        self,
+        prompt: str,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_event: Optional[EventFn] = None,
+        **params: Any,
+    ) -> str:
+        """
+        Viens chat.completions pieprasījums: ne vairāk par AI_MAX_CONCURRENCY
+        vienlaicīgi, ar taimautu un atkārtojumiem uz 429 / 5xx / tīkla kļūdām.
+
+        Atbildes tiek kešotas (llm_cache.py). use_cache=False – kešu nelasa,
+        bet jauno atbildi saglabā. Pirms sūtīšanas pieprasījums gaida savu
+        kārtu RPM/TPM plānotājā (rate_limiter.py) atbilstoši priority.
+
+        Ja dots on_event, atbilde tiek straumēta: katrs teksta gabals –
+        {"event": "token", "text": ...}; pirms atkārtojuma – {"event": "retry"}.
+        """
+        key = LLMResponseCache.make_key(AI_MODEL, SYSTEM_PROMPT, prompt, params)
+        if use_cache:
+            cached = await run_io(llm_cache.get, key)
+            if cached is not None:
+                if on_event is not None:
+                    on_event({"event": "token", "text": cached, "cached": True})
+                return cached
+        else:
+            llm_cache.note_bypass()
+
+        content = await self._chat_uncached(prompt, priority, on_event, **params)
+        await run_io(llm_cache.put, key, AI_MODEL, content)
+        return content
+
+    async def _chat_uncached(
+        self,
+        prompt: str,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_event: Optional[EventFn] = None,
+        **params: Any,
+    ) -> str:
+        client = self._async_client()
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        estimated = count_tokens(SYSTEM_PROMPT) + count_tokens(prompt) + AI_EXPECTED_OUTPUT_TOKENS
+
+        attempt = 0
+        while True:
+            # Katrs mēģinājums (arī atkārtotais) tiek skaitīts RPM/TPM limitos
+            with metrics.stage("openai_wait", "rate_limit"):
+                await scheduler.acquire(estimated, priority)
+            try:
+                async with self._semaphore():
+                    with metrics.stage("openai", "chat" if on_event is None else "stream"):
+                        if on_event is None:
+                            response = await client.chat.completions.create(model=AI_MODEL, messages=messages, **params)
+                            content, usage = response.choices[0].message.content, getattr(response, "usage", None)
+                        else:
+                            content, usage = await self._stream(client, messages, on_event, **params)
+                metrics.record_tokens(AI_MODEL, usage)
+                if usage is not None and getattr(usage, "total_tokens", None):
+                    scheduler.reconcile(estimated, usage.total_tokens)
+                return content
+            except Exception as e:
+                if _is_rate_limit(e):
+                    scheduler.pause(_retry_after(e) or backoff_delay(attempt))
+                if not _is_retryable(e) or attempt >= AI_MAX_RETRIES:
+                    raise
+                delay = max(_retry_after(e) or 0.0, backoff_delay(attempt))
+                attempt += 1
+                self.retries += 1
+                if on_event is not None:
+                    # Klientam jāatmet jau saņemtie tokeni – atbilde sāksies no jauna
+                    on_event({"event": "retry", "attempt": attempt, "error": str(e)})
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _stream(client: "AsyncOpenAI", messages: List[Dict[str, str]], on_event: EventFn, **params: Any):
+        stream = await client.chat.completions.create(
+            model=AI_MODEL,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **params,
+        )
+        parts: List[str] = []
+        usage = None
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            for choice in chunk.choices:
+                delta = choice.delta.content if choice.delta is not None else None
+                if delta:
+                    parts.append(delta)
+                    on_event({"event": "token", "text": delta})
+        return "".join(parts), usage
+
+    # =========================================================
+    # Galvenais salīdzināšanas modulis
+    # =========================================================
+    async def compare_async(
+        self,
+        tender_rules_text,
+        candidate_text,
+        mode: Optional[str] = None,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_event: Optional[EventFn] = None,
+        tender_tokens: Optional[int] = None,
+        tender_chunks: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Atgriež analīzi kā dict (compliance, strengths, weaknesses,
+        missing_documents, final_score, mode) abos režīmos.
+
+        mode: "single" – viss vienā pieprasījumā (kā līdz šim),
+              "map_reduce" – pa prasību sadaļām (skat. compare_map_reduce_async),
+              "auto" – map_reduce tikai, ja teksti pārsniedz AI_SINGLE_PROMPT_MAX_TOKENS.
+
+        Abos režīmos no kandidāta teksta AI saņem tikai prasībām atbilstošos
+        fragmentus (lokāls BM25 indekss, skat. retrieval.py).
+        use_cache=False – neizmantot saglabātās AI atbildes (skat. llm_cache.py).
+        priority – rate_limiter.PRIORITY_INTERACTIVE / PRIORITY_BATCH.
+        on_event – progresa notikumi straumēšanai: map_reduce režīmā
+        {"event": "section", ...} katrai sadaļai, single režīmā – AI tokeni.
+        tender_tokens / tender_chunks – iepriekš aprēķināti (konkursu reģistrs,
+        skat. tender_registry.py); ja nav doti, tiek aprēķināti no teksta.
+        """
+        mode = mode or AI_COMPARE_MODE
+        if mode not in COMPARE_MODES:
+            raise AIComparisonError(f"Unknown compare mode: {mode}")
+
+        # Indeksēšana ir CPU darbs – ārpus event loop
+        candidates = await run_io(CandidateIndex, candidate_text)
+
+        if mode == "auto":
+            if tender_tokens is None:
+                tender_tokens = count_tokens(tender_rules_text)
+            total = tender_tokens + min(candidates.total_tokens, AI_CANDIDATE_CONTEXT_TOKENS)
+            mode = "single" if total <= AI_SINGLE_PROMPT_MAX_TOKENS else "map_reduce"
+
+        if mode == "map_reduce":
+            return await self.compare_map_reduce_async(
+                tender_rules_text, candidates, use_cache=use_cache, priority=priority, on_event=on_event,
+                tender_chunks=tender_chunks,
+            )
+        return await self._compare_single(tender_rules_text, candidates, use_cache, priority, on_event)
+
+    def compare(self, tender_rules_text, candidate_text, mode: Optional[str] = None,
+                use_cache: bool = True) -> Dict[str, Any]:
+        """Sinhrona versija skriptiem (ārpus event loop)."""
+        return asyncio.run(self.compare_async(tender_rules_text, candidate_text, mode, use_cache))
+
+    async def _compare_single(
+        self,
+        tender_rules_text: str,
+        candidates: CandidateIndex,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_event: Optional[EventFn] = None,
+    ) -> Dict[str, Any]:
+        # Uz AI sūtām tikai prasībām atbilstošos kandidāta fragmentus
+        candidate_context = await run_io(candidates.context_for, tender_rules_text, AI_CANDIDATE_CONTEXT_TOKENS)
+        content = await self._chat(SINGLE_PROMPT.format(
+            tender_rules_text=tender_rules_text,
+            candidate_text=candidate_context,
+        ), use_cache, priority, on_event, response_format={"type": "json_object"})
+        analysis = parse_analysis(content)
+        analysis["mode"] = "single"
+        return analysis
+
+    # =========================================================
+    # MAP-REDUCE salīdzināšana lieliem konkursiem
+    # =========================================================
+    async def compare_map_reduce_async(
+        self,
+        tender_rules_text: str,
+        candidates: Union[str, CandidateIndex],
+        chunk_tokens: int = AI_MAP_CHUNK_TOKENS,
+        candidate_tokens: int = AI_CANDIDATE_CONTEXT_TOKENS,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_event: Optional[EventFn] = None,
+        tender_chunks: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Prasības tiek sadalītas gabalos pa sadaļām (chunking.chunk_text);
+        visi gabali (map) tiek analizēti vienlaicīgi – kopējais ilgums ir tuvs
+        viena pieprasījuma ilgumam – ar kandidāta fragmentiem, ko BM25 indekss
+        atlasa katrai prasībai (retrieval.py). Rezultāti tiek apvienoti (reduce)
+        tajā pašā shēmā kā vienā pieprasījumā.
+
+        tender_chunks – jau sadalītas prasības (compare_batch_async tās dala
+        vienreiz visiem kandidātiem).
+        """
+        if isinstance(candidates, str):
+            candidates = await run_io(CandidateIndex, candidates)
+
+        if tender_chunks is None:
+            tender_chunks = await run_io(chunk_text, tender_rules_text, chunk_tokens)
+        if not tender_chunks:
+            raise AIComparisonError("Tender text is empty")
+
+        async def analyze(chunk: Dict[str, Any]) -> Dict[str, Any]:
+            context = await run_io(candidates.context_for, chunk["text"], candidate_tokens)
+            try:
+                partial = {"chunk": chunk,
+                           "result": await self._map_chunk(chunk, len(tender_chunks), context, use_cache, priority)}
+            except Exception as e:
+                partial = {"chunk": chunk, "error": str(e)}
+
+            if on_event is not None:
+                on_event({
+                    "event": "section",
+                    "index": chunk["index"],
+                    "total": len(tender_chunks),
+                    "heading": chunk["heading"],
+                    **({"result": partial["result"]} if "result" in partial else {"error": partial["error"]}),
+                })
+            return partial
+
+        partials = await asyncio.gather(*(analyze(chunk) for chunk in tender_chunks))
+        return reduce_partials(list(partials))
+
+    # =========================================================
+    # Viens konkurss pret N kandidātiem
+    # =========================================================
+    async def compare_batch_async(
+        self,
+        tender_rules_text: str,
+        candidate_texts: Dict[str, str],
+        mode: Optional[str] = None,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_event: Optional[EventFn] = None,
+        tender_tokens: Optional[int] = None,
+        tender_chunks: Optional[List[Dict[str, Any]]] = None,
+        reuse: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Salīdzina vienu konkursu ar vairākiem kandidātiem vienlaicīgi.
+
+        Prasību puse tiek sagatavota vienreiz: tokenu skaits un sadalījums
+        sadaļās (map_reduce) ir kopīgs visiem kandidātiem; vienāds prasību
+        prefikss pieprasījumos ļauj OpenAI izmantot arī savu prompt kešu.
+        reuse – {kandidāts: {"candidate": oriģināls, "similarity"}} (skat.
+        near_duplicates.reusable_candidates): šie kandidāti netiek vērtēti
+        atsevišķi, bet saņem oriģināla analīzi ar atzīmi "reused_from".
+        Atgriež {"ranking": [...], "results": {kandidāts: analīze}}.
+        """
+        mode = mode or AI_COMPARE_MODE
+        if mode not in COMPARE_MODES:
+            raise AIComparisonError(f"Unknown compare mode: {mode}")
+        if not candidate_texts:
+            raise AIComparisonError("No candidates to compare")
+
+        if tender_tokens is None:
+            tender_tokens = await run_io(count_tokens, tender_rules_text)
+        chunk_lock = asyncio.Lock()
+
+        async def shared_chunks() -> List[Dict[str, Any]]:
+            nonlocal tender_chunks
+            async with chunk_lock:
+                if tender_chunks is None:
+                    tender_chunks = await run_io(chunk_text, tender_rules_text, AI_MAP_CHUNK_TOKENS)
+                    if not tender_chunks:
+                        raise AIComparisonError("Tender text is empty")
+            return tender_chunks
+
+        async def evaluate(name: str, text: str) -> Dict[str, Any]:
+            def emit(event: Dict[str, Any]) -> None:
+                on_event({**event, "candidate": name})
+
+            try:
+                candidates = await run_io(CandidateIndex, text)
+                candidate_mode = mode
+                if candidate_mode == "auto":
+                    total = tender_tokens + min(candidates.total_tokens, AI_CANDIDATE_CONTEXT_TOKENS)
+                    candidate_mode = "single" if total <= AI_SINGLE_PROMPT_MAX_TOKENS else "map_reduce"
+
+                if candidate_mode == "map_reduce":
+                    analysis = await self.compare_map_reduce_async(
+                        tender_rules_text, candidates, use_cache=use_cache, priority=priority,
+                        on_event=emit if on_event is not None else None, tender_chunks=await shared_chunks(),
+                    )
+                else:
+                    analysis = await self._compare_single(tender_rules_text, candidates, use_cache, priority)
+                result = {"analysis": analysis}
+            except Exception as e:
+                result = {"error": str(e)}
+
+            if on_event is not None:
+                emit({"event": "candidate", **result})
+            return result
+
+        reuse = reuse or {}
+        reuse = {name: r for name, r in reuse.items()
+                 if name in candidate_texts and r["candidate"] in candidate_texts and r["candidate"] not in reuse}
+        names = [name for name in candidate_texts if name not in reuse]
+        results = await asyncio.gather(*(evaluate(name, candidate_texts[name]) for name in names))
+        evaluated = dict(zip(names, results))
+
+        by_name: Dict[str, Dict[str, Any]] = {}
+        for name in candidate_texts:
+            if name not in reuse:
+                by_name[name] = evaluated[name]
+                continue
+            original = reuse[name]["candidate"]
+            by_name[name] = {**evaluated[original], "reused_from": original, "similarity": reuse[name]["similarity"]}
+            if on_event is not None:
+                on_event({"event": "candidate", "candidate": name, **by_name[name]})
+
+        return {
+            "ranking": rank_candidates(by_name),
+            "results": by_name,
+            "tender_tokens": tender_tokens,
+            "tender_chunks": len(tender_chunks) if tender_chunks is not None else None,
+        }
+
+    # =========================================================
+    # Strukturētas prasības (konkursu reģistram)
+    # =========================================================
+    async def extract_requirements_async(
+        self,
+        tender_chunks: List[Dict[str, Any]],
+        use_cache: bool = True,
+        priority: int = PRIORITY_BATCH,
+    ) -> List[Dict[str, Any]]:
+        """
+        Izvelk prasību sarakstu no katras prasību sadaļas (vienlaicīgi).
+        Ja sadaļas analīze neizdodas, tās prasības ir teikumi no pašas sadaļas
+        (kategorija "other"), lai neviena prasība nepazustu.
+        Atgriež [{"section", "heading", "category", "text"}] dokumenta secībā.
+        """
+        async def extract(chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+            prompt = REQUIREMENTS_PROMPT.format(
+                index=chunk["index"] + 1,
+                total=len(tender_chunks),
+                tender_chunk=chunk["text"],
+            )
+            try:
+                content = await self._chat(prompt, use_cache, priority, response_format={"type": "json_object"})
+                items = parse_analysis(content).get("requirements") or []
+            except Exception:
+                items = [{"category": "other", "text": q} for q in requirement_queries(chunk["text"])]
+
+            requirements = []
+            for item in items:
+                if isinstance(item, str):
+                    item = {"text": item}
+                text = " ".join(str(item.get("text") or "").split())
+                if not text:
+                    continue
+                category = item.get("category")
+                requirements.append({
+                    "section": chunk["index"],
+                    "heading": chunk["heading"],
+                    "category": category if category in REQUIREMENT_CATEGORIES else "other",
+                    "text": text,
+                })
+            return requirements
+
+        per_chunk = await asyncio.gather(*(extract(chunk) for chunk in tender_chunks))
+        return [r for requirements in per_chunk for r in requirements]
+
+    async def _map_chunk(
+        self,
+        chunk: Dict[str, Any],
+        total: int,
+        candidate_context: str,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Dict[str, Any]:
+        prompt = MAP_PROMPT.format(
+            index=chunk["index"] + 1,
+            total=total,
+            tender_chunk=chunk["text"],
+            candidate_context=candidate_context or "[no relevant candidate text]",
+        )
+        content = await self._chat(prompt, use_cache, priority, response_format={"type": "json_object"})
+        try:
+            return parse_analysis(content)
+        except AIComparisonError as e:
+            raise AIComparisonError(f"{e} for chunk {chunk['index']}")
+
+
+# =========================================================
+# Palīgfunkcijas (bez OpenAI – deterministiskas)
+# =========================================================
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        m = re.search(r"-?\d+(\.\d+)?", value)
+        if m:
+            return float(m.group())
+    return None
+
+
+def _merge_lists(values: List[Any]) -> List[str]:
+    seen = set()
+    merged: List[str] = []
+    for items in values:
+        if isinstance(items, str):
+            items = [items]
+        for item in items or []:
+            text = item if isinstance(item, str) else json.dumps(item, ensure_ascii=False)
+            key = " ".join(text.lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(text)
+    return merged
+
+
+def parse_analysis(content: str) -> Dict[str, Any]:
+    """Modeļa JSON atbilde -> dict (arī, ja ietīta ```json blokā)."""
+    text = (content or "").strip()
+    m = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    if m:
+        text = m.group(1)
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        raise AIComparisonError("Invalid JSON from model")
+    if not isinstance(data, dict):
+        raise AIComparisonError("Model returned JSON that is not an object")
+    return data
+
+
+def rank_candidates(results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Salīdzinājuma tabula: kandidāti pēc final_score (tad compliance) dilstošā
+    secībā; kandidāti ar kļūdu – beigās, bez vietas.
+    """
+    rows: List[Dict[str, Any]] = []
+    for name, result in results.items():
+        analysis = result.get("analysis")
+        if analysis is None:
+            rows.append({"candidate": name, "rank": None, "final_score": None, "compliance": None,
+                         "missing_documents": None, "error": result.get("error")})
+            continue
+        rows.append({
+            "candidate": name,
+            "rank": None,
+            "final_score": _number(analysis.get("final_score")),
+            "compliance": _number(analysis.get("compliance")),
+            "missing_documents": len(_merge_lists([analysis.get("missing_documents")])),
+            "strengths": len(_merge_lists([analysis.get("strengths")])),
+            "weaknesses": len(_merge_lists([analysis.get("weaknesses")])),
+            **({"reused_from": result["reused_from"]} if "reused_from" in result else {}),
+        })
+
+    def key(row: Dict[str, Any]):
+        failed = "error" in row
+        return (failed, -(row["final_score"] or 0.0), -(row["compliance"] or 0.0), row["candidate"])
+
+    rows.sort(key=key)
+    rank = 0
+    for row in rows:
+        if "error" not in row:
+            rank += 1
+            row["rank"] = rank
+    return rows
+
+
+def reduce_partials(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Apvieno gabalu analīzes: compliance un final_score – vidējais, svērts ar
+    prasību gabala tokeniem; saraksti – apvienoti bez dublikātiem.
+    """
+    ok = [p for p in partials if "result" in p]
+    if not ok:
+        errors = "; ".join(p.get("error", "") for p in partials)
+        raise AIComparisonError(f"All chunk analyses failed: {errors}")
+
+    def weighted(field: str) -> Optional[float]:
+        total_weight = 0.0
+        total = 0.0
+        for p in ok:
+            value = _number(p["result"].get(field))
+            if value is None:
+                continue
+            weight = p["chunk"]["tokens"]
+            total += max(0.0, min(100.0, value)) * weight
+            total_weight += weight
+        return round(total / total_weight, 1) if total_weight else None
 
-        return response.choices[0].message["content"]
+    return {
+        "compliance": weighted("compliance"),
+        "strengths": _merge_lists([p["result"].get("strengths") for p in ok]),
+        "weaknesses": _merge_lists([p["result"].get("weaknesses") for p in ok]),
+        "missing_documents": _merge_lists([p["result"].get("missing_documents") for p in ok]),
+        "final_score": weighted("final_score"),
+        "mode": "map_reduce",
+        "chunks": len(partials),
+        "failed_chunks": [
+            {"index": p["chunk"]["index"], "heading": p["chunk"]["heading"], "error": p["error"]}
+            for p in partials if "error" in p
+        ],
+    }
@@ -0,0 +1,102 @@
+# archive_members.py
+
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterator, List, Union
+
+from workers import fanout, fanout_workers
+
+# Iekšējie faili līdz šim izmēram tiek lasīti atmiņā, lielāki – SpooledTemporaryFile
+MEMBER_SPOOL_MAX_BYTES = int(os.getenv("MEMBER_SPOOL_MAX_MB", "16")) * 1024 * 1024
+# Mazāk failu par šo – parsējam uzreiz šajā procesā (procesu pūls neatmaksājas)
+ARCHIVE_PARALLEL_MIN_MEMBERS = int(os.getenv("ARCHIVE_PARALLEL_MIN_MEMBERS", "2"))
+
+
+def open_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> BinaryIO:
+    """
+    Atgriež arhīva faila saturu kā meklējamu (seekable) buferi bez pagaidu failiem
+    diskā: mazus failus – BytesIO, lielus – SpooledTemporaryFile, kas uz disku
+    pārslēdzas tikai pārsniedzot MEMBER_SPOOL_MAX_BYTES.
+    """
+    if info.file_size <= MEMBER_SPOOL_MAX_BYTES:
+        return io.BytesIO(zf.read(info))
+
+    buf = tempfile.SpooledTemporaryFile(max_size=MEMBER_SPOOL_MAX_BYTES)
+    with zf.open(info, "r") as src:
+        shutil.copyfileobj(src, buf, 1024 * 1024)
+    buf.seek(0)
+    return buf
+
+
+def file_members(zf: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Visi arhīva faili (bez mapēm) arhīva secībā."""
+    return [m for m in zf.infolist() if not m.is_dir()]
+
+
+def parse_member(archive_path: str, member_name: str, parse_fn: Callable[[BinaryIO, str], Any]) -> Any:
+    """
+    Parsē vienu arhīva failu. Izpildās procesu pūla darbiniekā: katrs
+    darbinieks pats atver arhīvu, tāpēc starp procesiem netiek sūtīti baiti.
+    """
+    with zipfile.ZipFile(archive_path, "r") as zf:
+        info = zf.getinfo(member_name)
+        with open_member(zf, info) as buf:
+            return parse_fn(buf, member_name)
+
+
+@contextlib.contextmanager
+def _archive_path(source: Union[Path, BinaryIO]) -> Iterator[str]:
+    """
+    Ceļš, ko fanout darbinieki var atvērt paši. Ligzdots arhīvs (buferis)
+    tiek vienreiz ierakstīts pagaidu failā – tikai tad, ja to sadala pa procesiem.
+    """
+    if isinstance(source, Path):
+        yield str(source)
+        return
+
+    fd, name = tempfile.mkstemp(suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            source.seek(0)
+            shutil.copyfileobj(source, f, 1024 * 1024)
+        yield name
+    finally:
+        os.unlink(name)
+
+
+def parse_members(
+    source: Union[Path, BinaryIO],
+    member_names: List[str],
+    parse_fn: Callable[[BinaryIO, str], Any],
+) -> List[Any]:
+    """
+    Parsē norādītos arhīva failus un atgriež rezultātus arhīva secībā.
+    source – arhīva ceļš vai (ligzdotam arhīvam) meklējams buferis.
+    Paralēli – caur workers.fanout (tas pats procesu budžets kā PDF lapām),
+    ja šim procesam tas atvēlēts; citādi secīgi. Pirmā faila kļūda tiek izmesta.
+    parse_fn(buffer, member_name) jābūt pickle-ējamai (moduļa līmeņa funkcija vai partial).
+    """
+    if isinstance(source, str):
+        source = Path(source)
+
+    if len(member_names) < ARCHIVE_PARALLEL_MIN_MEMBERS or fanout_workers() < 2:
+        with zipfile.ZipFile(source, "r") as zf:
+            results = []
+            for name in member_names:
+                with open_member(zf, zf.getinfo(name)) as buf:
+                    results.append(parse_fn(buf, name))
+            return results
+
+    with _archive_path(source) as archive_path:
+        results = fanout(parse_member, [(archive_path, name, parse_fn) for name in member_names])
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
@@ -0,0 +1,415 @@
+# benchmark.py
+"""
+Parseru veiktspējas mērījumi uz sintētiska, reproducējama korpusa.
+
+    python benchmark.py --out bench/HEAD.json
+    python benchmark.py --out bench/new.json --compare bench/HEAD.json
+
+Korpuss (tas pats --seed -> tie paši baiti):
+  • tender.pdf   – vairāku simtu lapu PDF (--pdf-pages)
+  • tables.docx  – DOCX ar rindkopām un tabulām
+  • nested.zip   – ZIP ar PDF, DOCX, TXT, EDOC un iekšēju ZIP
+  • signed.edoc  – ASiC-E konteiners ar dokumentiem un paraksta failiem
+
+Mēra DocumentParser.extract, extractor.extract_any_document, unpack_edoc un
+build_docx_report: laiku (min/median/mean), caurlaidību un maksimālo Python
+atmiņu (tracemalloc, atsevišķā palaišanā, jo tracemalloc palēnina izpildi).
+Ekstrakcijas kešs pirms katras palaišanas tiek iztīrīts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Fiksēts datums arhīvu ierakstiem – lai baiti nemainītos starp ģenerēšanas reizēm
+ZIP_DATE_TIME = (2020, 1, 1, 0, 0, 0)
+
+# Bez diakritikas – standarta Helvetica PDF fontā tās nav
+WORDS = (
+    "pretendents iesniedz piedavajumu pasutitajs prasibas tehniska specifikacija "
+    "kvalifikacija pieredze apliecinajums ligums termins garantija izpilde "
+    "dokumentacija atbilstiba kriteriji vertesana cena piegade pakalpojums "
+    "apaksuznemejs specialists sertifikats standarts projekts darbs objekts"
+).split()
+
+
+# ======================================================
+# Korpusa ģenerators
+# ======================================================
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(rng: random.Random, pages: int, lines_per_page: int = 45) -> bytes:
+    """
+    Minimāls PDF 1.4 ar Helvetica tekstu (bez ārējām bibliotēkām).
+    Katrai lapai – savs satura strauts; xref nobīdes tiek aprēķinātas precīzi.
+    """
+    objects: List[bytes] = []
+    page_ids = [4 + 2 * i for i in range(pages)]
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    for i in range(pages):
+        lines = [f"{i + 1}. lapa. {_sentence(rng, 6)}"] + [_sentence(rng, 12) for _ in range(lines_per_page - 1)]
+        body = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_pdf_escape(l)}) '" for l in lines) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_ids[i] + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for n, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % n + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _normalize_zip(data: bytes) -> bytes:
+    """Pārraksta ZIP ar fiksētiem datumiem (python-docx ieraksta pašreizējo laiku)."""
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            dst.writestr(zipfile.ZipInfo(info.filename, ZIP_DATE_TIME), src.read(info), zipfile.ZIP_DEFLATED)
+    return out.getvalue()
+
+
+def make_docx(rng: random.Random, tables: int, rows: int, paragraphs: int = 6) -> bytes:
+    import datetime
+
+    from docx import Document
+
+    doc = Document()
+    stamp = datetime.datetime(2020, 1, 1)
+    doc.core_properties.created = stamp
+    doc.core_properties.modified = stamp
+
+    doc.add_heading("Tehniska specifikacija", level=1)
+    for t in range(tables):
+        doc.add_heading(f"{t + 1}. sadala", level=2)
+        for _ in range(paragraphs):
+            doc.add_paragraph(_sentence(rng, 20))
+        table = doc.add_table(rows=rows, cols=4)
+        for r, row in enumerate(table.rows):
+            cells = row.cells
+            cells[0].text = f"R{t + 1}.{r + 1}"
+            cells[1].text = _sentence(rng, 8)
+            cells[2].text = rng.choice(("Ja", "Ne", "Dalēji"))
+            cells[3].text = f"{rng.randint(1, 9999)} EUR"
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return _normalize_zip(buf.getvalue())
+
+
+def _zip(entries: List[tuple]) -> bytes:
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as zf:
+        for name, data, compress in entries:
+            zf.writestr(zipfile.ZipInfo(name, ZIP_DATE_TIME), data, compress)
+    return out.getvalue()
+
+
+def make_edoc(rng: random.Random, documents: Dict[str, bytes], signatures: int = 2) -> bytes:
+    """ASiC-E konteiners: mimetype (nesaspiests, pirmais), dokumenti, manifests, paraksti."""
+    entries = [("mimetype", b"application/vnd.etsi.asic-e+zip", zipfile.ZIP_STORED)]
+    entries += [(name, data, zipfile.ZIP_DEFLATED) for name, data in documents.items()]
+
+    manifest = "".join(
+        f'<manifest:file-entry manifest:full-path="{name}" manifest:media-type="application/octet-stream"/>'
+        for name in documents
+    )
+    entries.append((
+        "META-INF/manifest.xml",
+        f'<?xml version="1.0" encoding="UTF-8"?><manifest:manifest>{manifest}</manifest:manifest>'.encode(),
+        zipfile.ZIP_DEFLATED,
+    ))
+    for i in range(signatures):
+        value = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/") for _ in range(2048))
+        entries.append((
+            f"META-INF/signatures{i}.xml",
+            f'<?xml version="1.0"?><asic:XAdESSignatures><ds:SignatureValue>{value}</ds:SignatureValue>'
+            f"</asic:XAdESSignatures>".encode(),
+            zipfile.ZIP_DEFLATED,
+        ))
+    return _zip(entries)
+
+
+def generate_corpus(out_dir: Path, seed: int = 42, pdf_pages: int = 300, docx_tables: int = 40,
+                    docx_rows: int = 20) -> Dict[str, Path]:
+    """Izveido korpusu out_dir mapē. Atgriež {nosaukums: ceļš}."""
+    rng = random.Random(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    tender_pdf = make_pdf(rng, pdf_pages)
+    tables_docx = make_docx(rng, docx_tables, docx_rows)
+    small_pdf = make_pdf(rng, max(1, pdf_pages // 10))
+    small_docx = make_docx(rng, max(1, docx_tables // 8), docx_rows)
+    notes = "\n".join(_sentence(rng) for _ in range(400)).encode()
+
+    signed_edoc = make_edoc(rng, {"piedavajums.pdf": small_pdf, "cenas.docx": small_docx, "apliecinajums.txt": notes})
+    inner_zip = _zip([
+        ("iekseja/specifikacija.pdf", small_pdf, zipfile.ZIP_DEFLATED),
+        ("iekseja/tabulas.docx", small_docx, zipfile.ZIP_DEFLATED),
+    ])
+    nested_zip = _zip([
+        ("dokumenti/nolikums.pdf", small_pdf, zipfile.ZIP_DEFLATED),
+        ("dokumenti/tabulas.docx", small_docx, zipfile.ZIP_DEFLATED),
+        ("dokumenti/piezimes.txt", notes, zipfile.ZIP_DEFLATED),
+        ("dokumenti/parakstits.edoc", signed_edoc, zipfile.ZIP_DEFLATED),
+        ("dokumenti/arhivs.zip", inner_zip, zipfile.ZIP_DEFLATED),
+    ])
+
+    corpus = {
+        "tender.pdf": tender_pdf,
+        "tables.docx": tables_docx,
+        "nested.zip": nested_zip,
+        "signed.edoc": signed_edoc,
+    }
+    paths: Dict[str, Path] = {}
+    for name, data in corpus.items():
+        path = out_dir / name
+        path.write_bytes(data)
+        paths[name] = path
+    return paths
+
+
+# ======================================================
+# Mērījumi
+# ======================================================
+def measure(fn: Callable[[], Any], repeats: int, setup: Optional[Callable[[], None]] = None,
+            warmup: int = 1) -> Dict[str, Any]:
+    """
+    Izpilda fn warmup + repeats reizes (setup – pirms katras, netiek mērīts),
+    tad vēlreiz ar tracemalloc maksimālās atmiņas noteikšanai.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    times: List[float] = []
+    result = None
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": {"min": min(times), "median": statistics.median(times), "mean": statistics.fmean(times)},
+        "peak_python_mb": round(peak / (1024 * 1024), 3),
+        "result": result,
+    }
+
+
+def run_benchmarks(corpus: Dict[str, Path], repeats: int, work_root: Path) -> List[Dict[str, Any]]:
+    # Moduļi tiek importēti pēc vides mainīgo iestatīšanas (main())
+    import extractor
+    from document_parser import DocumentParser
+    from edoc_extractor import unpack_edoc
+    from extraction_cache import extraction_cache
+
+    results: List[Dict[str, Any]] = []
+
+    def add(name: str, file: str, input_bytes: int, stats: Dict[str, Any], **extra: Any) -> None:
+        seconds = stats["seconds"]["median"]
+        row = {
+            "benchmark": name,
+            "file": file,
+            "input_bytes": input_bytes,
+            "repeats": repeats,
+            "seconds": {k: round(v, 6) for k, v in stats["seconds"].items()},
+            "mb_per_s": round(input_bytes / (1024 * 1024) / seconds, 3) if seconds else None,
+            "peak_python_mb": stats["peak_python_mb"],
+            **extra,
+        }
+        results.append(row)
+        print(f"{name:<36} {file:<14} {seconds * 1000:>10.1f} ms  {row['mb_per_s'] or 0:>8.2f} MB/s  "
+              f"{row['peak_python_mb']:>8.1f} MB", flush=True)
+
+    for file, path in corpus.items():
+        size = path.stat().st_size
+
+        stats = measure(lambda: DocumentParser.extract(path, use_cache=False), repeats)
+        data = stats.pop("result")
+        extra: Dict[str, Any] = {"chars": len(data["text"])}
+        if "pages" in data:
+            extra["pages"] = len(data["pages"])
+            extra["pages_per_s"] = round(len(data["pages"]) / stats["seconds"]["median"], 1)
+        add("DocumentParser.extract", file, size, stats, **extra)
+
+        stats = measure(lambda: extractor.extract_any_document(path), repeats, setup=extraction_cache.clear)
+        text = stats.pop("result")
+        add("extractor.extract_any_document", file, size, stats, chars=len(text))
+
+        stats = measure(lambda: DocumentParser.preview(path), repeats)
+        preview = stats.pop("result")
+        add("DocumentParser.preview", file, size, stats, chars=len(preview["text"]))
+
+    edoc = corpus["signed.edoc"]
+    work_dir = work_root / "unpack"
+
+    def reset_work_dir() -> None:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats = measure(lambda: unpack_edoc(edoc, work_dir), repeats, setup=reset_work_dir)
+    files = stats.pop("result")
+    add("unpack_edoc", edoc.name, edoc.stat().st_size, stats, files=len(files))
+    reset_work_dir()
+
+    # Atskaitei – reāli izvilkti teksti (ievades apjoms = teksta baiti UTF-8)
+    tender_text = DocumentParser.extract(corpus["tender.pdf"], use_cache=False)["text"]
+    candidate_text = DocumentParser.extract(corpus["nested.zip"], use_cache=False)["text"]
+    text_bytes = len(tender_text.encode()) + len(candidate_text.encode())
+    stats = measure(lambda: extractor.build_docx_report("Benchmark SIA", tender_text, candidate_text), repeats)
+    report = stats.pop("result")
+    add("build_docx_report", "-", text_bytes, stats, output_bytes=len(report))
+
+    return results
+
+
+# ======================================================
+# Salīdzināšana ar iepriekšējo rezultātu
+# ======================================================
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> int:
+    """Izdrukā median laika izmaiņas. Atgriež regresiju skaitu (lēnāk par threshold)."""
+    old = {(r["benchmark"], r["file"]): r for r in baseline["results"]}
+    regressions = 0
+    print(f"\nvs {baseline['meta'].get('git_commit') or 'baseline'} (threshold {threshold:.0%}):")
+    for row in current["results"]:
+        prev = old.get((row["benchmark"], row["file"]))
+        if prev is None:
+            continue
+        before, after = prev["seconds"]["median"], row["seconds"]["median"]
+        change = (after - before) / before if before else 0.0
+        mem = row["peak_python_mb"] - prev["peak_python_mb"]
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{row['benchmark']:<36} {row['file']:<14} {change:>+8.1%}  mem {mem:>+8.1f} MB{flag}")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark document parsers on a synthetic tender corpus.")
+    parser.add_argument("--out", type=Path, help="write JSON results to this file")
+    parser.add_argument("--compare", type=Path, help="previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression")
+    parser.add_argument("--corpus-dir", type=Path, help="keep the generated corpus here")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--pdf-pages", type=int, default=300)
+    parser.add_argument("--docx-tables", type=int, default=40)
+    parser.add_argument("--serial", action="store_true",
+                        help="parse in this process only (no PDF/archive fan-out) so peak memory covers all work")
+    args = parser.parse_args(argv)
+
+    work_root = Path(tempfile.mkdtemp(prefix="ai-iepirkumi-bench-"))
+    # Izolēts kešs un darba vietas – mērījumi neietekmē (un neizmanto) servera kešu
+    os.environ["EXTRACTION_CACHE_DIR"] = str(work_root / "cache")
+    os.environ.setdefault("WORKSPACE_ROOT", str(work_root / "workspaces"))
+    if args.serial:
+        os.environ["PDF_PARALLEL_MIN_PAGES"] = str(10 ** 9)
+        os.environ["ARCHIVE_PARALLEL_MIN_MEMBERS"] = str(10 ** 9)
+
+    try:
+        corpus_dir = args.corpus_dir or work_root / "corpus"
+        started = time.perf_counter()
+        corpus = generate_corpus(corpus_dir, args.seed, args.pdf_pages, args.docx_tables)
+        corpus_bytes = {name: path.stat().st_size for name, path in corpus.items()}
+        print(f"corpus: {', '.join(f'{n} {p.stat().st_size // 1024} KB' for n, p in corpus.items())} "
+              f"({time.perf_counter() - started:.1f}s)", flush=True)
+
+        results = run_benchmarks(corpus, args.repeats, work_root)
+    finally:
+        import workers
+        workers.shutdown()
+        shutil.rmtree(work_root, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "git_commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "pdf_pages": args.pdf_pages,
+            "docx_tables": args.docx_tables,
+            "repeats": args.repeats,
+            "serial": args.serial,
+            "corpus_bytes": corpus_bytes,
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "max_rss_children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        },
+        "results": results,
+    }
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nwrote {args.out}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        return 1 if compare(report, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
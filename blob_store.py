@@ -0,0 +1,216 @@
+# blob_store.py
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from uploads import safe_filename
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+BLOB_STORE_DIR = Path(os.getenv("BLOB_STORE_DIR", "/tmp/ai-iepirkumi-cache/blobs"))
+BLOB_STORE_MAX_MB = int(os.getenv("BLOB_STORE_MAX_MB", "4096"))
+# Piesprausts objekts netiek dzēsts tik ilgi – arī ja unpin netika izsaukts (piem., atcelts pieprasījums)
+BLOB_PIN_MAX_SECONDS = float(os.getenv("BLOB_PIN_MAX_SECONDS", "3600"))
+
+DROPBOX_HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class DropboxContentHasher:
+    """
+    Dropbox "content_hash" algoritms: SHA-256 katram 4 MB blokam,
+    tad SHA-256 no visu bloku hash virknes. Ļauj pārbaudīt lejupielādi
+    un salīdzināt lokālos failus ar Dropbox metadatiem.
+    """
+
+    def __init__(self):
+        self._overall = hashlib.sha256()
+        self._block = hashlib.sha256()
+        self._block_pos = 0
+
+    def update(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            take = min(DROPBOX_HASH_BLOCK_SIZE - self._block_pos, len(view))
+            self._block.update(view[:take])
+            self._block_pos += take
+            view = view[take:]
+            if self._block_pos == DROPBOX_HASH_BLOCK_SIZE:
+                self._overall.update(self._block.digest())
+                self._block = hashlib.sha256()
+                self._block_pos = 0
+
+    def hexdigest(self) -> str:
+        overall = self._overall.copy()
+        if self._block_pos:
+            overall.update(self._block.digest())
+        return overall.hexdigest()
+
+
+class BlobStore:
+    """
+    Satura adresēta failu krātuve (atslēga – Dropbox content_hash).
+
+    objects/<hh>/<hash>            – faila saturs (viens eksemplārs)
+    views/<hh>/<hash>/<nosaukums>  – hardlink ar oriģinālo nosaukumu,
+                                     jo parseri tipu nosaka pēc paplašinājuma
+
+    Pārsniedzot BLOB_STORE_MAX_MB, tiek dzēsti senāk izmantotie objekti,
+    izņemot piespraustos (pin – lejupielādēts, bet vēl nav izparsēts).
+    Objekts, kas pazudis no diska, ir tas pats, kas neesošs: path_for -> None.
+    """
+
+    def __init__(self, root: Path = BLOB_STORE_DIR, max_bytes: int = BLOB_STORE_MAX_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # content_hash -> (lietotāju skaits, pēdējā pin laiks)
+        self._pins: Dict[str, Tuple[int, float]] = {}
+        self._used: Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _object_path(self, content_hash: str) -> Path:
+        return self.root / "objects" / content_hash[:2] / content_hash
+
+    def _view_dir(self, content_hash: str) -> Path:
+        return self.root / "views" / content_hash[:2] / content_hash
+
+    def has(self, content_hash: str) -> bool:
+        return bool(content_hash) and self._object_path(content_hash).is_file()
+
+    def path_for(self, content_hash: str, filename: str) -> Optional[Path]:
+        """
+        Atgriež ceļu uz objektu ar vajadzīgo faila nosaukumu (hardlink, bez kopēšanas)
+        vai None, ja objekta nav (arī, ja to tikko izdzēsa cits process).
+        """
+        obj = self._object_path(content_hash)
+        view = self._view_dir(content_hash) / safe_filename(filename)
+
+        with self._lock:
+            try:
+                # Atzīmējam kā nesen lietotu
+                os.utime(obj)
+                if not view.exists():
+                    view.parent.mkdir(parents=True, exist_ok=True)
+                    try:
+                        os.link(obj, view)
+                    except FileNotFoundError:
+                        raise
+                    except OSError:
+                        shutil.copyfile(obj, view)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return view
+
+    def pin(self, content_hash: str) -> None:
+        """Objekts tiek lietots – netiek dzēsts līdz unpin (vai BLOB_PIN_MAX_SECONDS)."""
+        with self._lock:
+            count, _ = self._pins.get(content_hash, (0, 0.0))
+            self._pins[content_hash] = (count + 1, time.time())
+
+    def unpin(self, content_hash: str) -> None:
+        with self._lock:
+            count, pinned_at = self._pins.get(content_hash, (0, 0.0))
+            if count > 1:
+                self._pins[content_hash] = (count - 1, pinned_at)
+            else:
+                self._pins.pop(content_hash, None)
+
+    def _pinned(self, content_hash: str, now: float) -> bool:
+        count, pinned_at = self._pins.get(content_hash, (0, 0.0))
+        return count > 0 and now - pinned_at < BLOB_PIN_MAX_SECONDS
+
+    def incoming_path(self, content_hash: str) -> Path:
+        """Pagaidu ceļš lejupielādei tajā pašā failu sistēmā (atomiskam os.replace)."""
+        incoming = self.root / "incoming"
+        incoming.mkdir(parents=True, exist_ok=True)
+        return incoming / f"{content_hash}.{os.getpid()}.{threading.get_ident()}.part"
+
+    def sweep_incoming(self, max_age: float) -> int:
+        """Dzēš nepabeigtu lejupielāžu .part failus (process nomira lejupielādes laikā)."""
+        cutoff = time.time() - max_age
+        removed = 0
+        for part in (self.root / "incoming").glob("*.part"):
+            try:
+                if part.stat().st_mtime < cutoff:
+                    part.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def commit(self, content_hash: str, incoming: Path) -> None:
+        obj = self._object_path(content_hash)
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        size = incoming.stat().st_size
+
+        with self._lock:
+            # Apjoms tiek saskaitīts vienreiz un pēc tam uzturēts – katrs commit neskenē visu krātuvi
+            self._ensure_usage()
+            previous = obj.stat().st_size if obj.exists() else 0
+            os.replace(incoming, obj)
+            self._used += size - previous
+            self.stores += 1
+            if self._used > self.max_bytes:
+                self._evict()
+
+    def _ensure_usage(self) -> None:
+        if self._used is not None:
+            return
+        total = 0
+        for f in (self.root / "objects").glob("*/*"):
+            try:
+                total += f.stat().st_size
+            except OSError:
+                pass
+        self._used = total
+
+    def _evict(self) -> None:
+        objects = []
+        for f in (self.root / "objects").glob("*/*"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            objects.append((st.st_mtime, st.st_size, f))
+
+        total = sum(size for _, size, _ in objects)
+        objects.sort()
+        # Atbrīvojam līdz 90% no limita, lai nedzēstu pēc katra commit
+        target = int(self.max_bytes * 0.9)
+        now = time.time()
+        for _, size, f in objects:
+            if total <= target:
+                break
+            if self._pinned(f.name, now):
+                continue
+            shutil.rmtree(self._view_dir(f.name), ignore_errors=True)
+            try:
+                f.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+        self._used = total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pinned = len(self._pins)
+        return {"hits": self.hits, "misses": self.misses, "stores": self.stores, "evictions": self.evictions,
+                "pinned": pinned}
+
+
+# Viena kopīga krātuve visam procesam
+blob_store = BlobStore()
@@ -0,0 +1,238 @@
+# chunking.py
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "1500"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "100"))
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+
+# Bez tiktoken – aptuveni 4 rakstzīmes uz tokenu (latviešu tekstam nedaudz mazāk)
+CHARS_PER_TOKEN = 3.5
+
+# Virsraksti: markdown "#", "1.", "2.3.", "2.3.1)", "IV.", "3. nodaļa", "Pielikums Nr. 2"
+_HEADING_RE = re.compile(
+    r"^(\#{1,6}\s+\S"
+    r"|(\d{1,2}\.){1,4}\d{0,2}\)?\s+\S"
+    r"|[IVXLC]{1,6}\.\s+\S"
+    r"|(pielikums|nodaļa|sadaļa)\b)",
+    re.IGNORECASE,
+)
+# Īsa rinda tikai ar lielajiem burtiem ("TEHNISKĀ SPECIFIKĀCIJA")
+_CAPS_HEADING_RE = re.compile(r"^[A-ZĀČĒĢĪĶĻŅŠŪŽ][A-ZĀČĒĢĪĶĻŅŠŪŽ0-9 ,.\-–()/]{3,}$")
+HEADING_MAX_CHARS = 150
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+")
+
+
+# =========================================================
+# Tokenu skaitīšana
+# =========================================================
+_encoding: Any = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding() -> Any:
+    """
+    tiktoken kodējums, ja pieejams. Ja bibliotēkas nav vai kodējumu
+    nevar ielādēt (piem., bez tīkla), atgriež None un tiek lietots novērtējums.
+    """
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception:
+                _encoding = None
+            _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Saīsina tekstu līdz max_tokens (pēc iespējas pa teikuma robežu)."""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        cut = text[:int(max_tokens * CHARS_PER_TOKEN)]
+
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary + 1]
+    return cut
+
+
+# =========================================================
+# Sadaļas
+# =========================================================
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > HEADING_MAX_CHARS:
+        return False
+    return bool(_HEADING_RE.match(line) or _CAPS_HEADING_RE.match(line))
+
+
+def split_sections(text: str) -> List[Dict[str, str]]:
+    """
+    Sadala tekstu sadaļās pēc virsrakstiem: [{"heading": ..., "text": ...}].
+    Teksts pirms pirmā virsraksta – sadaļa ar tukšu virsrakstu.
+    """
+    sections: List[Dict[str, str]] = []
+    heading = ""
+    lines: List[str] = []
+
+    for line in text.splitlines():
+        if is_heading(line):
+            if any(l.strip() for l in lines):
+                sections.append({"heading": heading, "text": "\n".join(lines).strip()})
+            heading = line.strip()
+            lines = [line]
+            continue
+        lines.append(line)
+
+    if any(l.strip() for l in lines):
+        sections.append({"heading": heading, "text": "\n".join(lines).strip()})
+    return sections
+
+
+# =========================================================
+# Sadalīšana gabalos
+# =========================================================
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """Pārāk garu rindkopu sadala pa teikumiem, pēdējā gadījumā – pa tokeniem."""
+    pieces: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for sentence in _SENTENCE_RE.split(text):
+        tokens = count_tokens(sentence)
+        if tokens > max_tokens:
+            if current:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            rest = sentence
+            while rest:
+                part = truncate_to_tokens(rest, max_tokens)
+                if not part.strip():
+                    part = rest[:int(max_tokens * CHARS_PER_TOKEN)]
+                pieces.append(part)
+                rest = rest[len(part):].lstrip()
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _tail(text: str, overlap_tokens: int) -> str:
+    """Pēdējie ~overlap_tokens no teksta (pa teikumiem) nākamā gabala kontekstam."""
+    if overlap_tokens <= 0:
+        return ""
+    sentences = _SENTENCE_RE.split(text)
+    tail: List[str] = []
+    tokens = 0
+    for sentence in reversed(sentences):
+        t = count_tokens(sentence)
+        if tokens + t > overlap_tokens:
+            break
+        tail.insert(0, sentence)
+        tokens += t
+    return " ".join(tail)
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> List[Dict[str, Any]]:
+    """
+    Sadala tekstu gabalos, kas nepārsniedz max_tokens.
+
+    • robežas – sadaļu virsraksti; mazas blakus sadaļas tiek apvienotas
+    • pārāk garas sadaļas tiek dalītas pa rindkopām, tad pa teikumiem
+    • gabalam, kas turpina sadaļu, priekšā tiek likts sadaļas virsraksts
+      un iepriekšējā gabala beigas (overlap_tokens)
+
+    Atgriež [{"index", "heading", "text", "tokens"}].
+    """
+    chunks: List[Dict[str, Any]] = []
+    current: List[str] = []
+    current_tokens = 0
+    current_heading = ""
+
+    def flush() -> None:
+        nonlocal current, current_tokens
+        if current:
+            body = "\n\n".join(current).strip()
+            if body:
+                chunks.append({"index": len(chunks), "heading": current_heading, "text": body,
+                               "tokens": count_tokens(body)})
+        current, current_tokens = [], 0
+
+    for section in split_sections(text):
+        section_tokens = count_tokens(section["text"])
+
+        # Visa sadaļa ietilpst – pievienojam esošajam gabalam vai sākam jaunu
+        if section_tokens <= max_tokens:
+            if current and current_tokens + section_tokens > max_tokens:
+                flush()
+            if not current:
+                current_heading = section["heading"]
+            current.append(section["text"])
+            current_tokens += section_tokens + 1
+            continue
+
+        # Sadaļa par lielu – dalām pa rindkopām (un teikumiem), atstājot vietu prefiksam
+        flush()
+        current_heading = section["heading"]
+        piece_budget = max(max_tokens - overlap_tokens - count_tokens(current_heading) - 1, max_tokens // 2)
+        for paragraph in re.split(r"\n\s*\n", section["text"]):
+            if not paragraph.strip():
+                continue
+            pieces = [paragraph] if count_tokens(paragraph) <= piece_budget else _split_oversized(paragraph, piece_budget)
+            for piece in pieces:
+                piece_tokens = count_tokens(piece)
+                if current and current_tokens + piece_tokens > max_tokens:
+                    previous = "\n\n".join(current)
+                    flush()
+                    prefix = "\n".join(p for p in (current_heading, _tail(previous, overlap_tokens)) if p)
+                    if prefix:
+                        current.append(prefix)
+                        current_tokens += count_tokens(prefix) + 1
+                current.append(piece)
+                current_tokens += piece_tokens + 1
+        flush()
+
+    flush()
+    return chunks
+
+
+def chunk_texts(text: str, max_tokens: Optional[int] = None) -> List[str]:
+    """Tikai gabalu teksti – DocumentParser "chunks" laukam."""
+    return [c["text"] for c in chunk_text(text, max_tokens or CHUNK_MAX_TOKENS)]
@@ -1,28 +1,54 @@
-import tempfile
-import zipfile
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import BinaryIO, Iterator, List, Dict, Any, Optional, Tuple, Union
 
-from PyPDF2 import PdfReader
-import docx
+import formats
+import metrics
+from chunking import chunk_texts, count_tokens, truncate_to_tokens
+from extraction_cache import extraction_cache
+from formats import FormatError
+from workers import run_io
 
-from edoc_extractor import is_edoc, unpack_edoc, EdocError
+# Jāpalielina katru reizi, kad mainās ekstrakcijas rezultāts –
+# tad vecie keša ieraksti vairs netiek izmantoti.
+PARSER_VERSION = "7"
+
+ARCHIVE_SEPARATOR = "\n\n-----\n\n"
+# Noklusētais priekšskatījuma garums (simboli)
+PREVIEW_CHARS = 5000
+# Tokens reti ir garāks par šo – keša tekstu pirms tokenu skaitīšanas apgriež
+MAX_CHARS_PER_TOKEN = 32
 
 
 class DocumentParserError(Exception):
     pass
 
 
+def _cut(text: str, chars_left: Optional[int], tokens_left: Optional[int]) -> Tuple[str, int, bool]:
+    """Teksta daļa, kas ietilpst atlikušajā budžetā: (teksts, tā tokeni, vai nogriezts)."""
+    truncated = False
+    if chars_left is not None and len(text) > chars_left:
+        text, truncated = text[:chars_left], True
+    tokens = 0
+    if tokens_left is not None:
+        tokens = count_tokens(text)
+        if tokens > tokens_left:
+            text, tokens, truncated = truncate_to_tokens(text, tokens_left), tokens_left, True
+    return text, tokens, truncated
+
+
 class DocumentParser:
     """
     Universālais dokumentu parseris AI Tender sistēmai.
-    Spēj apstrādāt: PDF, DOCX, DOC, TXT, RTF, ZIP, EDOC.
+    Spēj apstrādāt: PDF, DOCX, TXT, RTF, ZIP, EDOC (arī ligzdotus arhīvus).
+    Formāts tiek noteikts pēc satura (formats.py), nevis paplašinājuma.
     Atgriež strukturētu rezultātu:
     {
         "filename": "...",
         "text": "... pilns teksts ...",
         "chunks": [...],
-        "type": "pdf/docx/zip/edoc",
+        "type": "pdf/docx/text/zip/edoc",
+        "pages": [...],       # tikai PDF
+        "documents": [...],   # tikai ZIP/EDOC – iekšējo failu indekss
     }
     """
 
@@ -30,141 +56,285 @@ class DocumentParser:
     # PDF
     # =========================================================
     @staticmethod
-    def extract_pdf(path: Path) -> str:
+    def extract_pdf_pages(path: Path, parallel: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Lapu saraksts [{"page": n, "text": ...}]. Lieliem PDF lapas tiek
+        izvilktas paralēli procesu pūlā (skat. pdf_pages.py).
+        """
+        from pdf_pages import extract_pages
+
         try:
-            reader = PdfReader(str(path))
-            text = "\n".join((page.extract_text() or "") for page in reader.pages)
-            return text
+            return extract_pages(path, parallel=parallel)
         except Exception as e:
             raise DocumentParserError(f"PDF extraction error: {e}")
 
+    @staticmethod
+    def extract_pdf(path: Path) -> str:
+        pages = DocumentParser.extract_pdf_pages(path)
+        return "\n".join(p["text"] for p in pages)
+
     # =========================================================
     # DOCX
     # =========================================================
     @staticmethod
-    def extract_docx(path: Path) -> str:
+    def extract_docx(source: Union[Path, BinaryIO]) -> str:
         try:
-            d = docx.Document(str(path))
-            return "\n".join(p.text for p in d.paragraphs)
-        except Exception as e:
-            raise DocumentParserError(f"DOCX extraction error: {e}")
+            return formats.docx_text(Path(source) if isinstance(source, str) else source)
+        except FormatError as e:
+            raise DocumentParserError(str(e))
 
     # =========================================================
-    # ZIP
+    # ARHĪVI (ZIP / EDOC) – bez pagaidu failiem
     # =========================================================
     @staticmethod
-    def extract_zip(path: Path) -> str:
-        tmp_dir = Path(tempfile.mkdtemp(prefix="zip_"))
-        texts = []
+    def _archive_documents(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Neatbalstītie iekšējie faili – ar atzīmi tekstā, lai tie būtu redzami AI un lietotājam."""
+        label = result["type"].upper()
+        return [
+            dict(d, text=f"[UNSUPPORTED {label} ITEM: {d['name']}]") if d["type"] == "unsupported" else d
+            for d in result["documents"]
+        ]
+
+    @staticmethod
+    def _join_documents(documents: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Apvieno iekšējo failu tekstus vienā tekstā un atgriež katra faila
+        atrašanās vietu tajā (offset/length), lai teksts netiktu glabāts divreiz.
+        """
+        parts: List[str] = []
+        index: List[Dict[str, Any]] = []
+        offset = 0
+
+        for i, doc in enumerate(documents):
+            if i:
+                parts.append(ARCHIVE_SEPARATOR)
+                offset += len(ARCHIVE_SEPARATOR)
+            parts.append(doc["text"])
+            index.append({"name": doc["name"], "type": doc["type"], "offset": offset, "length": len(doc["text"])})
+            offset += len(doc["text"])
 
+        return "".join(parts), index
+
+    @staticmethod
+    def split_documents(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Sadala extract() rezultātu pa iekšējiem failiem:
+        [{"name": ..., "type": ..., "text": ...}]. Vienkāršam failam – viens ieraksts.
+        """
+        if "documents" not in data:
+            return [{"name": data["filename"], "type": data["type"], "text": data["text"]}]
+
+        text = data["text"]
+        return [
+            {"name": d["name"], "type": d["type"], "text": text[d["offset"]:d["offset"] + d["length"]]}
+            for d in data["documents"]
+        ]
+
+    @staticmethod
+    def _extract_archive_documents(path: Path, kind: str) -> List[Dict[str, Any]]:
         try:
-            with zipfile.ZipFile(path, "r") as zf:
-                zf.extractall(tmp_dir)
-        except Exception as e:
-            raise DocumentParserError(f"ZIP extraction error: {e}")
+            result = formats.handler_for(kind).parse(Path(path), Path(path).name)
+        except FormatError as e:
+            raise DocumentParserError(str(e))
+        return DocumentParser._archive_documents(result)
 
-        for file in tmp_dir.rglob("*"):
-            if not file.is_file():
-                continue
+    @staticmethod
+    def extract_zip_documents(path: Path) -> List[Dict[str, Any]]:
+        """
+        ZIP faili tiek lasīti tieši no arhīva (atmiņā vai spooled buferī)
+        un parsēti paralēli; rezultāti – arhīva secībā.
+        """
+        return DocumentParser._extract_archive_documents(path, "zip")
 
-            ext = file.suffix.lower()
+    @staticmethod
+    def extract_zip(path: Path) -> str:
+        text, _ = DocumentParser._join_documents(DocumentParser.extract_zip_documents(path))
+        return text
 
-            if ext == ".pdf":
-                texts.append(DocumentParser.extract_pdf(file))
-            elif ext == ".docx":
-                texts.append(DocumentParser.extract_docx(file))
-            elif ext in {".txt", ".rtf"}:
-                texts.append(file.read_text(encoding="utf-8", errors="ignore"))
-            else:
-                texts.append(f"[UNSUPPORTED ZIP ITEM: {file.name}]")
+    @staticmethod
+    def extract_edoc_documents(path: Path) -> List[Dict[str, Any]]:
+        return DocumentParser._extract_archive_documents(path, "edoc")
 
-        return "\n\n-----\n\n".join(texts)
+    @staticmethod
+    def extract_edoc(path: Path) -> str:
+        text, _ = DocumentParser._join_documents(DocumentParser.extract_edoc_documents(path))
+        return text
 
     # =========================================================
-    # EDOC
+    # PAKĀPENISKA EKSTRAKCIJA – priekšskatījums bez pilnas parsēšanas
     # =========================================================
     @staticmethod
-    def extract_edoc(path: Path) -> str:
+    def iter_text(path: Path) -> Iterator[Dict[str, Any]]:
+        """
+        Teksts pa lapām (PDF), rindkopām (DOCX) un arhīva failiem:
+        {"document", "type", "text", "first", "sep", "page"?} (skat. formats.iter_file).
+        Iterāciju var pārtraukt jebkurā brīdī – pārējais netiek parsēts.
+        """
+        path = Path(path)
+        return DocumentParser._segments(path, formats.sniff(path))
+
+    @staticmethod
+    def _segments(path: Path, kind: str) -> Iterator[Dict[str, Any]]:
+        label = kind.upper()
         try:
-            inner_files = unpack_edoc(path)
-        except EdocError as e:
-            raise DocumentParserError(f"EDOC extraction error: {e}")
+            for seg in formats.iter_file(path, kind):
+                if seg["type"] == "unsupported":
+                    seg = dict(seg, text=f"[UNSUPPORTED {label} ITEM: {seg['document']}]")
+                yield seg
+        except FormatError as e:
+            raise DocumentParserError(str(e))
 
-        texts = []
+    @staticmethod
+    def preview(
+        path: Path,
+        max_chars: Optional[int] = PREVIEW_CHARS,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Teksta sākums līdz max_chars simboliem un/vai max_tokens tokeniem.
+        Parsē tikai tik lapu un arhīva failu, cik nepieciešams, tāpēc
+        milzīgam arhīvam atbild tikpat ātri kā mazam. Teksts sakrīt ar
+        extract()["text"] sākumu. Rezultāts netiek kešots.
+        {"filename", "type", "text", "truncated", "documents": [nosaukumi]}
+        """
+        path = Path(path)
+        kind = formats.sniff(path)
+        parts: List[str] = []
+        documents: List[str] = []
+        length = tokens = 0
+        truncated = False
 
-        for f in inner_files:
-            ext = f.suffix.lower()
+        segments = DocumentParser._segments(path, kind)
+        with metrics.stage("preview", kind) as span:
+            try:
+                for seg in segments:
+                    if seg["first"]:
+                        documents.append(seg["document"])
+                        sep = ARCHIVE_SEPARATOR if len(documents) > 1 else ""
+                    else:
+                        sep = seg["sep"]
+                    span.pages += "page" in seg
 
-            if ext == ".pdf":
-                texts.append(DocumentParser.extract_pdf(f))
-            elif ext == ".docx":
-                texts.append(DocumentParser.extract_docx(f))
-            elif ext in {".txt", ".rtf"}:
-                texts.append(f.read_text(encoding="utf-8", errors="ignore"))
-            else:
-                texts.append(f"[UNSUPPORTED EDOC ITEM: {f.name}]")
+                    piece, piece_tokens, truncated = _cut(
+                        sep + seg["text"],
+                        None if max_chars is None else max_chars - length,
+                        None if max_tokens is None else max_tokens - tokens,
+                    )
+                    parts.append(piece)
+                    length += len(piece)
+                    tokens += piece_tokens
+                    if truncated:
+                        break
+            finally:
+                segments.close()
 
-        return "\n\n-----\n\n".join(texts)
+        return {"filename": path.name, "type": kind, "text": "".join(parts),
+                "truncated": truncated, "documents": documents}
+
+    @staticmethod
+    async def preview_async(
+        path: Path,
+        content_hash: Optional[str] = None,
+        max_chars: Optional[int] = PREVIEW_CHARS,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        preview() I/O pavedienā (bez procesu pūla starta). Ja pilnā ekstrakcija
+        jau ir kešā, priekšskatījums tiek nogriezts no tās; bez content_hash
+        kešs netiek pārbaudīts, lai nebūtu jāhešo viss fails.
+        """
+        path = Path(path)
+        if content_hash:
+            key = extraction_cache.key_for(path, "document_parser", PARSER_VERSION, content_hash)
+            cached = await run_io(extraction_cache.get, key)
+            if cached is not None:
+                return DocumentParser._preview_cached(dict(cached, filename=path.name), max_chars, max_tokens)
+
+        return await run_io(DocumentParser.preview, path, max_chars, max_tokens)
+
+    @staticmethod
+    def _preview_cached(data: Dict[str, Any], max_chars: Optional[int], max_tokens: Optional[int]) -> Dict[str, Any]:
+        text = data["text"]
+        if max_chars is None and max_tokens is not None:
+            text = text[:max_tokens * MAX_CHARS_PER_TOKEN]
+        cut, _, truncated = _cut(text, max_chars, max_tokens)
+        documents = [d["name"] for d in data.get("documents", ()) if d["offset"] <= len(cut)]
+        return {"filename": data["filename"], "type": data["type"], "text": cut,
+                "truncated": truncated or len(text) < len(data["text"]),
+                "documents": documents or [data["filename"]]}
 
     # =========================================================
     # UNIVERSĀLĀ FUNKCIJA
     # =========================================================
     @staticmethod
-    def extract(path: Path) -> Dict[str, Any]:
+    def extract(
+        path: Path,
+        content_hash: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
         """
         Atgriež strukturētu rezultātu.
+        Rezultāts tiek kešots pēc satura SHA-256 (+ PARSER_VERSION),
+        tāpēc atkārtoti augšupielādēts fails netiek parsēts vēlreiz.
         """
         path = Path(path)
-        ext = path.suffix.lower()
-
-        # EDOC
-        if is_edoc(path):
-            text = DocumentParser.extract_edoc(path)
-            return {
-                "filename": path.name,
-                "text": text,
-                "chunks": text.split("\n\n"),
-                "type": "edoc"
-            }
-
-        # PDF
-        if ext == ".pdf":
-            text = DocumentParser.extract_pdf(path)
-            return {
-                "filename": path.name,
-                "text": text,
-                "chunks": text.split("\n\n"),
-                "type": "pdf"
-            }
-
-        # DOCX
-        if ext == ".docx":
-            text = DocumentParser.extract_docx(path)
-            return {
-                "filename": path.name,
-                "text": text,
-                "chunks": text.split("\n\n"),
-                "type": "docx"
-            }
-
-        # TXT / RTF
-        if ext in {".txt", ".rtf"}:
-            text = path.read_text(encoding="utf-8", errors="ignore")
-            return {
-                "filename": path.name,
-                "text": text,
-                "chunks": text.split("\n\n"),
-                "type": "text"
-            }
-
-        # ZIP
-        if ext == ".zip":
-            text = DocumentParser.extract_zip(path)
-            return {
-                "filename": path.name,
-                "text": text,
-                "chunks": text.split("\n\n"),
-                "type": "zip"
-            }
-
-        raise DocumentParserError(f"Unsupported file type: {ext}")
+        if not use_cache:
+            return DocumentParser._extract_uncached(path)
+
+        key = extraction_cache.key_for(path, "document_parser", PARSER_VERSION, content_hash)
+        cached = extraction_cache.get(key)
+        if cached is not None:
+            return dict(cached, filename=path.name)
+
+        data = DocumentParser._extract_uncached(path)
+        extraction_cache.put(key, data)
+        return data
+
+    @staticmethod
+    async def extract_async(
+        path: Path,
+        content_hash: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Tas pats, kas extract(), bet nebloķē event loop:
+        keša pārbaude notiek I/O pavedienā, parsēšana – procesu pūlā.
+        Kešs tiek pārbaudīts šajā procesā, lai statistika būtu kopīga.
+        """
+        path = Path(path)
+        if not use_cache:
+            return await metrics.run_cpu_measured(DocumentParser._extract_uncached, path)
+
+        key = await run_io(extraction_cache.key_for, path, "document_parser", PARSER_VERSION, content_hash)
+        cached = await run_io(extraction_cache.get, key)
+        if cached is not None:
+            return dict(cached, filename=path.name)
+
+        data = await metrics.run_cpu_measured(DocumentParser._extract_uncached, path)
+        await run_io(extraction_cache.put, key, data)
+        return data
+
+    @staticmethod
+    def _extract_uncached(path: Path) -> Dict[str, Any]:
+        """
+        Izpildās procesu pūlā. Formāts – pēc satura (formats.sniff), tāpēc
+        .zip, kas patiesībā ir ASiC-E, tiek apstrādāts kā EDOC, bet .doc,
+        kas patiesībā ir DOCX, – kā DOCX.
+        """
+        path = Path(path)
+        try:
+            result = formats.parse_file(path)
+        except FormatError as e:
+            raise DocumentParserError(str(e))
+
+        data: Dict[str, Any] = {"filename": path.name, "type": result["type"]}
+        if "documents" in result:
+            text, documents = DocumentParser._join_documents(DocumentParser._archive_documents(result))
+            data.update(text=text, documents=documents)
+        else:
+            text = result["text"]
+            data["text"] = text
+            if "pages" in result:
+                data["pages"] = result["pages"]
+        data["chunks"] = chunk_texts(text)
+        return data
@@ -0,0 +1,160 @@
+# docx_stream.py
+
+from __future__ import annotations
+
+import re
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Set, Union
+from xml.etree.ElementTree import Element, ParseError, iterparse
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# mc:AlternateContent – Fallback atkārto Choice saturu (teksta lodziņi), to izlaiž
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+DOCUMENT_PART = "word/document.xml"
+HEADER_PART = re.compile(r"^word/header(\d*)\.xml$")
+FOOTER_PART = re.compile(r"^word/footer(\d*)\.xml$")
+
+# Šūnu atdalītājs tabulas rindā
+CELL_SEPARATOR = " | "
+
+_RUN_TEXT = {f"{W}tab": "\t", f"{W}br": "\n", f"{W}cr": "\n", f"{W}noBreakHyphen": "-"}
+
+
+class DocxStreamError(Exception):
+    """DOCX konteineris vai tā XML ir bojāts."""
+
+
+def _part_order(name: str, pattern: re.Pattern) -> int:
+    number = pattern.match(name).group(1)
+    return int(number) if number else 0
+
+
+def _parts(zf: zipfile.ZipFile, pattern: re.Pattern) -> List[str]:
+    return sorted((n for n in zf.namelist() if pattern.match(n)), key=lambda n: _part_order(n, pattern))
+
+
+class _Table:
+    __slots__ = ("row", "cell")
+
+    def __init__(self):
+        self.row: Optional[List[str]] = None
+        self.cell: Optional[List[str]] = None
+
+
+def iter_part(stream: BinaryIO) -> Iterator[str]:
+    """
+    Viena WordprocessingML daļas (document.xml, header*.xml, ...) teksta bloki
+    dokumenta secībā: rindkopa – viens bloks, tabulas rinda – viens bloks
+    ("šūna | šūna | ..."). Ligzdotas tabulas tiek saplacinātas ārējās tabulas
+    šūnā, teksta lodziņi – atsevišķi bloki pirms rindkopas, kurā tie atrodas.
+
+    XML tiek lasīts ar iterparse, un apstrādātie elementi tiek uzreiz
+    atbrīvoti, tāpēc atmiņa nav atkarīga no dokumenta garuma.
+    """
+    paragraphs: List[List[str]] = []
+    tables: List[_Table] = []
+    container: Optional[Element] = None
+    skip = 0
+
+    for event, elem in iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+
+        if event == "start":
+            if tag == MC_FALLBACK:
+                skip += 1
+            elif skip:
+                pass
+            elif tag == f"{W}p":
+                paragraphs.append([])
+            elif tag == f"{W}tbl":
+                tables.append(_Table())
+            elif tag == f"{W}tr":
+                tables[-1].row = []
+            elif tag == f"{W}tc":
+                tables[-1].cell = []
+            elif tag in (f"{W}body", f"{W}hdr", f"{W}ftr"):
+                container = elem
+            continue
+
+        if skip:
+            if tag == MC_FALLBACK:
+                skip -= 1
+                elem.clear()
+            continue
+
+        if tag == f"{W}t":
+            if paragraphs:
+                paragraphs[-1].append(elem.text or "")
+        elif tag in _RUN_TEXT:
+            if paragraphs:
+                paragraphs[-1].append(_RUN_TEXT[tag])
+        elif tag == f"{W}p":
+            text = "".join(paragraphs.pop())
+            if tables and tables[-1].cell is not None:
+                tables[-1].cell.append(text)
+            else:
+                yield text
+        elif tag == f"{W}tc":
+            table = tables[-1]
+            table.row.append(" ".join(p.strip() for p in table.cell if p.strip()))
+            table.cell = None
+        elif tag == f"{W}tr":
+            cells = tables[-1].row
+            tables[-1].row = None
+            if any(cells):
+                row = CELL_SEPARATOR.join(cells)
+                if len(tables) > 1 and tables[-2].cell is not None:
+                    tables[-2].cell.append(row)
+                else:
+                    yield row
+        elif tag == f"{W}tbl":
+            tables.pop()
+        else:
+            continue
+
+        # Augšējā līmeņa bloks pabeigts – atbrīvo visus body/hdr/ftr bērnus
+        if container is not None and not paragraphs and not tables:
+            container.clear()
+
+
+def iter_blocks(source: Union[Path, BinaryIO], headers: bool = True) -> Iterator[str]:
+    """
+    DOCX teksta bloki: galvenes (bez atkārtojumiem), dokumenta saturs
+    (rindkopas un tabulu rindas), kājenes. Tukšas galvenes/kājenes izlaiž.
+    """
+    try:
+        zf = zipfile.ZipFile(source)
+    except zipfile.BadZipFile as e:
+        raise DocxStreamError(str(e))
+
+    with zf:
+        if DOCUMENT_PART not in zf.namelist():
+            raise DocxStreamError(f"{DOCUMENT_PART} not found")
+
+        seen: Set[str] = set()
+        try:
+            if headers:
+                yield from _unique_blocks(zf, _parts(zf, HEADER_PART), seen)
+            with zf.open(DOCUMENT_PART) as stream:
+                yield from iter_part(stream)
+            if headers:
+                yield from _unique_blocks(zf, _parts(zf, FOOTER_PART), seen)
+        except (ParseError, zipfile.BadZipFile, EOFError) as e:
+            raise DocxStreamError(str(e))
+
+
+def _unique_blocks(zf: zipfile.ZipFile, parts: List[str], seen: Set[str]) -> Iterator[str]:
+    # Pirmās lapas / pāra lapu galvenes parasti atkārto noklusēto
+    for part in parts:
+        with zf.open(part) as stream:
+            for block in iter_part(stream):
+                key = block.strip()
+                if key and key not in seen:
+                    seen.add(key)
+                    yield block
+
+
+def docx_text(source: Union[Path, BinaryIO]) -> str:
+    return "\n".join(iter_blocks(source))
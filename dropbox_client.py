@@ -1,9 +1,21 @@
 import os
-import tempfile
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 
-import dropbox
-from dropbox.files import FileMetadata, FolderMetadata
+import metrics
+from blob_store import blob_store, DropboxContentHasher
+
+# Dropbox SDK tiek importēts pirmajā API izsaukumā, nevis servera startā
+if TYPE_CHECKING:
+    import dropbox
+    from dropbox.files import FileMetadata
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+DROPBOX_MAX_CONNECTIONS = int(os.getenv("DROPBOX_MAX_CONNECTIONS", "16"))
+DROPBOX_DOWNLOAD_CONCURRENCY = int(os.getenv("DROPBOX_DOWNLOAD_CONCURRENCY", "8"))
+DROPBOX_DOWNLOAD_CHUNK_SIZE = int(os.getenv("DROPBOX_DOWNLOAD_CHUNK_KB", "1024")) * 1024
 
 
 class DropboxClient:
@@ -12,14 +24,33 @@ class DropboxClient:
     Funkcionalitāte:
     • rekursīva mapju nolasīšana
     • failu tipu identifikācija
-    • jebkura faila lejupielāde pagaidu mapē
+    • jebkura faila lejupielāde lokālajā blob krātuvē (bez dublikātiem)
+    • vairāku failu paralēla lejupielāde
     """
 
     def __init__(self, access_token: str):
         if not access_token:
             raise ValueError("Dropbox access token is missing")
 
-        self.dbx = dropbox.Dropbox(access_token)
+        self._access_token = access_token
+        self._dbx: Optional["dropbox.Dropbox"] = None
+        self._dbx_lock = threading.Lock()
+
+        # content_hash -> Future: viens un tas pats fails netiek lejupielādēts divreiz vienlaikus
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def dbx(self) -> "dropbox.Dropbox":
+        if self._dbx is None:
+            with self._dbx_lock:
+                if self._dbx is None:
+                    import dropbox
+
+                    # Viens kopīgs HTTP savienojumu pūls visām lejupielādēm
+                    session = dropbox.create_session(max_connections=DROPBOX_MAX_CONNECTIONS)
+                    self._dbx = dropbox.Dropbox(self._access_token, session=session)
+        return self._dbx
 
     # =====================================================================================
     # 1. Failu tipa atpazīšana
@@ -55,42 +86,191 @@ class DropboxClient:
             ...
         ]
         """
-        try:
-            result = self.dbx.files_list_folder(path, recursive=True)
-        except Exception as e:
-            raise RuntimeError(f"Dropbox tree read error: {str(e)}")
+        from dropbox.files import FileMetadata
 
         output = []
 
-        for entry in result.entries:
-            if isinstance(entry, FileMetadata):
-                output.append({
-                    "name": entry.name,
-                    "path": entry.path_lower,
-                    "type": self.detect_file_type(entry.name),
-                    "size": entry.size
-                })
+        try:
+            with metrics.stage("dropbox", "list"):
+                result = self.dbx.files_list_folder(path, recursive=True)
+
+                while True:
+                    for entry in result.entries:
+                        if isinstance(entry, FileMetadata):
+                            output.append({
+                                "name": entry.name,
+                                "path": entry.path_lower,
+                                "type": self.detect_file_type(entry.name),
+                                "size": entry.size,
+                                "content_hash": entry.content_hash,
+                            })
+
+                    # Lielām mapēm Dropbox atgriež rezultātu pa lapām
+                    if not result.has_more:
+                        break
+                    result = self.dbx.files_list_folder_continue(result.cursor)
+        except Exception as e:
+            raise RuntimeError(f"Dropbox tree read error: {str(e)}")
 
         return output
 
     # =====================================================================================
-    # 3. Failu lejupielāde pagaidu direktorijā
+    # 3. Failu lejupielāde lokālajā blob krātuvē
     # =====================================================================================
-    def download_file(self, dropbox_path: str) -> str:
+    def download_file(
+        self,
+        dropbox_path: str,
+        metadata: Optional["FileMetadata"] = None,
+        content_hash: Optional[str] = None,
+        pin: bool = False,
+    ) -> str:
         """
-        Lejupielādē failu no Dropbox un saglabā to pagaidu mapē.
-        Atgriež lokālo faila ceļu.
+        Lejupielādē failu no Dropbox (ja tā satura vēl nav lokāli) un
+        atgriež lokālo faila ceļu ar oriģinālo nosaukumu.
+
+        content_hash – jau zināms no list_tree: ja saturs ir lokāli, get_metadata
+        netiek izsaukts. pin=True – objekts paliek piesprausts blob krātuvē
+        (netiek dzēsts), līdz izsaucējs izsauc release(content_hash).
         """
         try:
-            _, ext = os.path.splitext(dropbox_path)
-            tmp_fd, tmp_path = tempfile.mkstemp(suffix=ext)
-            os.close(tmp_fd)
-
-            with open(tmp_path, "wb") as f:
-                metadata, response = self.dbx.files_download(path=dropbox_path)
-                f.write(response.content)
+            if metadata is None and not (content_hash and blob_store.has(content_hash)):
+                metadata = self._file_metadata(dropbox_path, content_hash)
+            if metadata is not None:
+                content_hash = metadata.content_hash
+            name = metadata.name if metadata is not None else Path(dropbox_path).name
 
-            return tmp_path
+            blob_store.pin(content_hash)
+            try:
+                path = blob_store.path_for(content_hash, name)
+                if path is None:
+                    # Nav lokāli vai izdzēsts kopš has() – tas pats, kas neesošs
+                    if metadata is None:
+                        metadata = self._file_metadata(dropbox_path, content_hash)
+                    self._download_once(metadata)
+                    path = blob_store.path_for(content_hash, name)
+                    if path is None:
+                        raise RuntimeError("downloaded content was removed from the local store")
+            except BaseException:
+                blob_store.unpin(content_hash)
+                raise
+            if not pin:
+                blob_store.unpin(content_hash)
+            return str(path)
 
         except Exception as e:
             raise RuntimeError(f"Dropbox download error for {dropbox_path}: {str(e)}")
+
+    def release(self, content_hash: str) -> None:
+        """Atbrīvo download_file(pin=True) piespraustu objektu."""
+        blob_store.unpin(content_hash)
+
+    def get_metadata(self, dropbox_path: str):
+        with metrics.stage("dropbox", "metadata"):
+            return self.dbx.files_get_metadata(dropbox_path)
+
+    def _file_metadata(self, dropbox_path: str, content_hash: Optional[str] = None) -> "FileMetadata":
+        from dropbox.files import FileMetadata
+
+        metadata = self.get_metadata(dropbox_path)
+        if not isinstance(metadata, FileMetadata):
+            raise ValueError("path is not a file")
+        if content_hash and metadata.content_hash != content_hash:
+            raise ValueError("file changed since it was listed")
+        return metadata
+
+    def _download_once(self, metadata: "FileMetadata") -> None:
+        """
+        Ja šis saturs jau tiek lejupielādēts citā pavedienā – gaidām to pašu rezultātu.
+        """
+        content_hash = metadata.content_hash
+
+        with self._inflight_lock:
+            future = self._inflight.get(content_hash)
+            owner = future is None
+            if owner:
+                # Iepriekšējais lejupielādētājs varēja pabeigt (commit) starp mūsu
+                # path_for un šo brīdi – commit notiek pirms ieraksta izņemšanas
+                if blob_store.has(content_hash):
+                    return
+                future = Future()
+                self._inflight[content_hash] = future
+
+        if not owner:
+            future.result()
+            return
+
+        try:
+            self._stream_to_blob(metadata)
+            future.set_result(None)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(content_hash, None)
+
+    def _stream_to_blob(self, metadata: "FileMetadata") -> None:
+        """
+        Straumē failu uz disku pa gabaliem (bez pilna satura atmiņā)
+        un pārbauda Dropbox content_hash.
+        """
+        content_hash = metadata.content_hash
+        incoming = blob_store.incoming_path(content_hash)
+        hasher = DropboxContentHasher()
+
+        with metrics.stage("dropbox", "download") as span:
+            # Lejupielādējam konkrētu revīziju, lai saturs atbilstu content_hash
+            _, response = self.dbx.files_download(path=metadata.path_lower, rev=metadata.rev)
+            try:
+                with open(incoming, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=DROPBOX_DOWNLOAD_CHUNK_SIZE):
+                        hasher.update(chunk)
+                        f.write(chunk)
+                        span.bytes += len(chunk)
+            except BaseException:
+                incoming.unlink(missing_ok=True)
+                raise
+            finally:
+                response.close()
+
+        if hasher.hexdigest() != content_hash:
+            incoming.unlink(missing_ok=True)
+            raise RuntimeError(f"content_hash mismatch for {metadata.path_display}")
+
+        blob_store.commit(content_hash, incoming)
+
+    # =====================================================================================
+    # 4. Vairāku failu paralēla lejupielāde
+    # =====================================================================================
+    def download_files(
+        self,
+        dropbox_paths: List[str],
+        max_concurrency: int = DROPBOX_DOWNLOAD_CONCURRENCY,
+    ) -> List[Dict[str, Any]]:
+        """
+        Lejupielādē vairākus failus paralēli (ierobežots pavedienu skaits,
+        kopīgs HTTP pūls). Faili, kuru content_hash jau ir lokāli, netiek
+        lejupielādēti. Rezultāts – tādā pašā secībā kā dropbox_paths:
+        [{"path": ..., "local_path": ..., "content_hash": ..., "cached": bool, "error": ...}]
+        """
+        def _one(path: str) -> Dict[str, Any]:
+            try:
+                metadata = self._file_metadata(path)
+                cached = blob_store.has(metadata.content_hash)
+                local_path = self.download_file(path, metadata)
+                return {
+                    "path": path,
+                    "local_path": local_path,
+                    "content_hash": metadata.content_hash,
+                    "cached": cached,
+                    "error": None,
+                }
+            except Exception as e:
+                return {"path": path, "local_path": None, "content_hash": None, "cached": False, "error": str(e)}
+
+        if not dropbox_paths:
+            return []
+
+        workers = max(1, min(max_concurrency, len(dropbox_paths)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dropbox-dl") as pool:
+            return list(pool.map(_one, dropbox_paths))
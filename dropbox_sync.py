@@ -0,0 +1,327 @@
+# dropbox_sync.py
+
+from __future__ import annotations
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional
+
+from dropbox_client import DropboxClient
+
+# Dropbox SDK tiek importēts pirmajā sinhronizācijā, nevis servera startā
+if TYPE_CHECKING:
+    from dropbox.exceptions import ApiError
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+DROPBOX_INDEX_PATH = Path(os.getenv("DROPBOX_INDEX_PATH", "/tmp/ai-iepirkumi-cache/dropbox_index.sqlite3"))
+DROPBOX_LIST_LIMIT = int(os.getenv("DROPBOX_LIST_LIMIT", "2000"))
+DROPBOX_SYNC_MIN_INTERVAL = float(os.getenv("DROPBOX_SYNC_MIN_INTERVAL", "30"))
+DROPBOX_LONGPOLL_TIMEOUT = int(os.getenv("DROPBOX_LONGPOLL_TIMEOUT", "120"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path_lower      TEXT PRIMARY KEY,
+    path_display    TEXT NOT NULL,
+    name            TEXT NOT NULL,
+    type            TEXT NOT NULL,
+    is_folder       INTEGER NOT NULL,
+    size            INTEGER,
+    content_hash    TEXT,
+    rev             TEXT,
+    server_modified TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_type ON entries (type);
+CREATE TABLE IF NOT EXISTS cursors (
+    root      TEXT PRIMARY KEY,
+    cursor    TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+class DropboxSyncError(Exception):
+    """Kļūda, sinhronizējot Dropbox metadatu indeksu."""
+
+
+def _normalize_root(root: str) -> str:
+    root = (root or "").strip().rstrip("/")
+    if root and not root.startswith("/"):
+        root = "/" + root
+    return root.lower()
+
+
+class DropboxSyncEngine:
+    """
+    Lokāls Dropbox metadatu indekss (SQLite).
+
+    • pirmā sinhronizācija – pilns saraksts ar files_list_folder + _continue
+      (ievērojot has_more), kursors tiek saglabāts pēc katras lapas
+    • turpmāk – tikai izmaiņas no saglabātā kursora
+    • pēc izvēles – fona longpoll pavediens, kas izmaiņas pielieto uzreiz
+    • vaicājumi (lapošana, filtrs pēc tipa) tiek apkalpoti no lokālā indeksa
+    """
+
+    def __init__(self, client: DropboxClient, db_path: Path = DROPBOX_INDEX_PATH):
+        self.client = client
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._sync_lock = threading.Lock()
+        self._longpoll_threads: Dict[str, threading.Thread] = {}
+        self._stop = threading.Event()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # =====================================================================================
+    # 1. Kursori
+    # =====================================================================================
+    def _get_cursor(self, root: str) -> Optional[sqlite3.Row]:
+        with self._connect() as conn:
+            return conn.execute("SELECT cursor, synced_at FROM cursors WHERE root = ?", (root,)).fetchone()
+
+    def _save_cursor(self, conn: sqlite3.Connection, root: str, cursor: str) -> None:
+        conn.execute(
+            "INSERT INTO cursors (root, cursor, synced_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(root) DO UPDATE SET cursor = excluded.cursor, synced_at = excluded.synced_at",
+            (root, cursor, time.time()),
+        )
+
+    # =====================================================================================
+    # 2. Izmaiņu pielietošana
+    # =====================================================================================
+    def _apply(self, conn: sqlite3.Connection, entries: Iterable[Any]) -> Dict[str, int]:
+        from dropbox.files import DeletedMetadata, FileMetadata, FolderMetadata
+
+        upserts = 0
+        deletes = 0
+
+        for entry in entries:
+            if isinstance(entry, DeletedMetadata):
+                conn.execute(
+                    "DELETE FROM entries WHERE path_lower = ? OR path_lower LIKE ? ESCAPE '\\'",
+                    (entry.path_lower, _like_prefix(entry.path_lower)),
+                )
+                deletes += 1
+                continue
+
+            if isinstance(entry, FileMetadata):
+                row = (
+                    entry.path_lower,
+                    entry.path_display,
+                    entry.name,
+                    DropboxClient.detect_file_type(entry.name),
+                    0,
+                    entry.size,
+                    entry.content_hash,
+                    entry.rev,
+                    entry.server_modified.isoformat() if entry.server_modified else None,
+                )
+            elif isinstance(entry, FolderMetadata):
+                row = (entry.path_lower, entry.path_display, entry.name, "folder", 1, None, None, None, None)
+            else:
+                continue
+
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(path_lower, path_display, name, type, is_folder, size, content_hash, rev, server_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            upserts += 1
+
+        return {"upserts": upserts, "deletes": deletes}
+
+    # =====================================================================================
+    # 3. Sinhronizācija
+    # =====================================================================================
+    def sync(self, root: str = "", full: bool = False) -> Dict[str, Any]:
+        """
+        Sinhronizē indeksu ar Dropbox. Ja kursors jau ir – pielieto tikai izmaiņas.
+        Atgriež statistiku: {"full": bool, "pages": n, "upserts": n, "deletes": n}.
+        """
+        root = _normalize_root(root)
+
+        with self._sync_lock:
+            return self._sync_locked(root, full)
+
+    def _sync_locked(self, root: str, full: bool) -> Dict[str, Any]:
+        from dropbox.exceptions import ApiError
+
+        saved = None if full else self._get_cursor(root)
+        stats = {"full": saved is None, "pages": 0, "upserts": 0, "deletes": 0}
+
+        try:
+            if saved is None:
+                result = self.client.dbx.files_list_folder(root, recursive=True, limit=DROPBOX_LIST_LIMIT)
+            else:
+                result = self.client.dbx.files_list_folder_continue(saved["cursor"])
+        except ApiError as e:
+            if saved is not None and _is_reset(e):
+                # Kursors vairs nav derīgs – jāsāk no jauna
+                return self._sync_locked(root, full=True)
+            raise DropboxSyncError(f"Dropbox sync error for '{root or '/'}': {e}")
+        except Exception as e:
+            raise DropboxSyncError(f"Dropbox sync error for '{root or '/'}': {e}")
+
+        first_page = True
+        while True:
+            with self._connect() as conn:
+                if first_page and saved is None:
+                    # Pilna pārlasīšana – vecos ierakstus zem šī ceļa aizvietojam
+                    conn.execute(
+                        "DELETE FROM entries WHERE path_lower = ? OR path_lower LIKE ? ESCAPE '\\'",
+                        (root, _like_prefix(root)),
+                    )
+                applied = self._apply(conn, result.entries)
+                # Kursoru saglabājam tajā pašā transakcijā – pēc avārijas turpinām no šīs lapas
+                self._save_cursor(conn, root, result.cursor)
+
+            first_page = False
+            stats["pages"] += 1
+            stats["upserts"] += applied["upserts"]
+            stats["deletes"] += applied["deletes"]
+
+            if not result.has_more:
+                break
+
+            try:
+                result = self.client.dbx.files_list_folder_continue(result.cursor)
+            except Exception as e:
+                raise DropboxSyncError(f"Dropbox sync error for '{root or '/'}': {e}")
+
+        return stats
+
+    def sync_if_stale(self, root: str = "", max_age: float = DROPBOX_SYNC_MIN_INTERVAL) -> Optional[Dict[str, Any]]:
+        """
+        Sinhronizē tikai tad, ja indekss ir vecāks par max_age sekundēm
+        vai šim ceļam vēl nav kursora. Ja darbojas longpoll, indekss jau ir svaigs.
+        """
+        root = _normalize_root(root)
+        if root in self._longpoll_threads and self._longpoll_threads[root].is_alive():
+            if self._get_cursor(root) is not None:
+                return None
+
+        saved = self._get_cursor(root)
+        if saved is not None and time.time() - saved["synced_at"] < max_age:
+            return None
+        return self.sync(root)
+
+    # =====================================================================================
+    # 4. Longpoll fona pavediens
+    # =====================================================================================
+    def start_longpoll(self, root: str = "") -> None:
+        root = _normalize_root(root)
+        thread = self._longpoll_threads.get(root)
+        if thread is not None and thread.is_alive():
+            return
+
+        thread = threading.Thread(
+            target=self._longpoll_loop, args=(root,), name=f"dropbox-longpoll{root}", daemon=True
+        )
+        self._longpoll_threads[root] = thread
+        thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _longpoll_loop(self, root: str) -> None:
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                saved = self._get_cursor(root)
+                if saved is None:
+                    self.sync(root)
+                    continue
+
+                result = self.client.dbx.files_list_folder_longpoll(
+                    saved["cursor"], timeout=DROPBOX_LONGPOLL_TIMEOUT
+                )
+                if result.changes:
+                    self.sync(root)
+                if result.backoff:
+                    self._stop.wait(result.backoff)
+                delay = 1.0
+            except Exception:
+                # Tīkla kļūdas gadījumā – eksponenciāla pauze, bet pavediens turpina darbu
+                self._stop.wait(delay)
+                delay = min(delay * 2, 300.0)
+
+    # =====================================================================================
+    # 5. Vaicājumi no lokālā indeksa
+    # =====================================================================================
+    def query(
+        self,
+        root: str = "",
+        file_type: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 1000,
+    ) -> Dict[str, Any]:
+        """
+        Faili zem root (rekursīvi), sakārtoti pēc ceļa, ar lapošanu un tipa filtru.
+        """
+        root = _normalize_root(root)
+
+        where = ["is_folder = 0"]
+        params: List[Any] = []
+        if root:
+            where.append("path_lower LIKE ? ESCAPE '\\'")
+            params.append(_like_prefix(root))
+        if file_type:
+            where.append("type = ?")
+            params.append(file_type.lower())
+
+        clause = " AND ".join(where)
+
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM entries WHERE {clause}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT path_lower, name, type, size, content_hash, server_modified FROM entries "
+                f"WHERE {clause} ORDER BY path_lower LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+
+        return {
+            "total": total,
+            "files": [
+                {
+                    "name": r["name"],
+                    "path": r["path_lower"],
+                    "type": r["type"],
+                    "size": r["size"],
+                    "content_hash": r["content_hash"],
+                    "server_modified": r["server_modified"],
+                }
+                for r in rows
+            ],
+        }
+
+    def get_entry(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM entries WHERE path_lower = ?", (path.lower(),)).fetchone()
+        return dict(row) if row is not None else None
+
+
+def _like_prefix(path_lower: str) -> str:
+    escaped = path_lower.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "/%"
+
+
+def _is_reset(e: "ApiError") -> bool:
+    err = getattr(e, "error", None)
+    return bool(err is not None and getattr(err, "is_reset", lambda: False)())
@@ -3,10 +3,11 @@
 from __future__ import annotations
 
 import shutil
-import tempfile
 import zipfile
 from pathlib import Path
-from typing import List, Iterable
+from typing import Any, List, Iterable
+
+import metrics
 
 # Pēc noklusējuma – ko mēs ņemam no EDOC iekšienes analīzei
 SUPPORTED_INNER_EXTS = {
@@ -23,66 +24,116 @@ class EdocError(Exception):
     """Vispārēja kļūda, apstrādājot EDOC konteineru."""
 
 
-def is_edoc(path: Path) -> bool:
+def edoc_documents(zf: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
     """
-    Vienkārša pārbaude, vai fails izskatās pēc .edoc (pēc paplašinājuma).
+    Atlasa EDOC konteinerā tos ierakstus, kas ir analizējami dokumenti
+    (bez mapēm, parakstiem un metadatiem), konteinera secībā.
     """
-    return path.suffix.lower() == ".edoc"
+    members: List[zipfile.ZipInfo] = []
+
+    for member in zf.infolist():
+        # Ignorē mapes
+        if member.is_dir():
+            continue
+
+        inner_name = member.filename
+        inner_suffix = Path(inner_name).suffix.lower()
+
+        # META-INF/ – konteinera manifests un paraksti, nevis iesniegtie dokumenti
+        if inner_name.upper().startswith("META-INF/"):
+            continue
+
+        # Ignorē tipiskos paraksta/metadatu failus
+        if inner_suffix in {".p7s", ".p7m", ".xml"} and "signature" in inner_name.lower():
+            continue
+
+        # Mūs interesē tikai konkrēti dokumentu tipi
+        if inner_suffix not in SUPPORTED_INNER_EXTS:
+            continue
+
+        members.append(member)
+
+    return members
+
+
+def list_edoc_documents(edoc_file: Path) -> List[str]:
+    """
+    Atgriež EDOC iekšējo dokumentu nosaukumus, neko neizvelkot diskā.
+    """
+    edoc_file = Path(edoc_file)
+
+    if not edoc_file.is_file():
+        raise EdocError(f"EDOC fails '{edoc_file}' neeksistē vai nav fails.")
+
+    try:
+        with zipfile.ZipFile(edoc_file, mode="r") as zf:
+            return [m.filename for m in edoc_documents(zf)]
+    except zipfile.BadZipFile as exc:
+        raise EdocError(
+            f"Fails '{edoc_file}' nav derīgs EDOC/ZIP konteineris."
+        ) from exc
 
 
-def unpack_edoc(edoc_file: Path, work_dir: Path | None = None) -> List[Path]:
+def unpack_edoc(edoc_file: Path, work_dir: Path | None = None, budget: Any = None) -> List[Path]:
     """
     Atver .edoc (ASiC-E/ZIP) konteineru, izvelk tikai
     atbalstītos dokumentus un atgriež to ceļus.
 
     :param edoc_file: Ceļš uz .edoc failu.
-    :param work_dir:  Pagaidu darba direktorija (ja None – izveido pats).
+    :param work_dir:  Darba direktorija, ieteicams Workspace.subdir(...)
+                      (ja None – izveido pats; tad izsaucējam tā jādzēš).
+    :param budget:    Objekts ar consume(n) (Workspace / UploadBudget) – baitu kvota.
     :return:          Saraksts ar izvilkto failu ceļiem.
     """
-    edoc_file = Path(edoc_file)
+    with metrics.stage("edoc_unpack", "edoc") as span:
+        return _unpack_edoc(Path(edoc_file), work_dir, budget, span)
+
+
+def _unpack_edoc(edoc_file: Path, work_dir: Path | None, budget: Any, span: metrics.Span) -> List[Path]:
 
     if not edoc_file.is_file():
         raise EdocError(f"EDOC fails '{edoc_file}' neeksistē vai nav fails.")
 
     if work_dir is None:
-        # Izveido pagaidu direktoriju vienam EDOC apstrādes ciklam
-        tmp_root = Path(tempfile.mkdtemp(prefix="edoc_"))
+        # Pagaidu direktorija zem WORKSPACE_ROOT – ja izsaucējs to neizdzēš, to novāks janitor
+        from workspace import workspace_manager
+        tmp_root = workspace_manager.scratch_dir("edoc_")
+        owns_dir = True
     else:
         tmp_root = Path(work_dir)
         tmp_root.mkdir(parents=True, exist_ok=True)
+        owns_dir = False
 
     extracted_files: List[Path] = []
 
     try:
         with zipfile.ZipFile(edoc_file, mode="r") as zf:
-            for member in zf.infolist():
-                # Ignorē mapes
-                if member.is_dir():
-                    continue
-
+            for member in edoc_documents(zf):
                 inner_name = member.filename
-                inner_suffix = Path(inner_name).suffix.lower()
-
-                # Ignorē tipiskos paraksta/metadatu failus
-                if inner_suffix in {".p7s", ".p7m", ".xml"} and "signature" in inner_name.lower():
-                    continue
-
-                # Mūs interesē tikai konkrēti dokumentu tipi
-                if inner_suffix not in SUPPORTED_INNER_EXTS:
-                    continue
 
                 # Saglabājam failu “plakanā” struktūrā (bez dziļām mapēm)
                 target_path = tmp_root / Path(inner_name).name
 
+                # Kvota tiek pārbaudīta pirms rakstīšanas (pēc arhīva metadatiem)
+                if budget is not None:
+                    budget.consume(member.file_size)
+
                 with zf.open(member, "r") as src, open(target_path, "wb") as dst:
                     shutil.copyfileobj(src, dst)
+                span.bytes += member.file_size
 
                 extracted_files.append(target_path)
 
     except zipfile.BadZipFile as exc:
+        if owns_dir:
+            shutil.rmtree(tmp_root, ignore_errors=True)
         raise EdocError(
             f"Fails '{edoc_file}' nav derīgs EDOC/ZIP konteineris."
         ) from exc
+    except BaseException:
+        if owns_dir:
+            shutil.rmtree(tmp_root, ignore_errors=True)
+        raise
 
     return extracted_files
 
@@ -0,0 +1,242 @@
+# extraction_cache.py
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+CACHE_DIR = Path(os.getenv("EXTRACTION_CACHE_DIR", "/tmp/ai-iepirkumi-cache/extraction"))
+CACHE_MEMORY_MB = int(os.getenv("EXTRACTION_CACHE_MEMORY_MB", "128"))
+CACHE_DISK_MB = int(os.getenv("EXTRACTION_CACHE_DISK_MB", "1024"))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """
+    Aprēķina faila SHA-256 (hex), lasot pa 1 MB gabaliem.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Divu līmeņu kešs ekstrakcijas rezultātiem.
+
+    • atmiņas līmenis – LRU, ierobežots pēc baitiem
+    • diska līmenis  – JSON faili, ierobežoti pēc kopējā izmēra;
+                       pārsniedzot limitu, dzēš senāk lietotos
+
+    Atslēga ir satura SHA-256 + parsera nosaukums/versija (formātu nosaka
+    saturs), tāpēc viens un tas pats fails ar citu nosaukumu vai
+    paplašinājumu arī ir "hit".
+
+    Abos līmeņos glabājas serializēts JSON: get() katru reizi atgriež jaunu
+    objektu, tāpēc izsaucēja izmaiņas nesabojā keša ierakstu.
+    """
+
+    def __init__(
+        self,
+        directory: Path = CACHE_DIR,
+        memory_bytes: int = CACHE_MEMORY_MB * 1024 * 1024,
+        disk_bytes: int = CACHE_DISK_MB * 1024 * 1024,
+    ):
+        self.directory = Path(directory)
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._disk_used: Optional[int] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    # =========================================================
+    # Atslēgas
+    # =========================================================
+    @staticmethod
+    def make_key(content_hash: str, namespace: str, version: str) -> str:
+        raw = f"{namespace}:{version}:{content_hash}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def key_for(
+        self,
+        path: Path,
+        namespace: str,
+        version: str,
+        content_hash: Optional[str] = None,
+    ) -> str:
+        """
+        Atslēga konkrētam failam. Ja satura hash jau ir zināms
+        (piem., aprēķināts augšupielādes laikā), failu vēlreiz nelasa.
+        """
+        path = Path(path)
+        if content_hash is None:
+            content_hash = hash_file(path)
+        return self.make_key(content_hash, namespace, version)
+
+    # =========================================================
+    # Nolasīšana / saglabāšana
+    # =========================================================
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            raw = self._memory.get(key)
+            if raw is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+        if raw is not None:
+            return json.loads(raw)
+
+        disk_path = self._disk_path(key)
+        try:
+            raw = disk_path.read_bytes()
+            value = json.loads(raw)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Atzīmējam kā nesen lietotu diska LRU vajadzībām
+        try:
+            os.utime(disk_path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, raw)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+        with self._lock:
+            self.stores += 1
+            self._remember(key, raw)
+            # Diska apjomu nolasām pirms rakstīšanas, lai jaunais fails netiktu pieskaitīts divreiz
+            self._ensure_disk_usage()
+
+        if len(raw) > self.disk_bytes:
+            return
+
+        disk_path = self._disk_path(key)
+        try:
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = disk_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(raw)
+            previous = disk_path.stat().st_size if disk_path.exists() else 0
+            os.replace(tmp_path, disk_path)
+        except OSError:
+            # Diska kešs ir tikai optimizācija – kļūda nedrīkst apturēt ekstrakciju
+            return
+
+        with self._lock:
+            self._disk_used += len(raw) - previous
+            if self._disk_used > self.disk_bytes:
+                self._evict_disk()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            for f in self.directory.glob("*/*.json"):
+                try:
+                    f.unlink()
+                except OSError:
+                    pass
+            self._disk_used = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_disk_usage()
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "memory_limit_bytes": self.memory_bytes,
+                "disk_bytes": self._disk_used,
+                "disk_limit_bytes": self.disk_bytes,
+            }
+
+    # =========================================================
+    # Iekšējās palīgfunkcijas (izsauc ar paņemtu lock)
+    # =========================================================
+    def _disk_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, raw: bytes) -> None:
+        if len(raw) > self.memory_bytes:
+            return
+
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= len(old)
+
+        self._memory[key] = raw
+        self._memory_used += len(raw)
+
+        while self._memory_used > self.memory_bytes and self._memory:
+            _, old = self._memory.popitem(last=False)
+            self._memory_used -= len(old)
+
+    def _ensure_disk_usage(self) -> None:
+        if self._disk_used is not None:
+            return
+        total = 0
+        for f in self.directory.glob("*/*.json"):
+            try:
+                total += f.stat().st_size
+            except OSError:
+                pass
+        self._disk_used = total
+
+    def _evict_disk(self) -> None:
+        entries = []
+        for f in self.directory.glob("*/*.json"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, f))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+
+        # Atbrīvojam līdz 90% no limita, lai nedzēstu pēc katra ieraksta
+        target = int(self.disk_bytes * 0.9)
+        for _, size, f in entries:
+            if total <= target:
+                break
+            try:
+                f.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+        self._disk_used = total
+
+
+# Viens kopīgs kešs visam procesam
+extraction_cache = ExtractionCache()
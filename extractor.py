@@ -1,18 +1,29 @@
 import base64
-import tempfile
-import zipfile
+import os
 from pathlib import Path
-from typing import List, Optional
-
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse
-
-from PyPDF2 import PdfReader
-import docx
-from docx import Document
-
-# EDOC ekstraktors – izmantojam to, ko jau izveidojām atsevišķā failā
-from edoc_extractor import is_edoc, unpack_edoc, EdocError
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request, UploadFile, File, Form, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+import formats
+import metrics
+from dropbox_client import DropboxClient
+from extraction_cache import extraction_cache
+from formats import FormatError, UnsupportedFormat
+from uploads import save_upload, UploadTooLarge, MAX_UPLOAD_REQUEST_BYTES
+from pipeline import ComparisonPipeline, PipelineInput
+from report_builder import build_docx_report
+from report_store import report_store, iter_chunks, content_disposition
+from workers import run_io, WorkerPoolError, WorkerQueueFull
+from workspace import Workspace, request_workspace, workspace_manager
+import workers
+
+# Jāpalielina, mainot ekstrakcijas loģiku (invalidē kešu)
+EXTRACTOR_VERSION = "5"
+# /ai-tender/analyze izmanto tikai teksta sākumu (atskaitē 2000, JSON 1500 simbolu)
+ANALYZE_EXCERPT_CHARS = 2000
+ARCHIVE_SEPARATOR = "\n\n-----\n\n"
 
 
 app = FastAPI(
@@ -20,128 +31,187 @@ app = FastAPI(
     version="0.3.0",
 )
 
+# Dropbox šeit nav obligāts – bez tokena Dropbox ceļi tiek atzīmēti error_flags
+DROPBOX_TOKEN = os.getenv("DROPBOX_ACCESS_TOKEN")
+dropbox_client = DropboxClient(DROPBOX_TOKEN) if DROPBOX_TOKEN else None
 
-# ======================================================
-# PALĪGFUNKCIJAS DOKUMENTU EKSTRAKCIJAI
-# ======================================================
 
-def extract_pdf(path: Path) -> str:
-    reader = PdfReader(str(path))
-    chunks: List[str] = []
-    for page in reader.pages:
-        text = page.extract_text() or ""
-        chunks.append(text)
-    return "\n".join(chunks)
+@app.exception_handler(WorkerPoolError)
+async def worker_pool_error_handler(request, exc: WorkerPoolError):
+    # Pilna rinda -> 503 (klients var mēģināt vēlāk), timeout -> 504
+    status = 503 if isinstance(exc, WorkerQueueFull) else 504
+    return JSONResponse(status_code=status, content={"error": str(exc)})
 
 
-def extract_docx(path: Path) -> str:
-    d = docx.Document(str(path))
-    return "\n".join(p.text for p in d.paragraphs)
+@app.middleware("http")
+async def reject_oversized_requests(request: Request, call_next):
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_UPLOAD_REQUEST_BYTES:
+        return JSONResponse(status_code=413, content={"error": "Request body too large"})
+    return await call_next(request)
 
 
-def extract_zip(path: Path) -> str:
-    tmp_dir = Path(tempfile.mkdtemp(prefix="zip_"))
-    texts: List[str] = []
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large_handler(request, exc: UploadTooLarge):
+    return JSONResponse(status_code=413, content={"error": str(exc)})
 
-    with zipfile.ZipFile(path, "r") as zf:
-        zf.extractall(tmp_dir)
 
-    for f in tmp_dir.rglob("*"):
-        if not f.is_file():
-            continue
+@app.on_event("startup")
+async def start_workspace_janitor():
+    workspace_manager.start_janitor()
 
-        ext = f.suffix.lower()
-        if ext == ".pdf":
-            texts.append(extract_pdf(f))
-        elif ext == ".docx":
-            texts.append(extract_docx(f))
-        elif ext in {".txt", ".rtf"}:
-            texts.append(f.read_text(encoding="utf-8", errors="ignore"))
 
-    if not texts:
-        return "[ZIP] Arhīvā nav nolasāmu dokumentu."
-
-    return "\n\n-----\n\n".join(texts)
+@app.on_event("shutdown")
+async def shutdown_workers():
+    workspace_manager.stop()
+    workers.shutdown()
 
 
-def extract_edoc(path: Path) -> str:
-    """Izvelk tekstu no .edoc konteinera, izmantojot edoc_extractor."""
-    try:
-        inner_files: List[Path] = unpack_edoc(path)
-    except EdocError as e:
-        return f"[EDOC ERROR] {e}"
+# ======================================================
+# PALĪGFUNKCIJAS DOKUMENTU EKSTRAKCIJAI
+# ======================================================
 
+def _archive_text(result: Dict[str, Any]) -> str:
+    """ZIP/EDOC iekšējo failu teksti; ZIP neatbalstītos failus izlaiž, EDOC – atzīmē."""
     texts: List[str] = []
-    for inner in inner_files:
-        ext = inner.suffix.lower()
-
-        if ext == ".pdf":
-            texts.append(extract_pdf(inner))
-        elif ext == ".docx":
-            texts.append(extract_docx(inner))
-        elif ext in {".txt", ".rtf"}:
-            texts.append(inner.read_text(encoding="utf-8", errors="ignore"))
-        else:
-            texts.append(f"[NEATBALSTĪTS EDOC IETVĒRUMA TIPS: {ext}]")
+    for doc in result["documents"]:
+        if doc["type"] != "unsupported":
+            texts.append(doc["text"])
+        elif result["type"] == "edoc":
+            texts.append(_unsupported_edoc_text(doc["name"]))
 
     if not texts:
+        return _empty_archive_text(result["type"])
+
+    return ARCHIVE_SEPARATOR.join(texts)
+
+
+def _unsupported_edoc_text(name: str) -> str:
+    return f"[NEATBALSTĪTS EDOC IETVĒRUMA TIPS: {Path(name).suffix.lower()}]"
+
+
+def _empty_archive_text(kind: str) -> str:
+    if kind == "edoc":
         return "[EDOC] Konteinerā nav nolasāmu dokumentu."
+    return "[ZIP] Arhīvā nav nolasāmu dokumentu."
+
 
-    return "\n\n-----\n\n".join(texts)
+def _document_text(result: Dict[str, Any]) -> str:
+    return _archive_text(result) if "documents" in result else result["text"]
 
 
-def extract_any_document(path: Path) -> str:
-    """Universāls ekstraktors vienam failam."""
+def _format_error_text(path: Path, e: FormatError) -> str:
+    """Legacy uzvedība: neatbalstīts tips vai bojāts EDOC – atzīme tekstā, nevis kļūda."""
+    if isinstance(e, UnsupportedFormat):
+        return f"[UNSUPPORTED FILE TYPE {path.suffix.lower()}] – saturs jāpārbauda manuāli."
+    if e.kind == "edoc":
+        return f"[EDOC ERROR] Fails '{path}' nav derīgs EDOC/ZIP konteineris."
+    raise e
+
+
+def extract_any_document(path: Path, content_hash: Optional[str] = None) -> str:
+    """Universāls ekstraktors vienam failam (ar satura kešu)."""
     path = Path(path)
-    suffix = path.suffix.lower()
 
-    if is_edoc(path) or suffix == ".edoc":
-        return extract_edoc(path)
+    key = extraction_cache.key_for(path, "extractor", EXTRACTOR_VERSION, content_hash)
+    cached = extraction_cache.get(key)
+    if cached is not None:
+        return cached["text"]
+
+    text = _extract_any_document_uncached(path)
+    extraction_cache.put(key, {"text": text})
+    return text
 
-    if suffix == ".pdf":
-        return extract_pdf(path)
 
-    if suffix == ".docx":
-        return extract_docx(path)
+async def extract_any_document_async(path: Path, content_hash: Optional[str] = None) -> str:
+    """
+    extract_any_document() ārpus event loop. Procesu pūlā izpildās tikai
+    formats.parse_file – darbiniekam nav jāimportē šis modulis (FastAPI).
+    """
+    path = Path(path)
+
+    key = await run_io(extraction_cache.key_for, path, "extractor", EXTRACTOR_VERSION, content_hash)
+    cached = await run_io(extraction_cache.get, key)
+    if cached is not None:
+        return cached["text"]
 
-    if suffix in {".txt", ".rtf"}:
-        return path.read_text(encoding="utf-8", errors="ignore")
+    try:
+        text = _document_text(await metrics.run_cpu_measured(formats.parse_file, path))
+    except FormatError as e:
+        text = _format_error_text(path, e)
+    await run_io(extraction_cache.put, key, {"text": text})
+    return text
 
-    if suffix == ".zip":
-        return extract_zip(path)
 
-    return f"[UNSUPPORTED FILE TYPE {suffix}] – saturs jāpārbauda manuāli."
+def _extract_any_document_uncached(path: Path) -> str:
+    # Formāts – pēc satura (formats.sniff), tas pats reģistrs, ko lieto DocumentParser
+    try:
+        return _document_text(formats.parse_file(path))
+    except FormatError as e:
+        return _format_error_text(path, e)
 
 
-def build_docx_report(
-    candidate_name: str,
-    tender_text: str,
-    candidate_text: str,
-) -> bytes:
+def extract_preview(path: Path, max_chars: int = ANALYZE_EXCERPT_CHARS) -> str:
     """
-    Uzģenerē vienkāršu DOCX atskaiti un atgriež tās baitus.
+    extract_any_document() teksta sākums (max_chars simboli), bet pakāpeniski –
+    tiek parsētas tikai tās lapas un arhīva faili, kas tajā ietilpst.
     """
-    doc = Document()
-    doc.add_heading(f"Tender analysis for {candidate_name}", level=1)
+    path = Path(path)
+    parts: List[str] = []
+    length = texts = 0
+    kind = formats.sniff(path)
 
-    doc.add_heading("1. Tender document – excerpt", level=2)
-    doc.add_paragraph(tender_text[:2000] or "[no tender text extracted]")
+    try:
+        segments = formats.iter_file(path, kind)
+    except FormatError as e:
+        return _format_error_text(path, e)[:max_chars]
 
-    doc.add_heading("2. Candidate documents – excerpt", level=2)
-    doc.add_paragraph(candidate_text[:2000] or "[no candidate text extracted]")
+    try:
+        for seg in segments:
+            if seg["first"]:
+                if seg["type"] == "unsupported":
+                    # ZIP neatbalstītos failus izlaiž, EDOC – atzīmē (kā _archive_text)
+                    if kind != "edoc":
+                        continue
+                    seg = dict(seg, text=_unsupported_edoc_text(seg["document"]))
+                texts += 1
+                sep = ARCHIVE_SEPARATOR if texts > 1 else ""
+            else:
+                sep = seg["sep"]
+
+            piece = (sep + seg["text"])[:max_chars - length]
+            parts.append(piece)
+            length += len(piece)
+            if length >= max_chars:
+                break
+    except FormatError as e:
+        return _format_error_text(path, e)[:max_chars]
+    finally:
+        segments.close()
+
+    if not texts and kind in formats.ARCHIVE_KINDS:
+        return _empty_archive_text(kind)[:max_chars]
+    return "".join(parts)
+
+
+async def extract_preview_async(path: Path, content_hash: Optional[str] = None,
+                                max_chars: int = ANALYZE_EXCERPT_CHARS) -> str:
+    """extract_preview() I/O pavedienā; ja pilnais teksts jau ir kešā – no tā."""
+    path = Path(path)
+    if content_hash:
+        key = extraction_cache.key_for(path, "extractor", EXTRACTOR_VERSION, content_hash)
+        cached = await run_io(extraction_cache.get, key)
+        if cached is not None:
+            return cached["text"][:max_chars]
 
-    doc.add_heading("3. Short technical note", level=2)
-    doc.add_paragraph(
-        "This is a technical demo report generated by the AI Tender Analyzer backend. "
-        "In the production version this section will contain structured compliance analysis."
-    )
+    with metrics.stage("preview", path.suffix.lower().lstrip(".")):
+        return await run_io(extract_preview, path, max_chars)
 
-    with tempfile.NamedTemporaryFile(suffix=".docx", delete=False) as tmp:
-        doc.save(tmp.name)
-        tmp.seek(0)
-        data = tmp.read()
 
-    return data
+async def _parse_for_pipeline(path: Path, content_hash: Optional[str]) -> dict:
+    # analyze izmanto tikai izvilkumus – pilna ekstrakcija nav vajadzīga
+    text = await extract_preview_async(path, content_hash)
+    return {"filename": path.name, "type": path.suffix.lower().lstrip("."), "text": text}
 
 
 def build_dummy_html_table() -> str:
@@ -181,6 +251,8 @@ async def analyze_tender(
     candidate_archive: Optional[UploadFile] = File(None),
     tender_dropbox_path: Optional[str] = Form(None),
     candidate_dropbox_path: Optional[str] = Form(None),
+    include_docx_base64: bool = Form(False),
+    workspace: Workspace = Depends(request_workspace),
 ):
     """
     Legacy /ai-tender/analyze endpoint, tagad ar EDOC atbalstu.
@@ -188,59 +260,118 @@ async def analyze_tender(
       - candidate_name
       - tender_file  (PDF/DOCX/ZIP/EDOC)
       - candidate_archive (PDF/DOCX/ZIP/EDOC)
-    Dropbox ceļus pagaidām ignorē (to pieslēgsim vēlāk).
+      - tender_dropbox_path / candidate_dropbox_path (fails vai mape Dropbox)
+    Dropbox ceļi darbojas, ja ir iestatīts DROPBOX_ACCESS_TOKEN.
+
+    DOCX atskaite tiek glabāta atmiņā (report_store.py) un lejupielādēta no
+    report_url; include_docx_base64=true – vecajiem klientiem arī docx_base64.
     """
 
     error_flags: List[str] = []
-    tender_text = ""
-    candidate_text = ""
+    inputs: List[PipelineInput] = []
 
     # ------------------------------
-    # 1. Prasību dokuments (tender_file)
+    # 1. Prasību dokuments un kandidāta dokumenti
     # ------------------------------
-    if tender_file is not None:
-        tmp_tender_path = Path(tempfile.mkdtemp(prefix="tender_")) / tender_file.filename
-        with open(tmp_tender_path, "wb") as f:
-            f.write(await tender_file.read())
-        tender_text = extract_any_document(tmp_tender_path)
-    elif tender_dropbox_path:
-        error_flags.append("tender_dropbox_not_implemented")
-    else:
-        error_flags.append("no_tender_file")
+    for side, upload, dropbox_path, missing_flag in (
+        ("tender", tender_file, tender_dropbox_path, "no_tender_file"),
+        ("candidate", candidate_archive, candidate_dropbox_path, "no_candidate_archive"),
+    ):
+        if upload is not None:
+            saved = await save_upload(upload, workspace.subdir(side), workspace)
+            inputs.append(PipelineInput(side, local_path=saved.path, content_hash=saved.sha256))
+        elif dropbox_path:
+            if dropbox_client is None:
+                error_flags.append(f"{side}_dropbox_not_configured")
+            else:
+                inputs.append(PipelineInput(side, dropbox_path=dropbox_path))
+        else:
+            error_flags.append(missing_flag)
 
     # ------------------------------
-    # 2. Kandidāta dokumenti (candidate_archive)
+    # 2. Lejupielāde + ekstrakcija (abas puses vienlaikus, konveijerā)
     # ------------------------------
-    if candidate_archive is not None:
-        tmp_cand_path = Path(tempfile.mkdtemp(prefix="candidate_")) / candidate_archive.filename
-        with open(tmp_cand_path, "wb") as f:
-            f.write(await candidate_archive.read())
-        candidate_text = extract_any_document(tmp_cand_path)
-    elif candidate_dropbox_path:
-        error_flags.append("candidate_dropbox_not_implemented")
-    else:
-        error_flags.append("no_candidate_archive")
+    pipeline = ComparisonPipeline(_parse_for_pipeline, dropbox_client)
+    result = await pipeline.run(inputs)
+
+    for err in result.errors:
+        kind = "extraction" if err["stage"] == "parse" else "dropbox"
+        flag = f"{err['side']}_{kind}_error"
+        if flag not in error_flags:
+            error_flags.append(flag)
+
+    tender_text = result.text("tender")
+    candidate_text = result.text("candidate")
 
     # ------------------------------
     # 3. DOCX atskaites ģenerēšana
     # ------------------------------
-    report_bytes = build_docx_report(candidate_name, tender_text, candidate_text)
-    docx_b64 = base64.b64encode(report_bytes).decode("utf-8")
+    report_bytes = await metrics.run_cpu_measured(
+        build_docx_report, candidate_name, tender_text[:ANALYZE_EXCERPT_CHARS], candidate_text[:ANALYZE_EXCERPT_CHARS],
+    )
+    analysis_id = report_store.put(report_bytes, f"tender_analysis_{candidate_name}.docx")
 
     html_table = build_dummy_html_table()
 
     response = {
         "candidate_name": candidate_name,
+        "analysis_id": analysis_id,
         "error_flags": error_flags,
         "tender_excerpt": tender_text[:1500],
         "candidate_excerpt": candidate_text[:1500],
         "html_table": html_table,
-        "docx_base64": docx_b64,
+        "report_url": app.url_path_for("download_report", analysis_id=analysis_id),
     }
+    if include_docx_base64:
+        response["docx_base64"] = base64.b64encode(report_bytes).decode("ascii")
 
     return JSONResponse(response)
 
 
+@app.get("/ai-tender/reports/{analysis_id}", name="download_report")
+async def download_report(analysis_id: str):
+    """DOCX atskaite no /ai-tender/analyze – straumēta pa gabaliem, nevis base64 JSON-ā."""
+    report = report_store.get(analysis_id)
+    if report is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown or expired report: {analysis_id}"})
+
+    return StreamingResponse(
+        iter_chunks(report.data),
+        media_type=report.media_type,
+        headers={
+            "Content-Length": str(len(report.data)),
+            "Content-Disposition": content_disposition(report.filename),
+        },
+    )
+
+
+@app.get("/debug/cache")
+async def cache_stats():
+    """Ekstrakcijas keša hit/miss statistika."""
+    return extraction_cache.stats()
+
+
+@app.get("/debug/reports")
+async def report_stats():
+    """Atmiņā glabāto atskaišu skaits, izmērs un lejupielādes."""
+    return report_store.stats()
+
+
+@app.get("/debug/workers")
+async def worker_stats():
+    """Darba pūlu noslodze (rindas garums, timeouti)."""
+    return workers.stats()
+
+
+app.middleware("http")(metrics.request_timing_middleware)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Posmu metrikas Prometheus formātā (skat. metrics.py)."""
+    return PlainTextResponse(metrics.expose(), media_type=metrics.CONTENT_TYPE)
+
+
 # (nav obligāti, bet ērti health-checkam)
 @app.get("/health")
 async def health():
@@ -0,0 +1,391 @@
+# formats.py
+
+from __future__ import annotations
+
+import codecs
+import contextlib
+import functools
+import os
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import metrics
+from archive_members import file_members, open_member, parse_members
+
+# Cik dziļi tiek atvērti arhīvi arhīvos (ZIP ZIP-ā, EDOC ZIP-ā, ...)
+ARCHIVE_MAX_DEPTH = int(os.getenv("ARCHIVE_MAX_DEPTH", "3"))
+# Cik baitu no faila sākuma nolasa formāta noteikšanai
+SNIFF_BYTES = 4096
+# Teksta faila bloks pakāpeniskajā ekstrakcijā
+TEXT_BLOCK_BYTES = 64 * 1024
+# UTF-8 saturs tiek uzskatīts par tekstu tikai šiem paplašinājumiem (un failiem bez tā) –
+# .xml/.csv/.html/.json u.c. paliek neatbalstīti
+TEXT_EXTENSIONS = ("", ".txt", ".rtf")
+
+Source = Union[Path, BinaryIO]
+# parse(source, name, depth) -> {"type", "text", "pages"?} vai {"type", "documents"}
+ParseFn = Callable[[Source, str, int], Dict[str, Any]]
+# iterate(source, name, depth) -> segmenti {"document", "type", "text", "first", "sep", "page"?}
+IterFn = Callable[[Source, str, int], Iterator[Dict[str, Any]]]
+
+ASIC_MIMETYPES = (b"application/vnd.etsi.asic-e+zip", b"application/vnd.etsi.asic-s+zip")
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_MAGICS = (b"PK\x03\x04", b"PK\x05\x06")
+
+
+class FormatError(Exception):
+    """Faila saturu nevar izparsēt ar tā formāta apstrādātāju."""
+
+    def __init__(self, message: str, kind: str = ""):
+        super().__init__(message)
+        self.kind = kind
+
+    def __reduce__(self):
+        # kind jāsaglabā, pārsūtot izņēmumu no procesu pūla
+        return type(self), (str(self), self.kind)
+
+
+class UnsupportedFormat(FormatError):
+    """Formātam nav reģistrēta apstrādātāja."""
+
+
+@dataclass
+class FormatHandler:
+    """
+    Formāta apstrādātājs. Smagās bibliotēkas (PyPDF2, edoc_extractor, ...)
+    apstrādātāja funkcija importē pati, pirmajā lietošanas reizē.
+
+    iter_target (neobligāts) – tas pats pakāpeniskai ekstrakcijai (iter_file);
+    bez tā iterate() izparsē visu failu un atdod to kā vienu segmentu.
+    """
+
+    kind: str
+    target: ParseFn
+    extensions: Tuple[str, ...] = ()
+    iter_target: Optional[IterFn] = None
+
+    def parse(self, source: Source, name: str, depth: int = 0) -> Dict[str, Any]:
+        return self.target(source, name, depth)
+
+    def iterate(self, source: Source, name: str, depth: int = 0) -> Iterator[Dict[str, Any]]:
+        if self.iter_target is None:
+            return _segments_of(self.parse(source, name, depth), name)
+        return self.iter_target(source, name, depth)
+
+
+_handlers: Dict[str, FormatHandler] = {}
+_extensions: Dict[str, str] = {}
+
+
+def register(
+    kind: str,
+    target: ParseFn,
+    extensions: Tuple[str, ...] = (),
+    iter_target: Optional[IterFn] = None,
+) -> None:
+    """Reģistrē (vai aizvieto) formāta apstrādātāju un tā paplašinājumus."""
+    _handlers[kind] = FormatHandler(kind, target, tuple(e.lower() for e in extensions), iter_target)
+    for ext in extensions:
+        _extensions[ext.lower()] = kind
+
+
+def handler_for(kind: str) -> Optional[FormatHandler]:
+    return _handlers.get(kind)
+
+
+def kinds() -> List[str]:
+    return list(_handlers)
+
+
+# ======================================================
+# Formāta noteikšana pēc satura
+# ======================================================
+def _zip_kind(source: Source) -> str:
+    """ZIP paveids pēc satura: ASiC-E/S konteiners (EDOC), DOCX vai parasts ZIP."""
+    try:
+        with zipfile.ZipFile(source) as zf:
+            names = set(zf.namelist())
+            if "mimetype" in names and zf.read("mimetype").strip() in ASIC_MIMETYPES:
+                return "edoc"
+            if "word/document.xml" in names:
+                return "docx"
+    except (zipfile.BadZipFile, OSError, KeyError):
+        return ""
+    return "zip"
+
+
+def _is_text(head: bytes) -> bool:
+    if not head or b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Nogriezts vairāku baitu simbols bufera beigās nav kļūda
+        return e.start >= len(head) - 3
+    return True
+
+
+def sniff(source: Source, name: str = "") -> str:
+    """
+    Nosaka formātu pēc "magic" baitiem, paplašinājumu izmantojot tikai tad,
+    ja saturs neko nepasaka. Bez "magic" (UTF-8 teksts) – "text" tikai
+    TEXT_EXTENSIONS failiem. Bufera pozīcija tiek atjaunota uz sākumu.
+
+    Atgriež reģistrētu tipu ("pdf", "docx", "zip", "edoc", "text"),
+    "doc" (vecais binārais Word) vai "unknown".
+    """
+    if isinstance(source, (str, Path)):
+        source = Path(source)
+        name = name or source.name
+        with open(source, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    else:
+        source.seek(0)
+        head = source.read(SNIFF_BYTES)
+        source.seek(0)
+
+    ext = Path(name).suffix.lower()
+    kind = ""
+    if b"%PDF-" in head[:1024]:
+        kind = "pdf"
+    elif head.startswith(ZIP_MAGICS):
+        kind = _zip_kind(source)
+        if not isinstance(source, Path):
+            source.seek(0)
+    elif head.startswith(OLE_MAGIC):
+        kind = "doc"
+    elif head.lstrip().startswith(b"{\\rtf") or (ext in TEXT_EXTENSIONS and _is_text(head)):
+        kind = "text"
+
+    return kind or _extensions.get(ext, "unknown")
+
+
+# ======================================================
+# Parsēšana
+# ======================================================
+def parse_file(path: Path) -> Dict[str, Any]:
+    """
+    Izparsē failu ar tā satura formātam atbilstošo apstrādātāju.
+    Arhīviem (ZIP/EDOC) – {"type", "documents": [{"name", "type", "text"}]}
+    (ligzdotie arhīvi saplacināti, neatbalstītie faili – type "unsupported"),
+    citiem – {"type", "text"} (+ "pages" PDF). Mēra posmu "parse" (metrics.py).
+    """
+    path = Path(path)
+    kind = sniff(path)
+    handler = _handlers.get(kind)
+    if handler is None:
+        raise UnsupportedFormat(f"Unsupported file type: {path.suffix.lower() or kind}", kind)
+
+    with metrics.stage("parse", kind) as span:
+        span.bytes = path.stat().st_size
+        result = handler.parse(path, path.name, 0)
+        span.pages = len(result.get("pages", ()))
+    return result
+
+
+def parse_buffer(buf: BinaryIO, name: str, depth: int = 1) -> Dict[str, Any]:
+    """Arhīva iekšējais fails (meklējams buferis). Neatbalstīts -> type "unsupported"."""
+    kind = sniff(buf, name)
+    handler = _handlers.get(kind)
+    if handler is None or (kind in ARCHIVE_KINDS and depth > ARCHIVE_MAX_DEPTH):
+        return {"type": "unsupported", "text": ""}
+    return handler.parse(buf, name, depth)
+
+
+def _flatten(member_name: str, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    name = Path(member_name).name
+    if "documents" not in result:
+        return [{"name": name, "type": result["type"], "text": result.get("text", "")}]
+    return [dict(d, name=f"{name}/{d['name']}") for d in result["documents"]]
+
+
+def _parse_archive(source: Source, names: List[str], kind: str, depth: int) -> Dict[str, Any]:
+    # Jebkurā dziļumā tas pats ceļš: paralēli, ja šim procesam atvēlēts fanout budžets
+    # (parasti – pirmais arhīvs ar vairākiem failiem), citādi secīgi
+    results = parse_members(source, names, functools.partial(parse_buffer, depth=depth + 1))
+
+    documents: List[Dict[str, Any]] = []
+    for member, result in zip(names, results):
+        documents.extend(_flatten(member, result))
+    return {"type": kind, "documents": documents}
+
+
+def _parse_zip(source: Source, name: str, depth: int) -> Dict[str, Any]:
+    try:
+        with zipfile.ZipFile(source) as zf:
+            names = [m.filename for m in file_members(zf)]
+    except zipfile.BadZipFile as e:
+        raise FormatError(f"ZIP extraction error: {e}", "zip")
+    return _parse_archive(source, names, "zip", depth)
+
+
+def _parse_edoc(source: Source, name: str, depth: int) -> Dict[str, Any]:
+    from edoc_extractor import edoc_documents
+
+    try:
+        with zipfile.ZipFile(source) as zf:
+            names = [m.filename for m in edoc_documents(zf)]
+    except zipfile.BadZipFile as e:
+        raise FormatError(f"EDOC extraction error: {e}", "edoc")
+    return _parse_archive(source, names, "edoc", depth)
+
+
+def _parse_pdf(source: Source, name: str, depth: int) -> Dict[str, Any]:
+    from pdf_pages import extract_pages, extract_pages_from_stream
+
+    try:
+        pages = extract_pages(source) if isinstance(source, Path) else extract_pages_from_stream(source)
+    except Exception as e:
+        raise FormatError(_pdf_error(e, name, depth), "pdf")
+    return {"type": "pdf", "text": "\n".join(p["text"] for p in pages), "pages": pages}
+
+
+def _pdf_error(e: Exception, name: str, depth: int) -> str:
+    where = f" in {Path(name).name}" if depth else ""
+    return f"PDF extraction error{where}: {e}"
+
+
+def _docx_blocks(source: Source) -> Iterator[str]:
+    # Straumēts word/document.xml (docx_stream.py) – ar tabulām, galvenēm un kājenēm
+    from docx_stream import DocxStreamError, iter_blocks
+
+    try:
+        yield from iter_blocks(source)
+    except DocxStreamError as e:
+        raise FormatError(f"DOCX extraction error: {e}", "docx")
+
+
+def docx_text(source: Source) -> str:
+    return "\n".join(_docx_blocks(source))
+
+
+def _parse_docx(source: Source, name: str, depth: int) -> Dict[str, Any]:
+    return {"type": "docx", "text": docx_text(source)}
+
+
+def _parse_text(source: Source, name: str, depth: int) -> Dict[str, Any]:
+    data = source.read_bytes() if isinstance(source, Path) else source.read()
+    return {"type": "text", "text": data.decode("utf-8", errors="ignore")}
+
+
+# ======================================================
+# Pakāpeniska ekstrakcija (priekšskatījumi, teksta budžets)
+# ======================================================
+def iter_file(path: Path, kind: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Pakāpeniska parse_file(): segmenti pa lapām (PDF), rindkopām (DOCX),
+    blokiem (teksts) un arhīva failiem – secīgi, šajā pavedienā. Pārtraucot
+    iterāciju, pārējā faila daļa netiek ne lasīta, ne parsēta.
+
+    Segments: {"document", "type", "text", "first", "sep", "page"?}. Viena
+    dokumenta segmentu teksti, savienoti ar "sep", dod to pašu tekstu, ko
+    parse_file(); first=True – sākas nākamais arhīva fails. Dokumentu
+    nosaukumi un "unsupported" faili – kā parse_file() "documents".
+    """
+    path = Path(path)
+    kind = kind or sniff(path)
+    handler = _handlers.get(kind)
+    if handler is None:
+        raise UnsupportedFormat(f"Unsupported file type: {path.suffix.lower() or kind}", kind)
+    return handler.iterate(path, path.name, 0)
+
+
+def iter_buffer(buf: BinaryIO, name: str, depth: int = 1) -> Iterator[Dict[str, Any]]:
+    """parse_buffer() pakāpeniski; ligzdota arhīva dokumenti – "arhīvs/fails"."""
+    kind = sniff(buf, name)
+    handler = _handlers.get(kind)
+    if handler is None or (kind in ARCHIVE_KINDS and depth > ARCHIVE_MAX_DEPTH):
+        yield _segment(name, "unsupported", "")
+        return
+
+    base = Path(name).name
+    for seg in handler.iterate(buf, name, depth):
+        yield dict(seg, document=f"{base}/{seg['document']}") if kind in ARCHIVE_KINDS else seg
+
+
+def _segment(name: str, kind: str, text: str, first: bool = True, sep: str = "", **extra: Any) -> Dict[str, Any]:
+    return dict({"document": Path(name).name, "type": kind, "text": text, "first": first, "sep": sep}, **extra)
+
+
+def _segments_of(result: Dict[str, Any], name: str) -> Iterator[Dict[str, Any]]:
+    """Apstrādātājiem bez iter_target – viss rezultāts kā segmenti pēc parse()."""
+    if "documents" not in result:
+        yield _segment(name, result["type"], result.get("text", ""))
+        return
+    for d in result["documents"]:
+        yield {"document": d["name"], "type": d["type"], "text": d["text"], "first": True, "sep": ""}
+
+
+def _iter_archive(source: Source, kind: str, depth: int) -> Iterator[Dict[str, Any]]:
+    try:
+        zf = zipfile.ZipFile(source)
+    except zipfile.BadZipFile as e:
+        raise FormatError(f"{kind.upper()} extraction error: {e}", kind)
+
+    with zf:
+        if kind == "edoc":
+            from edoc_extractor import edoc_documents
+
+            members = edoc_documents(zf)
+        else:
+            members = file_members(zf)
+        for info in members:
+            with open_member(zf, info) as buf:
+                yield from iter_buffer(buf, info.filename, depth + 1)
+
+
+def _iter_zip(source: Source, name: str, depth: int) -> Iterator[Dict[str, Any]]:
+    return _iter_archive(source, "zip", depth)
+
+
+def _iter_edoc(source: Source, name: str, depth: int) -> Iterator[Dict[str, Any]]:
+    return _iter_archive(source, "edoc", depth)
+
+
+def _iter_pdf(source: Source, name: str, depth: int) -> Iterator[Dict[str, Any]]:
+    from pdf_pages import iter_pages
+
+    first = True
+    try:
+        for page in iter_pages(source):
+            yield _segment(name, "pdf", page["text"], first=first, sep="\n", page=page["page"])
+            first = False
+    except Exception as e:
+        raise FormatError(_pdf_error(e, name, depth), "pdf")
+    if first:
+        yield _segment(name, "pdf", "")
+
+
+def _iter_docx(source: Source, name: str, depth: int) -> Iterator[Dict[str, Any]]:
+    first = True
+    for block in _docx_blocks(source):
+        yield _segment(name, "docx", block, first=first, sep="\n")
+        first = False
+    if first:
+        yield _segment(name, "docx", "")
+
+
+def _iter_text(source: Source, name: str, depth: int) -> Iterator[Dict[str, Any]]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    opened = open(source, "rb") if isinstance(source, Path) else contextlib.nullcontext(source)
+    first = True
+    with opened as stream:
+        while True:
+            block = stream.read(TEXT_BLOCK_BYTES)
+            text = decoder.decode(block, final=not block)
+            if text or (first and not block):
+                yield _segment(name, "text", text, first=first)
+                first = False
+            if not block:
+                return
+
+
+ARCHIVE_KINDS = {"zip", "edoc"}
+
+register("pdf", _parse_pdf, (".pdf",), _iter_pdf)
+register("docx", _parse_docx, (".docx",), _iter_docx)
+register("text", _parse_text, (".txt", ".rtf"), _iter_text)
+register("zip", _parse_zip, (".zip",), _iter_zip)
+register("edoc", _parse_edoc, (".edoc", ".asice", ".sce"), _iter_edoc)
@@ -0,0 +1,413 @@
+# jobs.py
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from workers import run_io
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+JOBS_DB_PATH = Path(os.getenv("JOBS_DB_PATH", "/tmp/ai-iepirkumi-cache/jobs.sqlite3"))
+JOBS_FILES_DIR = Path(os.getenv("JOBS_FILES_DIR", "/tmp/ai-iepirkumi-cache/jobs"))
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "2"))
+JOBS_RETENTION = float(os.getenv("JOBS_RETENTION_HOURS", "72")) * 3600
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED = ("succeeded", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    kind         TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    progress     TEXT,
+    result       TEXT,
+    error        TEXT,
+    cancel       INTEGER NOT NULL DEFAULT 0,
+    worker       TEXT,
+    lease_until  REAL,
+    created_at   REAL NOT NULL,
+    started_at   REAL,
+    finished_at  REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+EventFn = Callable[[Dict[str, Any]], None]
+# handler(payload, on_event) -> (HTTP statuss, atbildes ķermenis)
+JobHandler = Callable[[Dict[str, Any], EventFn], Awaitable[Tuple[int, Dict[str, Any]]]]
+
+
+class JobError(Exception):
+    """Fona uzdevumu kļūda (nezināms tips, neatrasts uzdevums)."""
+
+
+class JobStore:
+    """
+    Pastāvīga uzdevumu rinda (SQLite).
+
+    Uzdevumu paņem tas darbinieks, kuram izdodas atomāri nomainīt statusu
+    queued -> running; darbinieks periodiski pagarina "lease". Ja process
+    nomirst, lease beidzas, un uzdevums atgriežas rindā (līdz max_attempts),
+    tāpēc pēc avārijas darbs tiek atsākts – arī citā replikā ar to pašu DB.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = JOBS_DB_PATH,
+        files_dir: Path = JOBS_FILES_DIR,
+        max_attempts: int = JOBS_MAX_ATTEMPTS,
+        lease_seconds: float = JOBS_LEASE_SECONDS,
+        retention: float = JOBS_RETENTION,
+    ):
+        self.db_path = Path(db_path)
+        self.files_dir = Path(files_dir)
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retention = retention
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def job_dir(self, job_id: str) -> Path:
+        """Mape uzdevuma augšupielādēm – tām jāpārdzīvo procesa restarts."""
+        return self.files_dir / job_id
+
+    # =========================================================
+    # 1. Rinda
+    # =========================================================
+    def enqueue(self, job_id: str, kind: str, payload: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+
+    def claim(self, worker: str, kinds: List[str]) -> Optional[sqlite3.Row]:
+        """
+        Paņem vecāko gaidošo uzdevumu. Pirms tam rindā atgriež uzdevumus,
+        kuru lease ir beidzies (darbinieks nomira).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._recover(conn, now)
+
+            placeholders = ",".join("?" for _ in kinds)
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE status = 'queued' AND kind IN ({placeholders}) "
+                "ORDER BY created_at LIMIT 1",
+                kinds,
+            ).fetchone()
+            if row is None:
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_until = ?, "
+                "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row["id"]),
+            )
+            return conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+
+    def _recover(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Job exceeded the retry limit', finished_at = ? "
+            "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+            (now, now, self.max_attempts),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = CASE WHEN cancel THEN 'cancelled' ELSE 'queued' END, "
+            "worker = NULL, lease_until = NULL, "
+            "finished_at = CASE WHEN cancel THEN ? ELSE NULL END "
+            "WHERE status = 'running' AND lease_until < ?",
+            (now, now),
+        )
+
+    def heartbeat(self, job_id: str, worker: str, progress: Dict[str, Any]) -> bool:
+        """
+        Pagarina lease un saglabā progresu. Atgriež True, ja uzdevums jāatceļ
+        (vai to jau pārņēmis cits darbinieks).
+        """
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET lease_until = ?, progress = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, json.dumps(progress, ensure_ascii=False), job_id, worker),
+            ).rowcount
+            if not updated:
+                return True
+            row = conn.execute("SELECT cancel FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row["cancel"])
+
+    def finish(
+        self,
+        job_id: str,
+        worker: str,
+        status: str,
+        progress: Dict[str, Any],
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, result = ?, error = ?, finished_at = ?, "
+                "lease_until = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+                (
+                    status,
+                    json.dumps(progress, ensure_ascii=False),
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                    worker,
+                ),
+            ).rowcount
+        # Ja uzdevumu jau pārņēmis cits darbinieks, tā failus neaiztiekam
+        if updated:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def release(self, job_id: str, worker: str) -> None:
+        """Atgriež uzdevumu rindā (process tiek apturēts) – mēģinājums netiek ieskaitīts."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), worker = NULL, "
+                "lease_until = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+                (job_id, worker),
+            )
+
+    # =========================================================
+    # 2. Klienta operācijas
+    # =========================================================
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "cancel_requested": bool(row["cancel"]),
+            "progress": json.loads(row["progress"]) if row["progress"] else {},
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Gaidošu uzdevumu atceļ uzreiz; izpildē esošam uzstāda karodziņu,
+        ko darbinieks pamana nākamajā heartbeat. Atgriež jauno statusu.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', cancel = 1, finished_at = ? WHERE id = ? AND status = 'queued'",
+                (now, job_id),
+            )
+            conn.execute("UPDATE jobs SET cancel = 1 WHERE id = ? AND status = 'running'", (job_id,))
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        if row["status"] == "cancelled":
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return row["status"]
+
+    def purge(self) -> int:
+        """Dzēš pabeigtus uzdevumus, kas vecāki par retention."""
+        cutoff = time.time() - self.retention
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({','.join('?' for _ in FINISHED)}) AND finished_at < ?",
+                (*FINISHED, cutoff),
+            ).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(r["id"],) for r in rows])
+        for r in rows:
+            shutil.rmtree(self.job_dir(r["id"]), ignore_errors=True)
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            **{status: counts.get(status, 0) for status in JOB_STATUSES},
+            "oldest_queued_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+        }
+
+
+class _Progress:
+    """Apkopo konveijera/AI notikumus kompaktā progresa ierakstā."""
+
+    def __init__(self, attempt: int):
+        self.data: Dict[str, Any] = {"attempt": attempt, "stage": "started", "events": {}}
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        name = event.get("event", "")
+        if name == "token":
+            # Tokeni netiek glabāti – tikai to skaits
+            self.data["tokens"] = self.data.get("tokens", 0) + 1
+            return
+        self.data["stage"] = name
+        self.data["events"][name] = self.data["events"].get(name, 0) + 1
+        if name == "section":
+            self.data["sections_total"] = event.get("total")
+        elif name == "file_error":
+            self.data.setdefault("errors", []).append(
+                {k: event.get(k) for k in ("side", "stage", "file", "error")}
+            )
+
+
+class JobRunner:
+    """
+    Fona darbinieki šajā procesā: ņem uzdevumus no JobStore un izpilda
+    reģistrēto handler. Cik uzdevumu vienlaikus – nosaka workers, nevis
+    atvērto HTTP savienojumu skaits.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOBS_WORKERS, poll: float = JOBS_POLL_SECONDS):
+        self.store = store
+        self.workers = workers
+        self.poll = poll
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def submit(self, job_id: str, kind: str, payload: Dict[str, Any]) -> None:
+        if kind not in self._handlers:
+            raise JobError(f"Unknown job kind: {kind}")
+        self.store.enqueue(job_id, kind, payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._loop(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # =========================================================
+    # Darbinieka cikls
+    # =========================================================
+    async def _loop(self, index: int) -> None:
+        worker = f"{self.worker_id}:{index}"
+        last_purge = 0.0
+        while True:
+            row = await run_io(self.store.claim, worker, list(self._handlers))
+            if row is None:
+                if index == 0 and time.time() - last_purge > 3600:
+                    last_purge = time.time()
+                    await run_io(self.store.purge)
+                self._wakeup.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll)
+                continue
+            self.running += 1
+            try:
+                await self._execute(row, worker)
+            finally:
+                self.running -= 1
+
+    async def _execute(self, row: sqlite3.Row, worker: str) -> None:
+        job_id = row["id"]
+        progress = _Progress(row["attempts"])
+        handler = self._handlers[row["kind"]]
+        task = asyncio.create_task(handler(json.loads(row["payload"]), progress))
+
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.store.lease_seconds / 3)
+                if task.done():
+                    break
+                if await run_io(self.store.heartbeat, job_id, worker, progress.data):
+                    task.cancel()
+                    with contextlib.suppress(BaseException):
+                        await task
+                    self.cancelled += 1
+                    await run_io(self.store.finish, job_id, worker, "cancelled", progress.data)
+                    return
+        except asyncio.CancelledError:
+            # Servera apturēšana – uzdevumu atdodam rindai, citi to turpinās
+            task.cancel()
+            with contextlib.suppress(BaseException):
+                await task
+            await run_io(self.store.release, job_id, worker)
+            raise
+
+        try:
+            status, body = task.result()
+        except Exception as e:
+            status, body = 500, {"error": f"Job error: {e}"}
+
+        if status == 200:
+            self.completed += 1
+            await run_io(self.store.finish, job_id, worker, "succeeded", progress.data, result=body)
+        else:
+            self.failed += 1
+            await run_io(self.store.finish, job_id, worker, "failed", progress.data,
+                         result={"status": status, **body}, error=body.get("error"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "workers": self.workers,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "queue": self.store.stats(),
+        }
+
+
+# Viena kopīga rinda visam procesam
+job_store = JobStore()
+job_runner = JobRunner(job_store)
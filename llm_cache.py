@@ -0,0 +1,196 @@
+# llm_cache.py
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", "/tmp/ai-iepirkumi-cache/llm_cache.sqlite3"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL_HOURS", str(24 * 30))) * 3600
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    model       TEXT NOT NULL,
+    response    TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at);
+"""
+
+
+class LLMResponseCache:
+    """
+    Pastāvīgs OpenAI atbilžu kešs (SQLite).
+
+    Atslēga – SHA-256 no (modelis, system prompt, user prompt, parametri),
+    tāpēc atkārtota analīze ar tiem pašiem dokumentiem neko nemaksā.
+    Ieraksti vecāki par TTL netiek izmantoti; pārsniedzot LLM_CACHE_MAX_MB,
+    tiek dzēsti senāk izmantotie.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = LLM_CACHE_PATH,
+        ttl: float = LLM_CACHE_TTL,
+        max_bytes: int = LLM_CACHE_MAX_MB * 1024 * 1024,
+        enabled: bool = LLM_CACHE_ENABLED,
+    ):
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+
+        if self.enabled:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        raw = json.dumps(
+            {"model": model, "system": system_prompt, "user": user_prompt, "params": params or {}},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # =========================================================
+    # Nolasīšana / saglabāšana
+    # =========================================================
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def note_bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def put(self, key: str, model: str, response: str) -> None:
+        if not self.enabled or response is None:
+            return
+
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._connect() as conn:
+            old = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+
+            with self._lock:
+                self.stores += 1
+                if self._size is None:
+                    self._size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                else:
+                    self._size += size - (old[0] if old else 0)
+                if self._size > self.max_bytes:
+                    self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Dzēš novecojušos, tad senāk izmantotos ierakstus līdz 90% no limita (izsauc ar lock)."""
+        expired = conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+        self.evictions += max(expired, 0)
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if total > target:
+            rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+            doomed = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self.evictions += len(doomed)
+
+        self._size = total
+
+    def clear(self) -> None:
+        if not self.enabled:
+            return
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+        with self._lock:
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        entries = 0
+        size = 0
+        if self.enabled:
+            with self._connect() as conn:
+                entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+                "limit_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+            }
+
+
+# Viens kopīgs kešs visam procesam
+llm_cache = LLMResponseCache()
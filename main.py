@@ -1,7 +1,10 @@
+import asyncio
 import os
+import shutil
 from pathlib import Path
-from fastapi import FastAPI, UploadFile, File, Query
-from fastapi.responses import JSONResponse
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from fastapi import FastAPI, Request, UploadFile, File, Form, Query, Body, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 # ============================================
 # CORS — KRITISKI SVARĪGI WORDPRESS FRONTENDAM
@@ -11,10 +14,25 @@ from fastapi.middleware.cors import CORSMiddleware
 # ======================================================
 # 0. Importē visus moduļus (EDOC, Dropbox, Parseri, AI)
 # ======================================================
-from edoc_extractor import is_edoc, unpack_edoc, EdocError
+from edoc_extractor import list_edoc_documents, EdocError
 from dropbox_client import DropboxClient
-from document_parser import DocumentParser, DocumentParserError
-from ai_comparison import AIComparisonEngine
+from dropbox_sync import DropboxSyncEngine
+from document_parser import DocumentParser, DocumentParserError, PREVIEW_CHARS
+from ai_comparison import AIComparisonEngine, AI_COMPARE_MODE, AI_MAP_CHUNK_TOKENS, COMPARE_MODES
+from chunking import chunk_text
+from extraction_cache import extraction_cache
+from llm_cache import llm_cache
+from rate_limiter import scheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from pipeline import ComparisonPipeline, PipelineInput, PipelineError
+from near_duplicates import find_overlaps, reusable_candidates
+from streaming import STREAM_FORMATS, event_stream
+from jobs import job_store, job_runner
+from tender_registry import tender_registry, tender_id_for, summary as tender_summary, TenderRegistryError, TenderNotFound
+import metrics
+import workers
+from workers import run_io, WorkerPoolError, WorkerQueueFull
+from uploads import save_upload, UploadBudget, UploadTooLarge, MAX_UPLOAD_REQUEST_BYTES
+from workspace import Workspace, request_workspace, workspace_manager
 
 
 # ======================================================
@@ -34,9 +52,67 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],           # GET, POST, OPTIONS utt.
     allow_headers=["*"],           # viss, arī form-data
+    expose_headers=["Server-Timing"],  # posmu laiki (metrics.py) redzami arī frontendam
 )
 
 
+# ======================================================
+# DARBA PŪLI — bloķējošais darbs ārpus event loop
+# ======================================================
+AI_COMPARE_TIMEOUT = float(os.getenv("AI_COMPARE_TIMEOUT", "180"))
+# Fona uzdevumiem nav klienta, kas gaida – tos ierobežo lease/heartbeat (jobs.py); 0 – bez limita
+JOB_COMPARE_TIMEOUT = float(os.getenv("JOB_COMPARE_TIMEOUT", "0")) or None
+
+
+@app.exception_handler(WorkerPoolError)
+async def worker_pool_error_handler(request, exc: WorkerPoolError):
+    # Pilna rinda -> 503 (klients var mēģināt vēlāk), timeout -> 504
+    status = 503 if isinstance(exc, WorkerQueueFull) else 504
+    return JSONResponse(status_code=status, content={"error": str(exc)})
+
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    # Fona uzdevumi vispirms atdod darbu rindai (caur io pūlu) – tikai tad pūlus drīkst slēgt
+    await job_runner.stop()
+    workers.shutdown()
+
+
+# ======================================================
+# AUGŠUPIELĀDES LIMITI
+# ======================================================
+# Augšupielādes glabājas pieprasījuma darba vietā (workspace.py), kas pēc
+# atbildes tiek dzēsta; janitor novāc to, kas palicis pēc avārijām.
+@app.on_event("startup")
+async def start_workspace_janitor():
+    workspace_manager.start_janitor()
+
+
+@app.on_event("shutdown")
+async def stop_workspace_janitor():
+    workspace_manager.stop()
+
+
+@app.middleware("http")
+async def reject_oversized_requests(request: Request, call_next):
+    # Noraidām jau pēc Content-Length, pirms multipart tiek saglabāts diskā
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_UPLOAD_REQUEST_BYTES:
+        return JSONResponse(status_code=413, content={"error": "Request body too large"})
+    return await call_next(request)
+
+
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large_handler(request, exc: UploadTooLarge):
+    return JSONResponse(status_code=413, content={"error": str(exc)})
+
+
+@app.exception_handler(TenderRegistryError)
+async def tender_registry_error_handler(request, exc: TenderRegistryError):
+    status = 404 if isinstance(exc, TenderNotFound) else 422
+    return JSONResponse(status_code=status, content={"error": str(exc)})
+
+
 # ======================================================
 # 1. DROPBOX inicializācija
 # ======================================================
@@ -46,16 +122,50 @@ if not DROPBOX_TOKEN:
     raise RuntimeError("Environment variable DROPBOX_ACCESS_TOKEN is missing.")
 
 dropbox_client = DropboxClient(DROPBOX_TOKEN)
+dropbox_sync = DropboxSyncEngine(dropbox_client)
+
+# Mapes, kuras uztur svaigas ar longpoll (piem. "/Iepirkumi,/Kandidati")
+DROPBOX_SYNC_ROOTS = [p for p in os.getenv("DROPBOX_SYNC_ROOTS", "").split(",") if p.strip()]
+
+
+@app.on_event("startup")
+async def start_dropbox_sync():
+    for root in DROPBOX_SYNC_ROOTS:
+        dropbox_sync.start_longpoll(root)
+
+
+@app.on_event("shutdown")
+async def stop_dropbox_sync():
+    dropbox_sync.stop()
 
 
 @app.get("/dropbox/tree")
-async def dropbox_tree(path: str = Query("")):
+async def dropbox_tree(
+    path: str = Query(""),
+    type: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(1000, ge=1, le=5000),
+    refresh: bool = Query(False),
+):
     """
-    Atgriež pilnu Dropbox mapju koku (rekursīvi).
+    Atgriež Dropbox failus zem norādītā ceļa (rekursīvi) no lokālā indeksa.
+    Indekss tiek atjaunots ar izmaiņām (cursor), nevis pārlasīts katru reizi.
     """
     try:
-        files = dropbox_client.list_tree(path)
-        return JSONResponse({"status": "ok", "files": files})
+        if refresh:
+            await run_io(dropbox_sync.sync, path)
+        else:
+            await run_io(dropbox_sync.sync_if_stale, path)
+
+        result = await run_io(dropbox_sync.query, path, type, (page - 1) * page_size, page_size)
+        return JSONResponse({
+            "status": "ok",
+            "files": result["files"],
+            "total": result["total"],
+            "page": page,
+            "page_size": page_size,
+            "has_more": page * page_size < result["total"],
+        })
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
@@ -66,12 +176,27 @@ async def dropbox_download(path: str):
     Lejupielādē failu no Dropbox un saglabā to pagaidu direktorijā.
     """
     try:
-        local_path = dropbox_client.download_file(path)
+        local_path = await run_io(dropbox_client.download_file, path)
         return JSONResponse({"status": "ok", "local_path": local_path})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+@app.post("/dropbox/download-batch")
+async def dropbox_download_batch(paths: List[str] = Body(..., embed=True)):
+    """
+    Lejupielādē vairākus Dropbox failus paralēli. Faili, kuru saturs
+    (content_hash) jau ir lokāli, netiek lejupielādēti vēlreiz.
+    """
+    try:
+        files = await run_io(dropbox_client.download_files, paths)
+        return JSONResponse({"status": "ok", "files": files})
+    except WorkerPoolError:
+        raise
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
 # ======================================================
 # 2. AI SALĪDZINĀŠANAS DZINĒJS (OpenAI)
 # ======================================================
@@ -82,20 +207,32 @@ ai_engine = AIComparisonEngine()
 # 3. DEBUG ENDPOINT — jebkura faila ekstrakcijas tests
 # ======================================================
 @app.post("/debug/extract")
-async def debug_extract(file: UploadFile = File(...)):
+async def debug_extract(
+    file: UploadFile = File(...),
+    full: bool = Query(False),
+    max_chars: int = Query(PREVIEW_CHARS, ge=0),
+    max_tokens: Optional[int] = Query(None, ge=0),
+    workspace: Workspace = Depends(request_workspace),
+):
     """
-    Testē jebkura faila pilnu ekstrakciju (PDF, DOCX, ZIP, EDOC, TXT).
+    Testē jebkura faila ekstrakciju (PDF, DOCX, ZIP, EDOC, TXT).
+    Pēc noklusējuma – tikai priekšskatījums: tiek parsētas tikai pirmās lapas /
+    arhīva faili līdz max_chars (max_tokens). full=true – pilna ekstrakcija (kešojas).
     """
-    tmp_path = Path(f"/tmp/{file.filename}")
-    with open(tmp_path, "wb") as f:
-        f.write(await file.read())
+    saved = await save_upload(file, workspace.path, workspace)
 
     try:
-        data = DocumentParser.extract(tmp_path)
+        if full:
+            data = await DocumentParser.extract_async(saved.path, saved.sha256)
+            text = data["text"]
+            data = dict(data, text=text[:max_chars], truncated=len(text) > max_chars)
+        else:
+            data = await DocumentParser.preview_async(saved.path, saved.sha256, max_chars, max_tokens)
         return {
             "filename": data["filename"],
             "type": data["type"],
-            "text_preview": data["text"][:5000]
+            "text_preview": data["text"],
+            "truncated": data["truncated"],
         }
     except DocumentParserError as e:
         return {"error": str(e)}
@@ -105,58 +242,636 @@ async def debug_extract(file: UploadFile = File(...)):
 # 4. DEBUG ENDPOINT — EDOC iekšējās struktūras testa režīms
 # ======================================================
 @app.post("/debug/edoc")
-async def debug_edoc(file: UploadFile = File(...)):
-    tmp_path = Path(f"/tmp/{file.filename}")
-    with open(tmp_path, "wb") as f:
-        f.write(await file.read())
+async def debug_edoc(file: UploadFile = File(...), workspace: Workspace = Depends(request_workspace)):
+    saved = await save_upload(file, workspace.path, workspace)
 
     try:
-        inner_files = unpack_edoc(tmp_path)
+        inner_files = await run_io(list_edoc_documents, saved.path)
     except EdocError as e:
         return {"filename": file.filename, "error": str(e)}
 
     return {
         "filename": file.filename,
-        "inner_files": [p.name for p in inner_files]
+        "inner_files": [Path(name).name for name in inner_files]
     }
 
 
+@app.get("/debug/cache")
+async def debug_cache():
+    """
+    Ekstrakcijas keša statistika (hit/miss, aizņemtā atmiņa un disks).
+    """
+    return extraction_cache.stats()
+
+
+@app.get("/debug/rate-limiter")
+async def debug_rate_limiter():
+    """
+    OpenAI uzņemšanas plānotāja stāvoklis: rindas garums, gaidīšanas laiki, RPM/TPM atlikums.
+    """
+    return scheduler.stats()
+
+
+@app.get("/debug/llm-cache")
+async def debug_llm_cache():
+    """
+    AI atbilžu keša statistika (hit/miss, ieraksti, aizņemtais apjoms).
+    """
+    return await run_io(llm_cache.stats)
+
+
 # ======================================================
 # 5. GALVENAIS ENDPOINTS — AI SALĪDZINĀŠANA
 # ======================================================
 @app.post("/ai-tender/compare")
 async def compare(
-    requirements: UploadFile = File(...),
-    candidate_docs: UploadFile = File(...)
+    requirements: Optional[UploadFile] = File(None),
+    candidate_docs: Optional[UploadFile] = File(None),
+    tender_dropbox_path: Optional[str] = Form(None),
+    candidate_dropbox_path: Optional[str] = Form(None),
+    mode: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+    tender_id: Optional[str] = Form(None),
+    workspace: Workspace = Depends(request_workspace),
 ):
     """
     Pilnais AI Tender salīdzināšanas process:
-    1. Nolasām failus
+    1. Nolasām failus (augšupielāde vai Dropbox ceļš – fails vai mape)
     2. Ekstrahējam saturu (PDF, DOCX, ZIP, EDOC utt.)
     3. Sadalām prasības
     4. Salīdzinām ar kandidāta dokumentiem
     5. Ģenerējam summary + analīzi + HTML tabulu
+
+    Lejupielāde, atpakošana, parsēšana un AI posms darbojas kā konveijers
+    (skat. pipeline.py), nevis stingri viens pēc otra.
+
+    mode: auto | single | map_reduce (skat. AIComparisonEngine.compare).
+    no_cache: true – AI atbildes pieprasīt no jauna, neizmantojot kešu.
+    tender_id: reģistrēts konkurss (POST /ai-tender/tenders) prasību faila vietā.
     """
+    if mode is not None and mode not in COMPARE_MODES:
+        return JSONResponse(status_code=400, content={"error": f"Unknown mode: {mode}"})
+
+    tender = await run_io(tender_registry.require, tender_id) if tender_id else None
+    try:
+        inputs = await _collect_inputs(requirements, candidate_docs, tender_dropbox_path, candidate_dropbox_path,
+                                       workspace.path, workspace, with_tender=tender is None)
+    except PipelineError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
-    # -- Saglabā prasību dokumentu --
-    req_path = Path(f"/tmp/{requirements.filename}")
-    with open(req_path, "wb") as f:
-        f.write(await requirements.read())
+    status, body = await _run_comparison(inputs, mode, no_cache, tender=tender)
+    if status != 200:
+        return JSONResponse(status_code=status, content=body)
+    return body
 
-    # -- Saglabā kandidāta dokumentus --
-    cand_path = Path(f"/tmp/{candidate_docs.filename}")
-    with open(cand_path, "wb") as f:
-        f.write(await candidate_docs.read())
 
-    # -- AI salīdzināšana --
+@app.post("/ai-tender/compare/stream")
+async def compare_stream(
+    request: Request,
+    requirements: Optional[UploadFile] = File(None),
+    candidate_docs: Optional[UploadFile] = File(None),
+    tender_dropbox_path: Optional[str] = Form(None),
+    candidate_dropbox_path: Optional[str] = Form(None),
+    mode: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+    tender_id: Optional[str] = Form(None),
+    stream_format: Optional[str] = Form(None, alias="format"),
+):
+    """
+    Tas pats, kas /ai-tender/compare, bet rezultāts tiek straumēts pa notikumiem
+    (NDJSON vai SSE – pēc "format" lauka vai Accept: text/event-stream):
+
+    started -> resolved / downloaded / parsed / file_error (katram failam)
+    -> comparing -> section (katras prasību sadaļas vērtējums) vai token
+    (AI atbildes teksts pa daļām) -> result (tā pati struktūra kā /ai-tender/compare)
+    vai error {"status", "error"}.
+    """
+    if stream_format is None:
+        stream_format = "sse" if "text/event-stream" in request.headers.get("accept", "") else "ndjson"
+    if stream_format not in STREAM_FORMATS:
+        return JSONResponse(status_code=400, content={"error": f"Unknown format: {stream_format}"})
+    if mode is not None and mode not in COMPARE_MODES:
+        return JSONResponse(status_code=400, content={"error": f"Unknown mode: {mode}"})
+
+    tender = await run_io(tender_registry.require, tender_id) if tender_id else None
+    # Darba vieta dzīvo līdz straumes beigām – Depends(request_workspace) to dzēstu pirms straumēšanas
+    workspace = workspace_manager.create()
+    # Augšupielādes saglabājam pirms atbildes sākuma – pēc tam UploadFile vairs nav lasāms
     try:
-        result = ai_engine.analyze(req_path, cand_path)
-    except DocumentParserError as e:
-        return JSONResponse(status_code=500, content={"error": f"Parser error: {str(e)}"})
+        inputs = await _collect_inputs(requirements, candidate_docs, tender_dropbox_path, candidate_dropbox_path,
+                                       workspace.path, workspace, with_tender=tender is None)
+    except BaseException as e:
+        await run_io(workspace.close)
+        if isinstance(e, PipelineError):
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        raise
+
+    async def run(emit):
+        emit({"event": "started", "mode": mode or AI_COMPARE_MODE})
+        try:
+            status, body = await _run_comparison(inputs, mode, no_cache, on_event=emit, tender=tender)
+        except WorkerPoolError as e:
+            status = 503 if isinstance(e, WorkerQueueFull) else 504
+            body = {"error": str(e)}
+        finally:
+            await run_io(workspace.close)
+        emit({"event": "result" if status == 200 else "error", "status": status, **body})
+
+    return StreamingResponse(
+        event_stream(run, stream_format),
+        media_type=STREAM_FORMATS[stream_format],
+        # Nginx/Railway starpniekiem – nebuferēt
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _run_comparison(
+    inputs: List[PipelineInput],
+    mode: Optional[str],
+    no_cache: bool,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    tender: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = AI_COMPARE_TIMEOUT,
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Konveijers + AI salīdzināšana. Atgriež (HTTP statuss, atbildes ķermenis).
+    tender – reģistrēta konkursa ieraksts: AI saņem tā numurēto prasību sarakstu
+    un jau sagatavotos gabalus, prasību dokumenti netiek parsēti.
+    timeout – AI posma limits sekundēs (None – bez limita).
+    """
+    async def _compare(tender_text: str, candidate_text: str):
+        return await asyncio.wait_for(
+            ai_engine.compare_async(
+                tender_text, candidate_text, mode, use_cache=not no_cache, priority=priority, on_event=on_event,
+                **_tender_kwargs(tender),
+            ),
+            timeout,
+        )
+
+    async def _compare_registered(_tender_text: str, candidate_text: str):
+        return await _compare(tender["requirements_text"], candidate_text)
+
+    pipeline = ComparisonPipeline(_parse_for_pipeline, dropbox_client, on_event=on_event)
+
+    try:
+        if tender is None:
+            result = await pipeline.run(inputs, compare=_compare)
+        else:
+            result = await pipeline.run(inputs, compare=_compare_registered, required_sides=("candidate",))
+    except PipelineError as e:
+        return 422, {"error": str(e)}
+    except WorkerPoolError:
+        raise
+    except asyncio.TimeoutError:
+        return 504, {"error": f"AI comparison timed out after {timeout or 0:.0f}s"}
+    except Exception as e:
+        return 500, {"error": f"AI comparison error: {str(e)}"}
+
+    duplicates = await run_io(find_overlaps, _candidate_documents({None: result.documents["candidate"]}))
+
+    return 200, {
+        **({"tender_id": tender["tender_id"]} if tender is not None else {}),
+        "requirements_files": tender["files"] if tender is not None else result.files("tender"),
+        "candidate_files": result.files("candidate"),
+        "errors": result.errors,
+        "duplicates": duplicates,
+        "analysis": result.comparison,
+    }
+
+
+def _tender_kwargs(tender: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Reģistrēta konkursa jau aprēķinātie tokeni un gabali AI dzinējam."""
+    if tender is None:
+        return {}
+    return {"tender_tokens": tender["requirements_tokens"], "tender_chunks": tender["chunks"]}
+
+
+async def _parse_for_pipeline(path: Path, content_hash: Optional[str]):
+    return await DocumentParser.extract_async(path, content_hash)
+
+
+def _candidate_documents(groups: Dict[Optional[str], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Kandidātu dokumenti near_duplicates.find_overlaps: arhīvi sadalīti pa
+    iekšējiem failiem ("arhīvs.zip/fails.pdf"), kandidāts – grupas label.
+    """
+    documents: List[Dict[str, Any]] = []
+    for label, files in groups.items():
+        for data in files:
+            for doc in DocumentParser.split_documents(data):
+                name = f"{data['filename']}/{doc['name']}" if "documents" in data else doc["name"]
+                documents.append({"candidate": label, "document": name, "text": doc["text"]})
+    return documents
+
+
+async def _collect_inputs(
+    requirements: Optional[UploadFile],
+    candidate_docs: Optional[UploadFile],
+    tender_dropbox_path: Optional[str],
+    candidate_dropbox_path: Optional[str],
+    dest_dir: Path,
+    budget: Any,
+    with_tender: bool = True,
+) -> List[PipelineInput]:
+    """
+    Saglabā augšupielādes (dest_dir/<puse>/) un sagatavo konveijera ievadus.
+    budget – Workspace vai UploadBudget (baitu limits).
+    Katrai pusei jābūt vai nu failam, vai Dropbox ceļam.
+    with_tender=False – prasības nāk no reģistra (tender_id), ievadā tikai kandidāts.
+    """
+    inputs: List[PipelineInput] = []
+
+    for side, upload, dropbox_path in (
+        ("tender", requirements, tender_dropbox_path),
+        ("candidate", candidate_docs, candidate_dropbox_path),
+    ):
+        if side == "tender" and not with_tender:
+            continue
+        if upload is not None:
+            saved = await save_upload(upload, Path(dest_dir) / side, budget)
+            inputs.append(PipelineInput(side, local_path=saved.path, content_hash=saved.sha256))
+        elif dropbox_path:
+            inputs.append(PipelineInput(side, dropbox_path=dropbox_path))
+        else:
+            raise PipelineError(f"Missing {side} file or Dropbox path")
+
+    return inputs
+
+
+@app.post("/ai-tender/compare/batch")
+async def compare_batch(
+    requirements: Optional[UploadFile] = File(None),
+    candidate_docs: List[UploadFile] = File([]),
+    tender_dropbox_path: Optional[str] = Form(None),
+    candidate_dropbox_paths: List[str] = Form([]),
+    mode: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+    tender_id: Optional[str] = Form(None),
+    workspace: Workspace = Depends(request_workspace),
+):
+    """
+    Viens konkurss pret vairākiem kandidātiem vienā pieprasījumā.
+
+    Katrs candidate_docs fails (piem. ZIP/EDOC pakete) vai candidate_dropbox_paths
+    ceļš (fails vai mape) ir viens kandidāts. Prasības tiek lejupielādētas,
+    parsētas un sadalītas tikai vienreiz; kandidāti tiek vērtēti vienlaicīgi.
+    Atbildē – "ranking" (salīdzinājuma tabula pēc final_score) un katra
+    kandidāta analīze. tender_id – reģistrēts konkurss prasību faila vietā.
+
+    "duplicates" – gandrīz vienādi dokumenti vienā vai starp kandidātiem
+    (near_duplicates.py). Kandidāts, kura iesniegums gandrīz pilnībā atkārto
+    cita iesniegumu, saņem tā analīzi bez jauna AI izsaukuma ("reused_from").
+    """
+    if mode is not None and mode not in COMPARE_MODES:
+        return JSONResponse(status_code=400, content={"error": f"Unknown mode: {mode}"})
+
+    tender = await run_io(tender_registry.require, tender_id) if tender_id else None
+
+    try:
+        inputs = await _collect_batch_inputs(
+            requirements, candidate_docs, tender_dropbox_path, candidate_dropbox_paths, workspace,
+            with_tender=tender is None,
+        )
+    except PipelineError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    status, body = await _run_batch_comparison(inputs, mode, no_cache, tender=tender)
+    if status != 200:
+        return JSONResponse(status_code=status, content=body)
+    return body
+
+
+async def _collect_batch_inputs(
+    requirements: Optional[UploadFile],
+    candidate_docs: List[UploadFile],
+    tender_dropbox_path: Optional[str],
+    candidate_dropbox_paths: List[str],
+    workspace: Workspace,
+    with_tender: bool = True,
+) -> List[PipelineInput]:
+    """
+    Prasības + N kandidāti; katram kandidātam unikāls label (faila nosaukums
+    vai Dropbox ceļš) un sava apakšmape – vienādi nosaukti faili nepārrakstās.
+    """
+    inputs: List[PipelineInput] = []
+
+    if with_tender:
+        if requirements is not None:
+            saved = await save_upload(requirements, workspace.subdir("tender"), workspace)
+            inputs.append(PipelineInput("tender", local_path=saved.path, content_hash=saved.sha256))
+        elif tender_dropbox_path:
+            inputs.append(PipelineInput("tender", dropbox_path=tender_dropbox_path))
+        else:
+            raise PipelineError("Missing tender file or Dropbox path")
+
+    labels: Dict[str, int] = {}
+
+    def unique(label: str) -> str:
+        labels[label] = labels.get(label, 0) + 1
+        return label if labels[label] == 1 else f"{label} ({labels[label]})"
+
+    for i, upload in enumerate(candidate_docs):
+        saved = await save_upload(upload, workspace.subdir(f"candidate-{i}"), workspace)
+        inputs.append(PipelineInput("candidate", local_path=saved.path, content_hash=saved.sha256,
+                                    label=unique(saved.filename)))
+    for path in candidate_dropbox_paths:
+        if path.strip():
+            inputs.append(PipelineInput("candidate", dropbox_path=path.strip(), label=unique(path.strip())))
+
+    if not any(inp.side == "candidate" for inp in inputs):
+        raise PipelineError("Missing candidate files or Dropbox paths")
+    return inputs
+
+
+async def _run_batch_comparison(
+    inputs: List[PipelineInput],
+    mode: Optional[str],
+    no_cache: bool,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    tender: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = AI_COMPARE_TIMEOUT,
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Konveijers (visi faili kopā) + ai_engine.compare_batch_async.
+    Atgriež (HTTP statuss, atbildes ķermenis); timeout – kā _run_comparison.
+    """
+    pipeline = ComparisonPipeline(_parse_for_pipeline, dropbox_client, on_event=on_event)
+
+    try:
+        result = await pipeline.run(inputs)
+        if tender is None and not result.documents["tender"]:
+            raise PipelineError("No readable tender documents")
+
+        labels = [inp.label for inp in inputs if inp.side == "candidate"]
+        texts = {label: result.group_text(label) for label in labels if result.groups.get(label)}
+        if not texts:
+            raise PipelineError("No readable candidate documents")
+
+        # Kopēti dokumenti (vienā vai starp kandidātiem) un gandrīz vienādi iesniegumi
+        duplicates, reuse = await asyncio.gather(
+            run_io(find_overlaps, _candidate_documents({label: result.groups[label] for label in texts})),
+            run_io(reusable_candidates, texts),
+        )
+
+        if on_event is not None:
+            on_event({"event": "comparing", "candidates": len(texts), "reused": len(reuse)})
+        tender_text = result.text("tender") if tender is None else tender["requirements_text"]
+        comparison = await asyncio.wait_for(
+            ai_engine.compare_batch_async(
+                tender_text, texts, mode, use_cache=not no_cache, priority=priority, on_event=on_event,
+                reuse=reuse, **_tender_kwargs(tender),
+            ),
+            timeout,
+        )
+    except PipelineError as e:
+        return 422, {"error": str(e)}
+    except WorkerPoolError:
+        raise
+    except asyncio.TimeoutError:
+        return 504, {"error": f"AI comparison timed out after {timeout or 0:.0f}s"}
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": f"AI comparison error: {str(e)}"})
+        return 500, {"error": f"AI comparison error: {str(e)}"}
+
+    # Kandidāti bez neviena nolasāma dokumenta – tabulā ar kļūdu, nevis pazūd
+    for label in labels:
+        if label not in texts:
+            comparison["ranking"].append({"candidate": label, "rank": None, "final_score": None,
+                                          "compliance": None, "missing_documents": None,
+                                          "error": "No readable candidate documents"})
+
+    return 200, {
+        **({"tender_id": tender["tender_id"]} if tender is not None else {}),
+        "requirements_files": tender["files"] if tender is not None else result.files("tender"),
+        "candidate_files": {label: result.group_files(label) for label in labels},
+        "errors": result.errors,
+        "duplicates": duplicates,
+        **comparison,
+    }
+
+
+# ======================================================
+# 5a. KONKURSU REĢISTRS — prasības sagatavotas vienreiz
+# ======================================================
+@app.post("/ai-tender/tenders")
+async def register_tender(
+    requirements: Optional[UploadFile] = File(None),
+    tender_dropbox_path: Optional[str] = Form(None),
+    title: Optional[str] = Form(None),
+    refresh: bool = Form(False),
+    no_cache: bool = Form(False),
+    workspace: Workspace = Depends(request_workspace),
+):
+    """
+    Reģistrē konkursu: parsē prasību dokumentus, izvelk numurētu prasību
+    sarakstu (kvalifikācija, iesniedzamie dokumenti, tehniskā specifikācija)
+    un saglabā to ar stabilu tender_id. Tas pats saturs -> tas pats id;
+    refresh=true – prasības izvilkt no jauna.
+
+    tender_id der /ai-tender/compare, /compare/stream, /compare/batch un /jobs.
+    """
+    if requirements is not None:
+        saved = await save_upload(requirements, workspace.path, workspace)
+        inputs = [PipelineInput("tender", local_path=saved.path, content_hash=saved.sha256)]
+    elif tender_dropbox_path:
+        inputs = [PipelineInput("tender", dropbox_path=tender_dropbox_path)]
+    else:
+        return JSONResponse(status_code=400, content={"error": "Missing tender file or Dropbox path"})
+
+    result = await ComparisonPipeline(_parse_for_pipeline, dropbox_client).run(inputs)
+
+    if not result.documents["tender"]:
+        return JSONResponse(status_code=422, content={"error": "No readable tender documents", "errors": result.errors})
+
+    text = result.text("tender")
+    tender_id = tender_id_for(text)
+    existing = None if refresh else await run_io(tender_registry.get, tender_id)
+    if existing is not None:
+        return {**tender_summary(existing), "registered": False, "errors": result.errors}
+
+    try:
+        chunks = await run_io(chunk_text, text, AI_MAP_CHUNK_TOKENS)
+        extracted = await ai_engine.extract_requirements_async(chunks, use_cache=not no_cache)
+    except WorkerPoolError:
+        raise
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"Requirement extraction error: {str(e)}"})
+
+    files = result.files("tender")
+    record = await run_io(
+        tender_registry.build_record, tender_id, title or (files[0] if files else tender_id), files, text,
+        extracted, AI_MAP_CHUNK_TOKENS,
+    )
+    await run_io(tender_registry.put, record)
+    return {**tender_summary(record), "registered": True, "errors": result.errors}
+
+
+@app.get("/ai-tender/tenders")
+async def list_tenders(page: int = Query(1, ge=1), page_size: int = Query(100, ge=1, le=1000)):
+    result = await run_io(tender_registry.query, (page - 1) * page_size, page_size)
+    return {**result, "page": page, "page_size": page_size}
+
+
+@app.get("/ai-tender/tenders/{tender_id}")
+async def get_tender(tender_id: str):
+    """
+    Reģistrēts konkurss ar numurēto prasību sarakstu.
+    """
+    record = await run_io(tender_registry.require, tender_id)
+    return {**tender_summary(record), "requirements": record["requirements"]}
 
-    return result
+
+@app.delete("/ai-tender/tenders/{tender_id}")
+async def delete_tender(tender_id: str):
+    if not await run_io(tender_registry.delete, tender_id):
+        raise TenderNotFound(f"Unknown tender: {tender_id}")
+    return {"tender_id": tender_id, "deleted": True}
+
+
+# ======================================================
+# 5b. FONA UZDEVUMI — ilgas analīzes ārpus HTTP pieprasījuma
+# ======================================================
+async def _comparison_job(payload: Dict[str, Any], on_event: Callable[[Dict[str, Any]], None]):
+    inputs = [
+        PipelineInput(
+            inp["side"],
+            local_path=Path(inp["local_path"]) if inp.get("local_path") else None,
+            content_hash=inp.get("content_hash"),
+            dropbox_path=inp.get("dropbox_path"),
+        )
+        for inp in payload["inputs"]
+    ]
+    tender = None
+    if payload.get("tender_id"):
+        # Konkurss var būt dzēsts, kamēr uzdevums gaidīja rindā
+        tender = await run_io(tender_registry.get, payload["tender_id"])
+        if tender is None:
+            return 404, {"error": f"Unknown tender: {payload['tender_id']}"}
+    return await _run_comparison(inputs, payload.get("mode"), payload.get("no_cache", False),
+                                 on_event=on_event, priority=PRIORITY_BATCH, tender=tender,
+                                 timeout=JOB_COMPARE_TIMEOUT)
+
+
+job_runner.register("compare", _comparison_job)
+
+
+@app.on_event("startup")
+async def start_job_runner():
+    job_runner.start()
+
+
+@app.post("/ai-tender/jobs", status_code=202)
+async def create_job(
+    requirements: Optional[UploadFile] = File(None),
+    candidate_docs: Optional[UploadFile] = File(None),
+    tender_dropbox_path: Optional[str] = Form(None),
+    candidate_dropbox_path: Optional[str] = Form(None),
+    mode: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+    tender_id: Optional[str] = Form(None),
+):
+    """
+    Ieliek /ai-tender/compare analīzi fona rindā un uzreiz atgriež job_id.
+    Augšupielādes tiek saglabātas uzdevuma mapē, lai to varētu atsākt pēc restarta.
+    Statuss, progress un rezultāts – GET /ai-tender/jobs/{job_id}.
+    """
+    if mode is not None and mode not in COMPARE_MODES:
+        return JSONResponse(status_code=400, content={"error": f"Unknown mode: {mode}"})
+    if tender_id:
+        await run_io(tender_registry.require, tender_id)
+
+    job_id = job_store.new_id()
+    job_dir = job_store.job_dir(job_id)
+    try:
+        inputs = await _collect_inputs(requirements, candidate_docs, tender_dropbox_path, candidate_dropbox_path,
+                                       job_dir, UploadBudget(), with_tender=not tender_id)
+    except PipelineError as e:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except BaseException:
+        # Uzdevuma ieraksta vēl nav – pusē saglabātās augšupielādes neviens cits nesakops
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+
+    payload = {
+        "inputs": [
+            {
+                "side": inp.side,
+                "local_path": str(inp.local_path) if inp.local_path else None,
+                "content_hash": inp.content_hash,
+                "dropbox_path": inp.dropbox_path,
+            }
+            for inp in inputs
+        ],
+        "mode": mode,
+        "no_cache": no_cache,
+        "tender_id": tender_id,
+    }
+    await run_io(job_runner.submit, job_id, "compare", payload)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/ai-tender/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Uzdevuma statuss (queued | running | succeeded | failed | cancelled),
+    progress un – kad pabeigts – tas pats rezultāts kā /ai-tender/compare.
+    """
+    job = await run_io(job_store.get, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    return job
+
+
+@app.delete("/ai-tender/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Atceļ uzdevumu: gaidošu – uzreiz, izpildē esošu – nākamajā heartbeat.
+    """
+    status = await run_io(job_store.cancel, job_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    return {"job_id": job_id, "status": status}
+
+
+@app.get("/debug/jobs")
+async def debug_jobs():
+    """
+    Fona uzdevumu rinda: skaits pa statusiem, vecākā gaidošā uzdevuma vecums.
+    """
+    return await run_io(job_runner.stats)
+
+
+@app.get("/debug/workspaces")
+async def debug_workspaces():
+    """
+    Pieprasījumu darba vietas: aktīvās, to apjoms, janitor novāktais.
+    """
+    return await run_io(workspace_manager.stats)
+
+
+@app.get("/debug/workers")
+async def debug_workers():
+    """
+    Darba pūlu noslodze (rindas garums, timeouti, noraidītie uzdevumi).
+    """
+    return workers.stats()
+
+
+# ======================================================
+# METRIKAS — Prometheus formātā + Server-Timing katrai atbildei
+# ======================================================
+app.middleware("http")(metrics.request_timing_middleware)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Posmu ilgumu histogrammas (parse, edoc_unpack, dropbox, openai), apstrādātie
+    baiti un PDF lapas, OpenAI tokeni, kļūdu skaits un HTTP pieprasījumu ilgums.
+    """
+    return PlainTextResponse(metrics.expose(), media_type=metrics.CONTENT_TYPE)
 
 
 # ======================================================
@@ -0,0 +1,296 @@
+# metrics.py
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from workers import run_cpu
+
+METRICS_PREFIX = "ai_iepirkumi"
+
+# Sekundes – no keša trāpījuma (ms) līdz garam OpenAI / PDF darbam (minūtes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+# (metrikas nosaukums, etiķešu vērtības, vērtība) – pickle-ējams, lai pārsūtītu no procesu pūla
+Sample = Tuple[str, LabelValues, float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def apply(self, labels: LabelValues, value: float) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in values]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # etiķetes -> [skaits katrā spainī..., summa]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def apply(self, labels: LabelValues, value: float) -> None:
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0.0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-1] += value
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            values = sorted((k, list(v)) for k, v in self._values.items())
+        lines: List[str] = []
+        for labels, row in values:
+            for bound, count in zip(self.buckets, row):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(count)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(row[-2])}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Minimāls Prometheus teksta formāta reģistrs (bez ārējas bibliotēkas).
+
+    Visi ieraksti iet caur record(): parastā režīmā tie uzreiz tiek pieskaitīti
+    metrikām un pieprasījuma laika sadalījumam; procesu pūla darbiniekā
+    (collect()) tie tiek savākti sarakstā un pieskaitīti galvenajā procesā.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric: Any) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def apply(self, sample: Sample) -> None:
+        name, labels, value = sample
+        self._metrics[name].apply(labels, value)
+        if name == STAGE_SECONDS.name:
+            timings = _request_timings.get()
+            if timings is not None:
+                key = labels[0]
+                timings[key] = timings.get(key, 0.0) + value
+
+    def expose(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    f"{METRICS_PREFIX}_stage_seconds", "Duration of a processing stage.", ("stage", "kind"),
+))
+STAGE_ERRORS = registry.register(Counter(
+    f"{METRICS_PREFIX}_stage_errors_total", "Processing stage calls that raised an error.", ("stage", "kind"),
+))
+STAGE_BYTES = registry.register(Counter(
+    f"{METRICS_PREFIX}_stage_bytes_total", "Bytes read, unpacked or downloaded by a stage.", ("stage", "kind"),
+))
+PARSED_PAGES = registry.register(Counter(
+    f"{METRICS_PREFIX}_parsed_pages_total", "PDF pages extracted.", ("kind",),
+))
+LLM_TOKENS = registry.register(Counter(
+    f"{METRICS_PREFIX}_llm_tokens_total", "OpenAI tokens reported in usage.", ("model", "type"),
+))
+HTTP_SECONDS = registry.register(Histogram(
+    f"{METRICS_PREFIX}_http_request_seconds", "HTTP request duration until the response headers.",
+    ("method", "route", "status"),
+))
+
+# Savākšanas režīms procesu pūla darbiniekā (collect) – citādi None
+_collector: contextvars.ContextVar[Optional[List[Sample]]] = contextvars.ContextVar("metrics_collector", default=None)
+# Pašreizējā HTTP pieprasījuma posmu laiki sekundēs (Server-Timing galvenei)
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "metrics_request_timings", default=None,
+)
+
+
+def record(metric: Any, labels: LabelValues, value: float) -> None:
+    sample = (metric.name, labels, value)
+    collector = _collector.get()
+    if collector is not None:
+        collector.append(sample)
+    else:
+        registry.apply(sample)
+
+
+class Span:
+    """Viena posma mērījums; bytes/pages var papildināt posma laikā."""
+
+    def __init__(self, stage: str, kind: str):
+        self.stage = stage
+        self.kind = kind
+        self.bytes = 0
+        self.pages = 0
+
+
+@contextlib.contextmanager
+def stage(name: str, kind: str = "") -> Iterator[Span]:
+    """
+    Mēra posmu: ilgums -> STAGE_SECONDS, izņēmums -> STAGE_ERRORS,
+    span.bytes / span.pages -> attiecīgie skaitītāji.
+
+        with metrics.stage("parse", "pdf") as span:
+            span.pages = len(pages)
+    """
+    span = Span(name, kind)
+    labels = (name, kind)
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        record(STAGE_ERRORS, labels, 1)
+        raise
+    finally:
+        record(STAGE_SECONDS, labels, time.perf_counter() - start)
+        if span.bytes:
+            record(STAGE_BYTES, labels, span.bytes)
+        if span.pages:
+            record(PARSED_PAGES, (kind,), span.pages)
+
+
+def record_tokens(model: str, usage: Any) -> None:
+    """OpenAI usage (prompt_tokens / completion_tokens) -> LLM_TOKENS."""
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        value = getattr(usage, f"{kind}_tokens", None)
+        if value:
+            record(LLM_TOKENS, (model, kind), value)
+
+
+# ======================================================
+# Procesu pūls
+# ======================================================
+def collect(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[bool, Any, List[Sample]]:
+    """
+    Izpilda fn darbinieka procesā un atgriež tajā ierakstītās metrikas.
+    Izņēmums tiek atgriezts (nevis izmests), lai metrikas nepazustu.
+    """
+    samples: List[Sample] = []
+    token = _collector.set(samples)
+    try:
+        return True, fn(*args, **kwargs), samples
+    except Exception as e:
+        return False, e, samples
+    finally:
+        _collector.reset(token)
+
+
+async def run_cpu_measured(fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+    """
+    run_cpu(), kura posmu metrikas (metrics.stage darbinieka procesā)
+    tiek pieskaitītas šim procesam un pieprasījuma laika sadalījumam.
+    """
+    ok, value, samples = await run_cpu(collect, fn, *args, timeout=timeout, **kwargs)
+    for sample in samples:
+        registry.apply(sample)
+    if not ok:
+        raise value
+    return value
+
+
+# ======================================================
+# HTTP pieprasījumi
+# ======================================================
+def start_request() -> contextvars.Token:
+    return _request_timings.set({})
+
+
+def finish_request(token: contextvars.Token) -> Dict[str, float]:
+    timings = _request_timings.get() or {}
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    """
+    Server-Timing galvene (ms). Vienlaicīgu izsaukumu (piem. OpenAI gabali)
+    laiki tiek summēti, tāpēc posms var pārsniegt total.
+    """
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(timings.items())]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    record(HTTP_SECONDS, (method, route, str(status)), seconds)
+
+
+async def request_timing_middleware(request: Any, call_next: Callable[[Any], Any]) -> Any:
+    """
+    HTTP middleware: pieprasījuma ilgums -> HTTP_SECONDS un posmu sadalījums
+    Server-Timing galvenē. Straumētām atbildēm galvenes tiek nosūtītas pirms
+    straumes, tāpēc tajās ir tikai līdz tam paveiktais.
+    """
+    token = start_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        timings = finish_request(token)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    observe_request(request.method, getattr(route, "path", "unmatched"), response.status_code, elapsed)
+    response.headers["Server-Timing"] = server_timing(timings, elapsed)
+    return response
+
+
+def expose() -> str:
+    return registry.expose()
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,245 @@
+# near_duplicates.py
+
+from __future__ import annotations
+
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Optional, Tuple
+
+import metrics
+
+# numpy tiek importēts pirmajā salīdzināšanā, nevis servera startā
+if TYPE_CHECKING:
+    import numpy as np
+
+    Signature = np.ndarray
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "32"))
+DEDUP_SHINGLE_WORDS = int(os.getenv("DEDUP_SHINGLE_WORDS", "5"))
+# Dokumenti ar Jaccard līdzību >= šim tiek atzīmēti kā pārklāšanās (atbildes "duplicates")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+# Kandidāta fragmenti, kas tik līdzīgi jau esošam, AI kontekstā netiek iekļauti vēlreiz
+DEDUP_PASSAGE_THRESHOLD = float(os.getenv("DEDUP_PASSAGE_THRESHOLD", "0.9"))
+# Kandidāts, kura viss iesniegums tik līdzīgs citam, saņem tā analīzi bez jauna AI izsaukuma (>1 – izslēgts)
+DEDUP_REUSE_THRESHOLD = float(os.getenv("DEDUP_REUSE_THRESHOLD", "0.95"))
+# Īsāki teksti (vārdos) netiek salīdzināti – veidlapu virsraksti un atzīmes sakristu vienmēr
+DEDUP_MIN_WORDS = int(os.getenv("DEDUP_MIN_WORDS", "40"))
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SHIFT32 = 32
+_MASK32 = 0xFFFFFFFF
+_SHINGLE_BASE = 1000003
+_MAX_CELLS = 1 << 22
+
+
+class _Permutations:
+    """
+    MinHash heša funkcijas h(x) = (a*x + b) mod 2^64 >> 32 ("multiply-shift",
+    a – nepāra): tikai reizināšana ar pārpildi un nobīde, bez dalīšanas.
+    Fiksēts seed, lai paraksti sakristu starp procesiem.
+    """
+
+    def __init__(self, num_perm: int):
+        import numpy as np
+
+        rng = np.random.RandomState(20240601)
+        self.a = rng.randint(0, 1 << 62, size=num_perm, dtype=np.int64).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.randint(0, 1 << 62, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+
+_permutations: Dict[int, _Permutations] = {}
+
+
+def shingle_hashes(text: str, words: int = DEDUP_SHINGLE_WORDS) -> np.ndarray:
+    """
+    Unikālo vārdu k-gramu heši (32 biti); tekstam ar < DEDUP_MIN_WORDS vārdiem – tukša kopa.
+    Katrs vārds tiek hešots vienreiz, k-grami – polinomiāli, vektorizēti.
+    """
+    import numpy as np
+
+    tokens = _WORD_RE.findall(text.lower())
+    if len(tokens) < max(DEDUP_MIN_WORDS, 1):
+        return np.empty(0, dtype=np.uint64)
+
+    word_hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint64, count=len(tokens))
+    span = min(words, len(tokens))
+    count = len(tokens) - span + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for j in range(span):
+        shingles = (shingles * np.uint64(_SHINGLE_BASE) + word_hashes[j:j + count]) & np.uint64(_MASK32)
+    return np.unique(shingles)
+
+
+def signature(text: str, num_perm: int = DEDUP_NUM_PERM) -> Optional[Signature]:
+    """MinHash paraksts (num_perm uint32) vai None, ja teksts par īsu salīdzināšanai."""
+    return signatures([text], num_perm)[0]
+
+
+def signatures(texts: List[str], num_perm: int = DEDUP_NUM_PERM) -> List[Optional[Signature]]:
+    """
+    Paraksti vairākiem tekstiem vienā numpy aprēķinā (piem. visi kandidāta
+    fragmenti): visu tekstu k-grami tiek hešoti kopā un minimumi ņemti pa
+    tekstu robežām ar np.minimum.reduceat – bez Python cikla pa tekstiem.
+    """
+    import numpy as np
+
+    shingle_sets = [shingle_hashes(t) for t in texts]
+    present = [i for i, h in enumerate(shingle_sets) if len(h)]
+    result: List[Optional[Signature]] = [None] * len(texts)
+    if not present:
+        return result
+
+    perm = _permutations.get(num_perm)
+    if perm is None:
+        perm = _permutations[num_perm] = _Permutations(num_perm)
+
+    flat = np.concatenate([shingle_sets[i] for i in present])
+    starts = np.cumsum([0] + [len(shingle_sets[i]) for i in present[:-1]])
+    mins = np.empty((len(present), num_perm), dtype=np.uint32)
+    # Permutācijas pa blokiem, lai starprezultāts nepārsniegtu _MAX_CELLS elementus
+    step = max(1, min(num_perm, _MAX_CELLS // len(flat)))
+    for p in range(0, num_perm, step):
+        hashed = (flat[:, None] * perm.a[p:p + step] + perm.b[p:p + step]) >> np.uint64(_SHIFT32)
+        mins[:, p:p + step] = np.minimum.reduceat(hashed, starts, axis=0)
+
+    for row, i in enumerate(present):
+        result[i] = mins[row]
+    return result
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """Jaccard līdzības novērtējums no diviem parakstiem."""
+    import numpy as np
+
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class NearDuplicateIndex:
+    """
+    LSH indekss MinHash parakstiem: paraksts tiek sadalīts DEDUP_BANDS joslās,
+    un kandidāti salīdzināšanai ir tikai tie, kam sakrīt vismaz viena josla –
+    tāpēc vaicājums nav jāsalīdzina ar visiem indeksa ierakstiem.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM,
+                 bands: int = DEDUP_BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        import numpy as np
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._band_dtype = np.dtype((np.void, self.rows * 4))
+        self._signatures: Dict[Hashable, Signature] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[Hashable]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, sig: Signature) -> List[Tuple[int, bytes]]:
+        import numpy as np
+
+        return list(enumerate(np.ascontiguousarray(sig, dtype=np.uint32).view(self._band_dtype).tolist()))
+
+    def query(self, sig: Signature) -> List[Tuple[Hashable, float]]:
+        """Ieraksti ar līdzību >= threshold, līdzīgākie pirmie."""
+        seen = set()
+        matches: List[Tuple[Hashable, float]] = []
+        for band in self._band_keys(sig):
+            for key in self._buckets.get(band, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = similarity(sig, self._signatures[key])
+                if score >= self.threshold:
+                    matches.append((key, score))
+        matches.sort(key=lambda m: -m[1])
+        return matches
+
+    def add(self, key: Hashable, sig: Signature) -> None:
+        self._signatures[key] = sig
+        for band in self._band_keys(sig):
+            self._buckets[band].append(key)
+
+
+# ======================================================
+# Lietojums salīdzināšanā
+# ======================================================
+def find_overlaps(documents: List[Dict[str, Any]], threshold: float = DEDUP_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Gandrīz vienādi dokumenti kandidātu iesniegumos (vienā vai starp kandidātiem).
+    documents: [{"candidate", "document", "text"}] iesniegšanas secībā.
+    Katram dokumentam, kas atkārto agrāku, – viens ieraksts ar līdzīgāko agrāko:
+    {"candidate", "document", "duplicate_of": {"candidate", "document"},
+     "similarity", "same_candidate"}.
+    """
+    with metrics.stage("dedup", "documents"):
+        index = NearDuplicateIndex(threshold)
+        overlaps: List[Dict[str, Any]] = []
+        sigs = signatures([doc["text"] for doc in documents])
+        for i, (doc, sig) in enumerate(zip(documents, sigs)):
+            if sig is None:
+                continue
+            matches = index.query(sig)
+            if matches:
+                j, score = matches[0]
+                original = documents[j]
+                overlaps.append({
+                    "candidate": doc["candidate"],
+                    "document": doc["document"],
+                    "duplicate_of": {"candidate": original["candidate"], "document": original["document"]},
+                    "similarity": round(score, 3),
+                    "same_candidate": original["candidate"] == doc["candidate"],
+                })
+            index.add(i, sig)
+    return overlaps
+
+
+def reusable_candidates(texts: Dict[str, str], threshold: float = DEDUP_REUSE_THRESHOLD) -> Dict[str, Dict[str, Any]]:
+    """
+    Kandidāti, kuru viss iesniegums gandrīz vienāds ar agrāka kandidāta
+    iesniegumu: {kandidāts: {"candidate": oriģināls, "similarity"}}.
+    Oriģināls vienmēr ir kandidāts, kurš pats netiek atkārtoti izmantots.
+    """
+    if threshold > 1:
+        return {}
+    with metrics.stage("dedup", "candidates"):
+        index = NearDuplicateIndex(threshold)
+        reuse: Dict[str, Dict[str, Any]] = {}
+        for name, sig in zip(texts, signatures(list(texts.values()))):
+            if sig is None:
+                continue
+            matches = index.query(sig)
+            if matches:
+                original, score = matches[0]
+                reuse[name] = {"candidate": original, "similarity": round(score, 3)}
+            else:
+                index.add(name, sig)
+    return reuse
+
+
+def dedupe_passages(passages: List[Dict[str, Any]],
+                    threshold: float = DEDUP_PASSAGE_THRESHOLD) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Izmet fragmentus (chunking.chunk_text), kas gandrīz atkārto agrāku
+    fragmentu – piem. viena un tā pati izziņa vai CV arhīvā divreiz.
+    Atgriež (atlikušie fragmenti, izmesto skaits).
+    """
+    if threshold > 1 or len(passages) < 2:
+        return passages, 0
+    index = NearDuplicateIndex(threshold)
+    kept: List[Dict[str, Any]] = []
+    sigs = signatures([p["text"] for p in passages])
+    for i, (passage, sig) in enumerate(zip(passages, sigs)):
+        if sig is not None:
+            if index.query(sig):
+                continue
+            index.add(i, sig)
+        kept.append(passage)
+    return kept, len(passages) - len(kept)
@@ -0,0 +1,149 @@
+# pdf_pages.py
+
+from __future__ import annotations
+
+import contextlib
+import os
+import signal
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeout
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from PyPDF2 import PdfReader
+
+from workers import fanout, fanout_workers
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "20"))
+
+
+class PageTimeout(Exception):
+    """Vienas lapas ekstrakcija pārsniedza laika budžetu."""
+
+
+def _timeout_text(page_no: int) -> str:
+    return f"[LAPA {page_no}: ekstrakcija pārtraukta pēc {PDF_PAGE_TIMEOUT:g}s]"
+
+
+def _error_text(page_no: int, error: BaseException) -> str:
+    return f"[LAPA {page_no}: ekstrakcijas kļūda – {error}]"
+
+
+@contextlib.contextmanager
+def _page_budget(seconds: float) -> Iterator[None]:
+    """
+    Laika budžets vienai lapai ar SIGALRM.
+    Strādā tikai procesa galvenajā pavedienā (t.i. procesu pūla darbiniekā);
+    citur budžets netiek piemērots.
+    """
+    usable = (
+        seconds > 0
+        and hasattr(signal, "SIGALRM")
+        and threading.current_thread() is threading.main_thread()
+    )
+    if not usable:
+        yield
+        return
+
+    def _raise(signum, frame):
+        raise PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, _raise)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def extract_page_range(path: str, start: int, end: int, page_timeout: float = PDF_PAGE_TIMEOUT) -> List[Tuple[int, str]]:
+    """
+    Izvelk lapas [start, end) no PDF. Izpildās procesu pūla darbiniekā,
+    tāpēc katrs uzdevums atver savu PdfReader.
+    Lapu numerācija rezultātā sākas no 1.
+    """
+    return _read_pages(PdfReader(path), start, end, page_timeout)
+
+
+def _read_pages(reader: PdfReader, start: int, end: int, page_timeout: float) -> List[Tuple[int, str]]:
+    out: List[Tuple[int, str]] = []
+    for i in range(start, min(end, len(reader.pages))):
+        try:
+            with _page_budget(page_timeout):
+                text = reader.pages[i].extract_text() or ""
+        except PageTimeout:
+            text = _timeout_text(i + 1)
+        except Exception as e:
+            text = _error_text(i + 1, e)
+        out.append((i + 1, text))
+    return out
+
+
+def extract_pages_from_stream(stream: BinaryIO) -> List[Dict[str, object]]:
+    """
+    Secīga lapu ekstrakcija no atmiņas bufera (piem., ZIP/EDOC iekšējais fails).
+    Paralelizācija šeit notiek arhīva failu līmenī, nevis lapu līmenī.
+    """
+    reader = PdfReader(stream)
+    return [{"page": n, "text": t} for n, t in _read_pages(reader, 0, len(reader.pages), PDF_PAGE_TIMEOUT)]
+
+
+def iter_pages(source: Union[Path, BinaryIO]) -> Iterator[Dict[str, object]]:
+    """
+    Lapas pa vienai, secīgi: nākamā lapa tiek izvilkta tikai tad, kad tā
+    pieprasīta (priekšskatījumi, teksta budžets – skat. formats.iter_file).
+    """
+    reader = PdfReader(source)
+    for i in range(len(reader.pages)):
+        for n, t in _read_pages(reader, i, i + 1, PDF_PAGE_TIMEOUT):
+            yield {"page": n, "text": t}
+
+
+def extract_pages(path: Path, parallel: Optional[bool] = None) -> List[Dict[str, object]]:
+    """
+    Atgriež [{"page": 1, "text": "..."}, ...] pareizā secībā.
+
+    parallel=None – paralēli tikai, ja lapu skaits >= PDF_PARALLEL_MIN_PAGES
+    (mazam PDF procesu pūla starts izmaksā vairāk nekā ietaupa) un šim
+    procesam atvēlēti fanout procesi (workers.fanout_workers).
+    Vienas lapas "iestrēgšana" vai kļūda nebloķē dokumentu: lapa tiek
+    aizvietota ar atzīmi un pārējās lapas tiek atgrieztas.
+    """
+    path = str(path)
+    reader = PdfReader(path)
+    total = len(reader.pages)
+
+    workers = fanout_workers()
+    if parallel is None:
+        parallel = total >= PDF_PARALLEL_MIN_PAGES and workers > 1
+
+    del reader
+
+    if not parallel:
+        return [{"page": n, "text": t} for n, t in extract_page_range(path, 0, total)]
+
+    ranges = [(s, min(s + PDF_PAGES_PER_TASK, total)) for s in range(0, total, PDF_PAGES_PER_TASK)]
+    # Kopējais budžets visam dokumentam: katrs process secīgi apstrādā ~1/workers lapu.
+    # Rezerves limits, ja darbiniekā SIGALRM nesuveica (piem., C kodā)
+    budget = None
+    if PDF_PAGE_TIMEOUT > 0:
+        budget = PDF_PAGE_TIMEOUT * -(-total // max(workers, 1)) + 30
+    results = fanout(extract_page_range, [(path, s, e, PDF_PAGE_TIMEOUT) for s, e in ranges], timeout=budget)
+
+    pages: Dict[int, str] = {}
+    for (s, e), result in zip(ranges, results):
+        if isinstance(result, FuturesTimeout):
+            for i in range(s, e):
+                pages[i + 1] = _timeout_text(i + 1)
+        elif isinstance(result, BaseException):
+            for i in range(s, e):
+                pages[i + 1] = _error_text(i + 1, result)
+        else:
+            for n, t in result:
+                pages[n] = t
+
+    return [{"page": n, "text": pages.get(n, "")} for n in range(1, total + 1)]
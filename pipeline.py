@@ -0,0 +1,272 @@
+# pipeline.py
+
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from document_parser import ARCHIVE_SEPARATOR
+from workers import WorkerPoolError, run_io
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+PIPELINE_DOWNLOAD_CONCURRENCY = int(os.getenv("PIPELINE_DOWNLOAD_CONCURRENCY", "6"))
+PIPELINE_PARSE_CONCURRENCY = int(os.getenv("PIPELINE_PARSE_CONCURRENCY", "4"))
+
+SIDES = ("tender", "candidate")
+
+ParseFn = Callable[[Path, Optional[str]], Awaitable[Dict[str, Any]]]
+CompareFn = Callable[[str, str], Awaitable[Any]]
+EventFn = Callable[[Dict[str, Any]], None]
+
+
+class PipelineError(Exception):
+    """Salīdzināšanas konveijera kļūda (piem., vienai pusei nav neviena dokumenta)."""
+
+
+@dataclass
+class PipelineInput:
+    """
+    Viens konveijera ievads: vai nu jau lokāls fails (augšupielāde),
+    vai Dropbox ceļš (fails vai mape). label – kandidāta nosaukums, ja
+    vienā konveijerā tiek apstrādāti vairāki kandidāti (skat. PipelineResult.groups).
+    """
+    side: str
+    local_path: Optional[Path] = None
+    content_hash: Optional[str] = None
+    dropbox_path: Optional[str] = None
+    label: Optional[str] = None
+
+
+@dataclass
+class _Item:
+    side: str
+    order: Tuple[int, int]
+    name: str
+    dropbox_path: Optional[str] = None
+    local_path: Optional[Path] = None
+    content_hash: Optional[str] = None
+    label: Optional[str] = None
+    pinned: bool = False
+
+
+@dataclass
+class PipelineResult:
+    documents: Dict[str, List[Dict[str, Any]]] = field(default_factory=lambda: {s: [] for s in SIDES})
+    errors: List[Dict[str, str]] = field(default_factory=list)
+    comparison: Any = None
+    # label -> dokumenti (tikai ievadiem ar label)
+    groups: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+
+    def text(self, side: str) -> str:
+        return ARCHIVE_SEPARATOR.join(d["text"] for d in self.documents[side])
+
+    def files(self, side: str) -> List[str]:
+        return [d["filename"] for d in self.documents[side]]
+
+    def group_text(self, label: str) -> str:
+        return ARCHIVE_SEPARATOR.join(d["text"] for d in self.groups.get(label, []))
+
+    def group_files(self, label: str) -> List[str]:
+        return [d["filename"] for d in self.groups.get(label, [])]
+
+
+class ComparisonPipeline:
+    """
+    Konveijers: atrisināšana (Dropbox mape -> faili) -> lejupielāde ->
+    atpakošana/parsēšana -> AI salīdzināšana.
+
+    Posmi ir savienoti ar asyncio rindām, tāpēc pirmais fails tiek parsēts,
+    kamēr pārējie vēl lejupielādējas, un prasību un kandidāta puse tiek
+    apstrādātas vienlaikus. AI posms sākas uzreiz, kad pēdējais dokuments
+    ir parsēts.
+    """
+
+    def __init__(
+        self,
+        parse: ParseFn,
+        dropbox_client: Any = None,
+        on_event: Optional[EventFn] = None,
+        download_concurrency: int = PIPELINE_DOWNLOAD_CONCURRENCY,
+        parse_concurrency: int = PIPELINE_PARSE_CONCURRENCY,
+    ):
+        self.parse = parse
+        self.dropbox_client = dropbox_client
+        self.on_event = on_event
+        self.download_concurrency = download_concurrency
+        self.parse_concurrency = parse_concurrency
+
+    def _emit(self, event: str, **payload: Any) -> None:
+        if self.on_event is not None:
+            self.on_event({"event": event, **payload})
+
+    def _release(self, item: Optional[_Item]) -> None:
+        if item is not None and item.pinned:
+            item.pinned = False
+            self.dropbox_client.release(item.content_hash)
+
+    def _error(self, result: PipelineResult, side: str, stage: str, file: str, error: str,
+               label: Optional[str] = None) -> None:
+        err = {"side": side, "stage": stage, "file": file, "error": error}
+        if label is not None:
+            err["candidate"] = label
+        result.errors.append(err)
+        self._emit("file_error", **err)
+
+    # =========================================================
+    # 1. Dropbox ceļu atrisināšana
+    # =========================================================
+    def _list_dropbox(self, dropbox_path: str) -> List[Tuple[str, Optional[str]]]:
+        """[(ceļš, content_hash)] – hash no saraksta, lai lejupielādei nav vajadzīgs vēl viens get_metadata."""
+        from dropbox.files import FolderMetadata
+
+        metadata = self.dropbox_client.get_metadata(dropbox_path)
+        if isinstance(metadata, FolderMetadata):
+            files = self.dropbox_client.list_tree(dropbox_path)
+            return sorted((f["path"], f.get("content_hash")) for f in files)
+        return [(metadata.path_lower, getattr(metadata, "content_hash", None))]
+
+    async def _resolve(self, index: int, inp: PipelineInput, download_q: asyncio.Queue, parse_q: asyncio.Queue,
+                       result: PipelineResult) -> None:
+        if inp.local_path is not None:
+            path = Path(inp.local_path)
+            await parse_q.put(_Item(inp.side, (index, 0), path.name, local_path=path, content_hash=inp.content_hash,
+                                    label=inp.label))
+            return
+
+        if self.dropbox_client is None:
+            self._error(result, inp.side, "resolve", inp.dropbox_path or "", "Dropbox is not configured", inp.label)
+            return
+
+        try:
+            paths = await run_io(self._list_dropbox, inp.dropbox_path)
+        except WorkerPoolError:
+            raise
+        except Exception as e:
+            self._error(result, inp.side, "resolve", inp.dropbox_path, f"Dropbox error: {e}", inp.label)
+            return
+
+        self._emit("resolved", side=inp.side, dropbox_path=inp.dropbox_path, files=len(paths))
+        for sub, (p, content_hash) in enumerate(paths):
+            await download_q.put(_Item(inp.side, (index, sub), Path(p).name, dropbox_path=p,
+                                       content_hash=content_hash, label=inp.label))
+
+    # =========================================================
+    # 2. Lejupielāde
+    # =========================================================
+    async def _downloader(self, download_q: asyncio.Queue, parse_q: asyncio.Queue, result: PipelineResult) -> None:
+        while True:
+            item = await download_q.get()
+            try:
+                if item is None:
+                    return
+                try:
+                    # Piesprausts līdz parsēšanas beigām – blob krātuve to pa vidu neizdzēsīs
+                    item.local_path = Path(await run_io(
+                        self.dropbox_client.download_file, item.dropbox_path,
+                        content_hash=item.content_hash, pin=item.content_hash is not None,
+                    ))
+                    item.pinned = item.content_hash is not None
+                except WorkerPoolError:
+                    raise
+                except Exception as e:
+                    self._error(result, item.side, "download", item.dropbox_path, str(e), item.label)
+                    continue
+                self._emit("downloaded", side=item.side, file=item.name)
+                await parse_q.put(item)
+            finally:
+                download_q.task_done()
+
+    # =========================================================
+    # 3. Atpakošana + parsēšana
+    # =========================================================
+    async def _parser(self, parse_q: asyncio.Queue, parsed: List[Tuple[_Item, Dict[str, Any]]],
+                      result: PipelineResult) -> None:
+        while True:
+            item = await parse_q.get()
+            try:
+                if item is None:
+                    return
+                try:
+                    data = await self.parse(item.local_path, item.content_hash)
+                except WorkerPoolError:
+                    # Pārslogots/iestrēdzis pūls nav faila kļūda – pārtrauc visu konveijeru (main.py -> 503/504)
+                    raise
+                except Exception as e:
+                    self._error(result, item.side, "parse", item.name, str(e), item.label)
+                    continue
+                finally:
+                    self._release(item)
+                parsed.append((item, data))
+                self._emit("parsed", side=item.side, file=item.name, type=data.get("type"),
+                           chars=len(data.get("text", "")))
+            finally:
+                parse_q.task_done()
+
+    # =========================================================
+    # 4. Viss konveijers
+    # =========================================================
+    async def run(
+        self,
+        inputs: List[PipelineInput],
+        compare: Optional[CompareFn] = None,
+        required_sides: Tuple[str, ...] = SIDES,
+    ) -> PipelineResult:
+        """
+        required_sides – pusēm, kurām jābūt vismaz vienam dokumentam pirms
+        compare (reģistrēta konkursa gadījumā – tikai "candidate").
+        """
+        result = PipelineResult()
+        parsed: List[Tuple[_Item, Dict[str, Any]]] = []
+
+        download_q: asyncio.Queue = asyncio.Queue(maxsize=self.download_concurrency * 4)
+        parse_q: asyncio.Queue = asyncio.Queue(maxsize=self.parse_concurrency * 2)
+
+        downloaders = [asyncio.create_task(self._downloader(download_q, parse_q, result))
+                       for _ in range(self.download_concurrency)]
+        parsers = [asyncio.create_task(self._parser(parse_q, parsed, result))
+                   for _ in range(self.parse_concurrency)]
+
+        async def feed() -> None:
+            await asyncio.gather(*(self._resolve(i, inp, download_q, parse_q, result) for i, inp in enumerate(inputs)))
+
+            await download_q.join()
+            for _ in downloaders:
+                await download_q.put(None)
+            await parse_q.join()
+            for _ in parsers:
+                await parse_q.put(None)
+
+        # Ja kāds posms krīt (WorkerPoolError), pārējie tiek atcelti – citādi join() gaidītu mūžīgi
+        tasks = [asyncio.create_task(feed()), *downloaders, *parsers]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Lejupielādēti, bet neizparsēti (konveijers pārtraukts)
+            while not parse_q.empty():
+                self._release(parse_q.get_nowait())
+
+        # Dokumenti – ievades secībā, nevis pabeigšanas secībā
+        for item, data in sorted(parsed, key=lambda p: p[0].order):
+            result.documents[item.side].append(data)
+            if item.label is not None:
+                result.groups.setdefault(item.label, []).append(data)
+
+        if compare is None:
+            return result
+
+        for side in required_sides:
+            if not result.documents[side]:
+                raise PipelineError(f"No readable {side} documents")
+
+        self._emit("comparing")
+        result.comparison = await compare(result.text("tender"), result.text("candidate"))
+        return result
@@ -0,0 +1,207 @@
+# rate_limiter.py
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem.
+# Limiti ir šim procesam: ja darbojas N uvicorn procesi, katram jādod 1/N no organizācijas limita.
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+
+# Prioritātes – mazāks skaitlis tiek apkalpots pirmais
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+WAIT_SAMPLES = 500
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: "asyncio.Future[None]" = field(compare=False)
+    enqueued: float = field(compare=False)
+
+
+class AdmissionScheduler:
+    """
+    Centrāls OpenAI pieprasījumu uzņemšanas plānotājs (token bucket).
+
+    • divi "spaiņi" – pieprasījumi minūtē (RPM) un tokeni minūtē (TPM),
+      kas vienmērīgi atjaunojas; pieprasījums tiek palaists tikai tad,
+      ja abos pietiek vietas tā novērtētajam tokenu skaitam
+    • gaidītāji – prioritāšu rindā (interaktīvie pirms batch, tad FIFO)
+    • pēc atbildes novērtējums tiek izlīdzināts ar faktisko usage
+    • 429 gadījumā uzņemšana tiek apturēta uz Retry-After laiku visiem
+    """
+
+    def __init__(self, rpm: int = OPENAI_RPM_LIMIT, tpm: int = OPENAI_TPM_LIMIT):
+        self.rpm = rpm
+        self.tpm = tpm
+
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+        self._heap: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.admitted = 0
+        self.cancelled = 0
+        self.throttled = 0
+        self.pauses = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    # =========================================================
+    # Uzņemšana
+    # =========================================================
+    async def acquire(self, tokens: int, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """
+        Gaida, līdz pieprasījumu ar ~tokens tokeniem drīkst sūtīt.
+        Atgriež gaidīšanas laiku sekundēs.
+        """
+        # Pieprasījums, kas lielāks par visu TPM spaini, citādi gaidītu mūžīgi
+        tokens = max(1, min(int(tokens), self.tpm))
+        loop = self._ensure_dispatcher()
+
+        waiter = _Waiter(priority, next(self._seq), tokens, loop.create_future(), time.monotonic())
+        heapq.heappush(self._heap, waiter)
+        self._wakeup.set()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Dispečers jau uzņēma un noņēma no spaiņiem, bet pieprasījums netiks sūtīts
+                self.reconcile(waiter.tokens, 0)
+                self._requests = min(float(self.rpm), self._requests + 1)
+            self.cancelled += 1
+            self._wakeup.set()
+            raise
+
+        waited = time.monotonic() - waiter.enqueued
+        if waited > 0.001:
+            self.throttled += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self._waits.append(waited)
+        return waited
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """Izlīdzina TPM spaini ar faktisko tokenu patēriņu (var būt arī "parāds")."""
+        self._refill(time.monotonic())
+        self._tokens = max(-float(self.tpm), self._tokens - (actual - estimated))
+
+    def pause(self, seconds: float) -> None:
+        """Aptur uzņemšanu (piem., pēc 429), lai visi gaidītāji neatsistos vienlaikus."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.pauses += 1
+
+    # =========================================================
+    # Dispečers
+    # =========================================================
+    def _ensure_dispatcher(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Cita event loop gaidītāji (piem., pēc asyncio.run skriptā) vairs nav derīgi
+            self._heap = []
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._dispatch())
+        return loop
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60.0)
+        self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60.0)
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            self._refill(now)
+            delay: Optional[float] = None
+
+            while self._heap:
+                head = self._heap[0]
+                if head.future.done():
+                    heapq.heappop(self._heap)
+                    continue
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                    break
+                if self._requests >= 1 and self._tokens >= head.tokens:
+                    heapq.heappop(self._heap)
+                    self._requests -= 1
+                    self._tokens -= head.tokens
+                    self.admitted += 1
+                    head.future.set_result(None)
+                    continue
+
+                # Cik ilgi jāgaida, līdz spaiņos pietiks vietas rindas pirmajam
+                need_requests = max(0.0, 1 - self._requests) * 60.0 / self.rpm
+                need_tokens = max(0.0, head.tokens - self._tokens) * 60.0 / self.tpm
+                delay = max(need_requests, need_tokens, 0.005)
+                break
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    # =========================================================
+    # Statistika
+    # =========================================================
+    def stats(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        pending = [w for w in self._heap if not w.future.done()]
+        by_priority: Dict[str, int] = {}
+        for w in pending:
+            by_priority[str(w.priority)] = by_priority.get(str(w.priority), 0) + 1
+
+        now = time.monotonic()
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+        return {
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "requests_available": round(self._requests, 2),
+            "tokens_available": int(self._tokens),
+            "queue_depth": len(pending),
+            "queue_by_priority": by_priority,
+            "oldest_wait_seconds": round(now - min(w.enqueued for w in pending), 4) if pending else 0.0,
+            "paused_for_seconds": round(max(0.0, self._paused_until - now), 4),
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "cancelled": self.cancelled,
+            "pauses": self.pauses,
+            "wait_avg_seconds": round(self.wait_total / self.admitted, 4) if self.admitted else 0.0,
+            "wait_p50_seconds": percentile(0.5),
+            "wait_p95_seconds": percentile(0.95),
+            "wait_max_seconds": round(self.wait_max, 4),
+        }
+
+
+# Viens kopīgs plānotājs visam procesam
+scheduler = AdmissionScheduler()
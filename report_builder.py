@@ -0,0 +1,48 @@
+# report_builder.py
+
+from __future__ import annotations
+
+import io
+
+import metrics
+
+# Izpildās procesu pūlā (skat. extractor.analyze_tender): modulim nav blakusefektu
+# importējot – darbiniekam nav jāielādē FastAPI lietotne vai Dropbox klients.
+
+
+def build_docx_report(
+    candidate_name: str,
+    tender_text: str,
+    candidate_text: str,
+) -> bytes:
+    """
+    Uzģenerē vienkāršu DOCX atskaiti un atgriež tās baitus.
+    """
+    with metrics.stage("report", "docx") as span:
+        data = _render_docx_report(candidate_name, tender_text, candidate_text)
+        span.bytes = len(data)
+    return data
+
+
+def _render_docx_report(candidate_name: str, tender_text: str, candidate_text: str) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    doc.add_heading(f"Tender analysis for {candidate_name}", level=1)
+
+    doc.add_heading("1. Tender document – excerpt", level=2)
+    doc.add_paragraph(tender_text[:2000] or "[no tender text extracted]")
+
+    doc.add_heading("2. Candidate documents – excerpt", level=2)
+    doc.add_paragraph(candidate_text[:2000] or "[no candidate text extracted]")
+
+    doc.add_heading("3. Short technical note", level=2)
+    doc.add_paragraph(
+        "This is a technical demo report generated by the AI Tender Analyzer backend. "
+        "In the production version this section will contain structured compliance analysis."
+    )
+
+    # Tikai atmiņā – bez pagaidu failiem diskā
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
@@ -0,0 +1,118 @@
+# report_store.py
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import quote
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+REPORT_STORE_MB = int(os.getenv("REPORT_STORE_MB", "64"))
+REPORT_TTL_SECONDS = float(os.getenv("REPORT_TTL_MINUTES", "60")) * 60
+REPORT_CHUNK_BYTES = 64 * 1024
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+@dataclass(frozen=True)
+class StoredReport:
+    data: bytes
+    filename: str
+    media_type: str
+    created_at: float
+
+
+class ReportStore:
+    """
+    Ģenerētās atskaites atmiņā pēc analīzes ID, līdz lejupielādei.
+
+    LRU, ierobežots pēc kopējā izmēra (REPORT_STORE_MB); ieraksti, kas
+    vecāki par REPORT_TTL_MINUTES, netiek atdoti. Atskaite nekad netiek
+    rakstīta diskā vai kodēta base64 – JSON atbildē ir tikai saite.
+    """
+
+    def __init__(self, max_bytes: int = REPORT_STORE_MB * 1024 * 1024, ttl: float = REPORT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._reports: "OrderedDict[str, StoredReport]" = OrderedDict()
+        self._used = 0
+
+        self.stores = 0
+        self.downloads = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, data: bytes, filename: str, media_type: str = DOCX_MEDIA_TYPE) -> str:
+        """Saglabā atskaiti un atgriež jaunu analīzes ID."""
+        report_id = uuid.uuid4().hex
+        report = StoredReport(data, filename, media_type, time.time())
+        with self._lock:
+            self._reports[report_id] = report
+            self._used += len(data)
+            self.stores += 1
+            self._evict()
+        return report_id
+
+    def get(self, report_id: str) -> Optional[StoredReport]:
+        with self._lock:
+            report = self._reports.get(report_id)
+            if report is not None and time.time() - report.created_at > self.ttl:
+                self._drop(report_id)
+                report = None
+            if report is None:
+                self.misses += 1
+                return None
+            self._reports.move_to_end(report_id)
+            self.downloads += 1
+            return report
+
+    def _drop(self, report_id: str) -> None:
+        report = self._reports.pop(report_id)
+        self._used -= len(report.data)
+
+    def _evict(self) -> None:
+        now = time.time()
+        for report_id in [k for k, r in self._reports.items() if now - r.created_at > self.ttl]:
+            self._drop(report_id)
+            self.evictions += 1
+        # Jaunākā atskaite paliek arī tad, ja viena pati pārsniedz limitu
+        while self._used > self.max_bytes and len(self._reports) > 1:
+            self._drop(next(iter(self._reports)))
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "reports": len(self._reports),
+                "bytes": self._used,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "stores": self.stores,
+                "downloads": self.downloads,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def iter_chunks(data: bytes, size: int = REPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def content_disposition(filename: str) -> str:
+    """attachment ar ASCII rezerves nosaukumu un filename* (RFC 6266) – kandidātu nosaukumi mēdz būt latviski."""
+    ascii_name = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+    ascii_name = re.sub(r'[^A-Za-z0-9._-]+', "_", ascii_name).strip("_") or "report"
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+report_store = ReportStore()
@@ -0,0 +1,204 @@
+# retrieval.py
+
+from __future__ import annotations
+
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from chunking import chunk_text
+from near_duplicates import dedupe_passages
+
+# numpy/scipy tiek importēti pirmajā indeksēšanā, nevis servera startā
+if TYPE_CHECKING:
+    import numpy as np
+    from scipy import sparse
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+RETRIEVAL_PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", "300"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Prasību vienības īsākas par šo (vārdos pēc normalizācijas) netiek lietotas kā vaicājumi
+MIN_QUERY_TERMS = 3
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_REQUIREMENT_SPLIT_RE = re.compile(r"\n+|(?<=[.;:!?])\s+")
+
+_STOPWORDS = frozenset("""
+un vai ar par uz no ir ka kas kā tā tas to tie tās šis šī šo šie šīs arī jo bet ja lai pie pēc
+līdz starp gan vēl jau tikai var tiek tika tiks būt būs bija nav nevar sava savu savā savas
+viņš viņa viņi mēs jūs es tu to tam tai tās tiem tām kur kad cik kuru kura kurš kuri kuras
+ne nē jā pret virs zem caur bez dēļ labad aiz ap gar pa pār priekš no līdz
+the and or of to in for on with by is are be as at an a this that from
+""".split())
+
+# Latviešu locījumu/darbības vārdu galotnes – garākās pirmās
+_ENDINGS = sorted(
+    """ajiem ajām ajai ajā ajos iem ām ās ai ei ij as es is us os am em im um ie
+       ā ē ī ū a e i u s š o""".split(),
+    key=len,
+    reverse=True,
+)
+MIN_STEM_LENGTH = 3
+
+
+def _fold(text: str) -> str:
+    """Noņem diakritiskās zīmes (ā→a, š→s), jo PDF teksts tās bieži zaudē."""
+    return "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c))
+
+
+def normalize_term(word: str) -> str:
+    word = word.lower()
+    if not word.isdigit():
+        for ending in _ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+                word = word[:-len(ending)]
+                break
+    return _fold(word)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Latviešu teksta normalizācija: mazie burti, bez stopvārdiem,
+    vienkāršota galotņu noņemšana un diakritisko zīmju izlīdzināšana.
+    """
+    return [
+        normalize_term(w)
+        for w in _TOKEN_RE.findall(unicodedata.normalize("NFC", text))
+        if len(w) > 1 and w.lower() not in _STOPWORDS
+    ]
+
+
+def requirement_queries(text: str) -> List[str]:
+    """Sadala prasību tekstu atsevišķās prasībās (rindas/teikumi) vaicājumiem."""
+    return [q.strip() for q in _REQUIREMENT_SPLIT_RE.split(text) if len(tokenize(q)) >= MIN_QUERY_TERMS]
+
+
+class BM25Index:
+    """
+    BM25 indekss pār fragmentiem, glabāts kā retināta matrica (scipy.sparse).
+
+    BM25 svari tiek aprēķināti vienreiz indeksēšanas laikā, tāpēc vaicājumu
+    kopas novērtēšana ir viena retināto matricu reizināšana.
+    """
+
+    def __init__(self, passages: List[str], k1: float = BM25_K1, b: float = BM25_B):
+        import numpy as np
+        from scipy import sparse
+
+        self.vocabulary: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        data: List[int] = []
+
+        for i, passage in enumerate(passages):
+            for term, count in Counter(tokenize(passage)).items():
+                rows.append(i)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                data.append(count)
+
+        n_docs = len(passages)
+        tf = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), (rows, cols)),
+            shape=(n_docs, len(self.vocabulary)),
+        )
+
+        doc_len = np.asarray(tf.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if n_docs and doc_len.mean() > 0 else 1.0
+        df = np.bincount(tf.indices, minlength=len(self.vocabulary))
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        row_of = np.repeat(np.arange(n_docs), np.diff(tf.indptr))
+        norm = k1 * (1 - b + b * doc_len[row_of] / avg_len)
+        weights = tf.copy()
+        weights.data = self.idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + norm)
+
+        # termini × fragmenti – vaicājumu matricu reizinām no kreisās puses
+        self.weights = weights.T.tocsr()
+        self.size = n_docs
+
+    def _query_matrix(self, queries: List[str]) -> sparse.csr_matrix:
+        import numpy as np
+        from scipy import sparse
+
+        rows: List[int] = []
+        cols: List[int] = []
+        for i, query in enumerate(queries):
+            for term in set(tokenize(query)):
+                j = self.vocabulary.get(term)
+                if j is not None:
+                    rows.append(i)
+                    cols.append(j)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(queries), len(self.vocabulary)),
+        )
+
+    def scores(self, queries: List[str]) -> np.ndarray:
+        """Blīva matrica vaicājumi × fragmenti ar BM25 rezultātiem."""
+        import numpy as np
+
+        if not queries or not self.size or not self.vocabulary:
+            return np.zeros((len(queries), self.size), dtype=np.float32)
+        return (self._query_matrix(queries) @ self.weights).toarray()
+
+    def search(self, queries: List[str], top_k: int = RETRIEVAL_TOP_K) -> List[List[Tuple[int, float]]]:
+        """Katram vaicājumam – top_k fragmenti [(indekss, rezultāts)], tikai ar rezultātu > 0."""
+        import numpy as np
+
+        matrix = self.scores(queries)
+        results: List[List[Tuple[int, float]]] = []
+        k = min(top_k, self.size)
+
+        for row in matrix:
+            if k <= 0:
+                results.append([])
+                continue
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top], kind="stable")]
+            results.append([(int(i), float(row[i])) for i in top if row[i] > 0])
+        return results
+
+
+class CandidateIndex:
+    """
+    Kandidāta dokumentu fragmenti + BM25 indekss. Katrai prasībai atlasa
+    top_k fragmentus un saliek tos tokenu budžetā, lai AI pieprasījumā
+    nonāktu tikai atbilstošās kandidāta iesnieguma daļas. Gandrīz vienādi
+    fragmenti (tā pati izziņa vai CV vairākos failos) tiek paturēti vienreiz.
+    """
+
+    def __init__(self, text: str, passage_tokens: int = RETRIEVAL_PASSAGE_TOKENS):
+        self.passages: List[Dict[str, Any]]
+        self.passages, self.duplicate_passages = dedupe_passages(chunk_text(text, passage_tokens, overlap_tokens=0))
+        self.index = BM25Index([p["text"] for p in self.passages])
+        self.total_tokens = sum(p["tokens"] for p in self.passages)
+
+    def context_for(self, requirements_text: str, max_tokens: int, top_k: int = RETRIEVAL_TOP_K) -> str:
+        """
+        Fragmenti, kas atbilst prasību tekstam: katrai prasībai top_k,
+        apvienoti pēc labākā rezultāta, kamēr ietilpst max_tokens;
+        izvadā – oriģinālajā dokumenta secībā.
+        """
+        if self.total_tokens <= max_tokens:
+            return "\n\n".join(p["text"] for p in self.passages)
+
+        best: Dict[int, float] = {}
+        for hits in self.index.search(requirement_queries(requirements_text), top_k):
+            for i, score in hits:
+                best[i] = max(best.get(i, 0.0), score)
+
+        selected: List[int] = []
+        used = 0
+        for i in sorted(best, key=lambda i: (-best[i], i)):
+            tokens = self.passages[i]["tokens"]
+            if used + tokens > max_tokens:
+                continue
+            selected.append(i)
+            used += tokens
+
+        return "\n\n...\n\n".join(self.passages[i]["text"] for i in sorted(selected))
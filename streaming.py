@@ -0,0 +1,71 @@
+# streaming.py
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+Emit = Callable[[Dict[str, Any]], None]
+
+_DONE = object()
+
+
+def encode_event(event: Dict[str, Any], fmt: str) -> bytes:
+    data = json.dumps(event, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {event.get('event', 'message')}\ndata: {data}\n\n".encode("utf-8")
+    return (data + "\n").encode("utf-8")
+
+
+def _heartbeat(fmt: str) -> bytes:
+    # SSE komentārs klients ignorē; NDJSON – atsevišķs "ping" notikums
+    return b": ping\n\n" if fmt == "sse" else b'{"event": "ping"}\n'
+
+
+async def event_stream(
+    run: Callable[[Emit], Awaitable[None]],
+    fmt: str = "ndjson",
+    heartbeat: float = STREAM_HEARTBEAT_SECONDS,
+) -> AsyncIterator[bytes]:
+    """
+    Palaiž run(emit) fonā un straumē visus emit() notikumus, tiklīdz tie rodas.
+
+    Klusuma brīžos tiek sūtīts heartbeat, lai starpniekserveri (Railway,
+    WordPress proxy) nepārtrauktu savienojumu. Ja klients atvienojas,
+    fona darbs tiek atcelts.
+    """
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+
+    async def runner() -> None:
+        try:
+            await run(queue.put_nowait)
+        finally:
+            queue.put_nowait(_DONE)
+
+    task = asyncio.create_task(runner())
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield _heartbeat(fmt)
+                continue
+            if event is _DONE:
+                break
+            yield encode_event(event, fmt)
+
+        # Izceļam kļūdu, ja run() pats to nav pārvērtis notikumā
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,170 @@
+# tender_registry.py
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from chunking import chunk_text, count_tokens
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+TENDER_REGISTRY_PATH = Path(os.getenv("TENDER_REGISTRY_PATH", "/tmp/ai-iepirkumi-cache/tenders.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenders (
+    id          TEXT PRIMARY KEY,
+    title       TEXT NOT NULL,
+    record      TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tenders_created ON tenders (created_at);
+"""
+
+
+class TenderRegistryError(Exception):
+    """Konkursu reģistra kļūda (piem., tukšs prasību teksts)."""
+
+
+class TenderNotFound(TenderRegistryError):
+    """Nav reģistrēta konkursa ar šādu id."""
+
+
+def tender_id_for(text: str) -> str:
+    """Stabils id – no prasību teksta satura, tāpēc tas pats konkurss saņem to pašu id."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+
+
+def format_requirements(requirements: List[Dict[str, Any]]) -> str:
+    """
+    Numurēts prasību saraksts, ko AI saņem konkursa teksta vietā.
+    Sadaļu virsraksti ir markdown "##", lai chunk_text dalītu pa sadaļām.
+    """
+    lines: List[str] = []
+    heading: Optional[str] = None
+    for r in requirements:
+        if r["heading"] != heading:
+            heading = r["heading"]
+            if lines:
+                lines.append("")
+            lines.append(f"## {heading or 'Vispārīgās prasības'}")
+        lines.append(f"{r['id']} [{r['category']}] {r['text']}")
+    return "\n".join(lines)
+
+
+class TenderRegistry:
+    """
+    Reģistrēti konkursi (SQLite).
+
+    Konkurss tiek parsēts, sadalīts sadaļās un pārvērsts numurētā prasību
+    sarakstā (R1, R2, ...) tikai vienreiz. Salīdzinājumi ar tender_id izmanto
+    saglabāto sarakstu, tā gabalus un tokenu skaitu – pilnais konkursa
+    teksts vairs netiek ne pārlasīts, ne sūtīts AI katrā salīdzinājumā.
+    """
+
+    def __init__(self, db_path: Path = TENDER_REGISTRY_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # =========================================================
+    # Reģistrēšana
+    # =========================================================
+    @staticmethod
+    def build_record(
+        tender_id: str,
+        title: str,
+        files: List[str],
+        text: str,
+        requirements: List[Dict[str, Any]],
+        chunk_tokens: int,
+    ) -> Dict[str, Any]:
+        """
+        Saliek ierakstu no izvilktajām prasībām: numurē tās, saskaita tokenus
+        un sadala prasību sarakstu map-reduce gabalos pa chunk_tokens
+        (AI_MAP_CHUNK_TOKENS). CPU darbs – izsaukt ar run_io.
+        """
+        if not requirements:
+            raise TenderRegistryError("No requirements found in tender text")
+
+        numbered = []
+        for i, r in enumerate(requirements, start=1):
+            numbered.append({"id": f"R{i}", **r, "tokens": count_tokens(r["text"])})
+
+        requirements_text = format_requirements(numbered)
+        return {
+            "tender_id": tender_id,
+            "title": title,
+            "files": files,
+            "created_at": time.time(),
+            "text_tokens": count_tokens(text),
+            "requirements": numbered,
+            "categories": dict(Counter(r["category"] for r in numbered)),
+            "requirements_text": requirements_text,
+            "requirements_tokens": count_tokens(requirements_text),
+            "chunks": chunk_text(requirements_text, chunk_tokens),
+        }
+
+    def put(self, record: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tenders (id, title, record, created_at) VALUES (?, ?, ?, ?)",
+                (record["tender_id"], record["title"], json.dumps(record, ensure_ascii=False), record["created_at"]),
+            )
+
+    # =========================================================
+    # Vaicājumi
+    # =========================================================
+    def get(self, tender_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT record FROM tenders WHERE id = ?", (tender_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def require(self, tender_id: str) -> Dict[str, Any]:
+        record = self.get(tender_id)
+        if record is None:
+            raise TenderNotFound(f"Unknown tender: {tender_id}")
+        return record
+
+    def query(self, offset: int = 0, limit: int = 100) -> Dict[str, Any]:
+        with self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM tenders").fetchone()[0]
+            rows = conn.execute(
+                "SELECT record FROM tenders ORDER BY created_at DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return {"tenders": [summary(json.loads(r[0])) for r in rows], "total": total}
+
+    def delete(self, tender_id: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM tenders WHERE id = ?", (tender_id,)).rowcount > 0
+
+
+def summary(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Ieraksts bez prasību teksta un gabaliem – sarakstiem un atbildēm."""
+    keys = ("tender_id", "title", "files", "created_at", "text_tokens", "requirements_tokens", "categories")
+    return {
+        **{key: record[key] for key in keys},
+        "requirements": len(record["requirements"]),
+        "chunks": len(record["chunks"]),
+    }
+
+
+# Viens kopīgs reģistrs visam procesam
+tender_registry = TenderRegistry()
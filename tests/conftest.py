@@ -0,0 +1,23 @@
+# conftest.py
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Moduļi konfigurāciju lasa importa brīdī – visi ceļi uz pagaidu mapi pirms jebkura importa
+_ROOT = Path(tempfile.mkdtemp(prefix="ai-iepirkumi-tests-"))
+
+os.environ.setdefault("DROPBOX_ACCESS_TOKEN", "test-token")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ["LLM_CACHE_ENABLED"] = "0"
+os.environ["LLM_CACHE_PATH"] = str(_ROOT / "llm_cache.sqlite3")
+os.environ["EXTRACTION_CACHE_DIR"] = str(_ROOT / "extraction")
+os.environ["BLOB_STORE_DIR"] = str(_ROOT / "blobs")
+os.environ["DROPBOX_INDEX_PATH"] = str(_ROOT / "dropbox_index.sqlite3")
+os.environ["JOBS_DB_PATH"] = str(_ROOT / "jobs.sqlite3")
+os.environ["JOBS_FILES_DIR"] = str(_ROOT / "jobs")
+os.environ["TENDER_REGISTRY_PATH"] = str(_ROOT / "tenders.sqlite3")
+os.environ["WORKSPACE_ROOT"] = str(_ROOT / "workspaces")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,39 @@
+# test_ai_comparison.py
+
+import asyncio
+import json
+
+import pytest
+
+from ai_comparison import AIComparisonEngine
+
+ANALYSIS = {"compliance": 80, "strengths": ["pieredze"], "weaknesses": [],
+            "missing_documents": ["izziņa"], "final_score": 75}
+
+TENDER = "\n\n".join(f"{i}. Prasība: pretendentam jāiesniedz dokuments numur {i} ar apliecinājumu." for i in range(40))
+CANDIDATE = "Pretendents iesniedz dokumentus un apliecinājumus par pieredzi. " * 20
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = AIComparisonEngine()
+    prompts = []
+
+    async def fake_chat(prompt, use_cache=True, priority=0, on_event=None, **params):
+        prompts.append(params)
+        return "```json\n" + json.dumps(ANALYSIS) + "\n```"
+
+    monkeypatch.setattr(engine, "_chat", fake_chat)
+    engine.prompts = prompts
+    return engine
+
+
+@pytest.mark.parametrize("mode", ["single", "map_reduce"])
+def test_compare_returns_analysis_dict_in_every_mode(engine, mode):
+    result = asyncio.run(engine.compare_async(TENDER, CANDIDATE, mode, use_cache=False))
+
+    assert isinstance(result, dict)
+    assert result["mode"] == mode
+    assert result["final_score"] == 75
+    assert result["missing_documents"] == ["izziņa"]
+    assert all(p.get("response_format") == {"type": "json_object"} for p in engine.prompts)
@@ -0,0 +1,64 @@
+# test_archive_members.py
+
+import io
+import zipfile
+
+import pytest
+
+import archive_members
+import formats
+import workers
+
+
+def _zip(files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def nested_zip(tmp_path):
+    inner = _zip({f"doc{i}.txt": f"Dokuments {i}".encode() for i in range(3)})
+    path = tmp_path / "outer.zip"
+    path.write_bytes(_zip({"inner.zip": inner}))
+    return path
+
+
+def _texts(result):
+    return [(d["name"], d["text"]) for d in result["documents"]]
+
+
+def test_nested_archive_uses_the_shared_fanout(nested_zip, monkeypatch):
+    monkeypatch.setattr(workers, "_role", "fanout")
+    sequential = formats.parse_file(nested_zip)
+
+    monkeypatch.setattr(workers, "_role", "main")
+    monkeypatch.setattr(workers, "PARSE_FANOUT_BUDGET", 2)
+    calls = []
+
+    def recording_fanout(fn, args, timeout=None):
+        calls.append([a[1] for a in args])
+        return workers.fanout(fn, args, timeout)
+
+    monkeypatch.setattr(archive_members, "fanout", recording_fanout)
+    try:
+        parallel = formats.parse_file(nested_zip)
+    finally:
+        workers._shutdown_fanout()
+
+    # Augšējā līmenī viens fails – sadalīts tiek ligzdotais arhīvs
+    assert calls == [["doc0.txt", "doc1.txt", "doc2.txt"]]
+    assert _texts(parallel) == _texts(sequential) == [
+        (f"inner.zip/doc{i}.txt", f"Dokuments {i}") for i in range(3)
+    ]
+
+
+def test_member_error_is_raised(tmp_path, monkeypatch):
+    monkeypatch.setattr(workers, "_role", "fanout")
+    path = tmp_path / "a.zip"
+    path.write_bytes(_zip({"a.txt": b"a", "b.txt": b"b"}))
+
+    with pytest.raises(KeyError):
+        archive_members.parse_members(path, ["a.txt", "missing.txt"], formats.parse_buffer)
@@ -0,0 +1,117 @@
+# test_blob_store.py
+
+import os
+
+import pytest
+from dropbox.files import FileMetadata
+
+import blob_store as blob_store_module
+import dropbox_client as dropbox_client_module
+from blob_store import BlobStore, DropboxContentHasher
+from dropbox_client import DropboxClient
+
+
+def _hash(data: bytes) -> str:
+    hasher = DropboxContentHasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _commit(store: BlobStore, data: bytes, mtime: float = None) -> str:
+    content_hash = _hash(data)
+    incoming = store.incoming_path(content_hash)
+    incoming.write_bytes(data)
+    store.commit(content_hash, incoming)
+    if mtime is not None:
+        os.utime(store._object_path(content_hash), (mtime, mtime))
+    return content_hash
+
+
+def test_eviction_skips_pinned_objects(tmp_path):
+    store = BlobStore(tmp_path, max_bytes=250)
+    old = _commit(store, b"a" * 100, mtime=1)
+    older = _commit(store, b"b" * 100, mtime=0)
+    store.pin(older)
+
+    new = _commit(store, b"c" * 100)
+
+    assert store.has(older) and store.has(new)
+    assert not store.has(old)
+    assert store.stats()["evictions"] == 1
+
+    store.unpin(older)
+    assert store.stats()["pinned"] == 0
+
+
+def test_missing_object_is_a_miss(tmp_path):
+    store = BlobStore(tmp_path)
+    content_hash = _commit(store, b"saturs")
+    store._object_path(content_hash).unlink()
+
+    assert store.path_for(content_hash, "fails.txt") is None
+    assert store.stats()["misses"] == 1
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+    def iter_content(self, chunk_size):
+        yield self.data
+
+    def close(self):
+        pass
+
+
+class _FakeDropbox:
+    def __init__(self, files):
+        self.files = files
+        self.metadata_calls = 0
+        self.downloads = 0
+
+    def metadata(self, path):
+        data = self.files[path]
+        return FileMetadata(name=path.lstrip("/"), path_lower=path, path_display=path, id="id:" + "a" * 20,
+                            rev="0123456789", size=len(data), content_hash=_hash(data))
+
+    def files_get_metadata(self, path):
+        self.metadata_calls += 1
+        return self.metadata(path)
+
+    def files_download(self, path, rev):
+        self.downloads += 1
+        return None, _Response(self.files[path])
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = BlobStore(tmp_path / "blobs")
+    monkeypatch.setattr(blob_store_module, "blob_store", store)
+    monkeypatch.setattr(dropbox_client_module, "blob_store", store)
+    client = DropboxClient("token")
+    client._dbx = _FakeDropbox({"/prasibas.txt": b"Prasibas"})
+    client.store = store
+    return client
+
+
+def test_listed_content_hash_skips_metadata_when_cached(client):
+    path = client.download_file("/prasibas.txt")
+    content_hash = client.dbx.metadata("/prasibas.txt").content_hash
+
+    again = client.download_file("/prasibas.txt", content_hash=content_hash, pin=True)
+
+    assert again == path
+    assert client.dbx.metadata_calls == 1
+    assert client.dbx.downloads == 1
+    assert client.store.stats()["pinned"] == 1
+    client.release(content_hash)
+    assert client.store.stats()["pinned"] == 0
+
+
+def test_download_after_finished_inflight_is_skipped(client):
+    metadata = client.dbx.metadata("/prasibas.txt")
+    client._download_once(metadata)
+    # Otrs pavediens, kas redzēja "nav lokāli" pirms pirmā commit
+    client._download_once(metadata)
+
+    assert client.dbx.downloads == 1
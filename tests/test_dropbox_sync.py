@@ -0,0 +1,86 @@
+# test_dropbox_sync.py
+
+import datetime
+from types import SimpleNamespace
+
+from dropbox.exceptions import ApiError
+from dropbox.files import DeletedMetadata, FileMetadata, ListFolderContinueError
+
+from blob_store import DropboxContentHasher
+from dropbox_sync import DropboxSyncEngine
+
+_MODIFIED = datetime.datetime(2024, 6, 1, 12, 0)
+
+
+def _file(path: str, data: bytes = b"saturs") -> FileMetadata:
+    hasher = DropboxContentHasher()
+    hasher.update(data)
+    name = path.rsplit("/", 1)[-1]
+    return FileMetadata(name=name, id="id:" + name, path_lower=path.lower(), path_display=path,
+                        rev="0123456789", size=len(data), content_hash=hasher.hexdigest(),
+                        client_modified=_MODIFIED, server_modified=_MODIFIED)
+
+
+def _page(entries, cursor: str, has_more: bool = False):
+    return SimpleNamespace(entries=entries, cursor=cursor, has_more=has_more)
+
+
+class FakeDropbox:
+    def __init__(self):
+        self.listings = []
+        self.continues = {}
+        self.calls = []
+
+    def files_list_folder(self, root, recursive=False, limit=None):
+        self.calls.append(("list", root))
+        return self.listings.pop(0)
+
+    def files_list_folder_continue(self, cursor):
+        self.calls.append(("continue", cursor))
+        page = self.continues[cursor]
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+
+def _engine(tmp_path, dbx: FakeDropbox) -> DropboxSyncEngine:
+    return DropboxSyncEngine(SimpleNamespace(dbx=dbx), db_path=tmp_path / "index.sqlite3")
+
+
+def _paths(engine: DropboxSyncEngine):
+    return [f["path"] for f in engine.query("/tenders")["files"]]
+
+
+def test_incremental_sync_continues_from_saved_cursor(tmp_path):
+    dbx = FakeDropbox()
+    dbx.listings.append(_page([_file("/Tenders/a.pdf")], "c1", has_more=True))
+    dbx.continues["c1"] = _page([_file("/Tenders/b.pdf")], "c2")
+    engine = _engine(tmp_path, dbx)
+
+    stats = engine.sync("/Tenders")
+    assert stats == {"full": True, "pages": 2, "upserts": 2, "deletes": 0}
+
+    dbx.continues["c2"] = _page([DeletedMetadata(name="a.pdf", path_lower="/tenders/a.pdf")], "c3")
+    stats = engine.sync("/Tenders")
+
+    assert stats["full"] is False and stats["deletes"] == 1
+    assert dbx.calls[-1] == ("continue", "c2")
+    assert _paths(engine) == ["/tenders/b.pdf"]
+
+
+def test_reset_cursor_triggers_full_relisting(tmp_path):
+    dbx = FakeDropbox()
+    dbx.listings.append(_page([_file("/Tenders/a.pdf"), _file("/Tenders/stale.pdf")], "c1"))
+    engine = _engine(tmp_path, dbx)
+    engine.sync("/Tenders")
+
+    dbx.continues["c1"] = ApiError("req", ListFolderContinueError.reset, None, None)
+    dbx.listings.append(_page([_file("/Tenders/a.pdf"), _file("/Tenders/new.pdf")], "fresh"))
+
+    stats = engine.sync("/Tenders")
+
+    assert stats["full"] is True
+    assert dbx.calls[-2:] == [("continue", "c1"), ("list", "/tenders")]
+    # Pilnā pārlasīšana aizvieto veco indeksu – ieraksti, kuru vairs nav, pazūd
+    assert _paths(engine) == ["/tenders/a.pdf", "/tenders/new.pdf"]
+    assert engine._get_cursor("/tenders")["cursor"] == "fresh"
@@ -0,0 +1,27 @@
+# test_extraction_cache.py
+
+from extraction_cache import ExtractionCache
+
+
+def test_memory_tier_returns_independent_copies(tmp_path):
+    cache = ExtractionCache(tmp_path, memory_bytes=1 << 20, disk_bytes=1 << 20)
+    value = {"text": "teksts", "pages": [{"page": 1, "text": "teksts"}]}
+    cache.put("k", value)
+
+    value["pages"].append({"page": 2})
+    first = cache.get("k")
+    first["pages"][0]["text"] = "mainīts"
+
+    assert cache.get("k") == {"text": "teksts", "pages": [{"page": 1, "text": "teksts"}]}
+    assert cache.stats()["memory_hits"] == 2
+
+
+def test_key_ignores_file_name_and_suffix(tmp_path):
+    cache = ExtractionCache(tmp_path)
+    a = tmp_path / "prasibas.pdf"
+    b = tmp_path / "kopija.PDF.bak"
+    a.write_bytes(b"%PDF-1.4 saturs")
+    b.write_bytes(b"%PDF-1.4 saturs")
+
+    assert cache.key_for(a, "document_parser", "1") == cache.key_for(b, "document_parser", "1")
+    assert cache.key_for(a, "document_parser", "1") != cache.key_for(a, "document_parser", "2")
@@ -0,0 +1,39 @@
+# test_formats.py
+
+import io
+import zipfile
+
+import pytest
+
+import formats
+
+
+@pytest.mark.parametrize("name, kind", [
+    ("notes.txt", "text"),
+    ("letter.rtf", "text"),
+    ("README", "text"),
+    ("data.xml", "unknown"),
+    ("table.csv", "unknown"),
+    ("page.html", "unknown"),
+    ("config.json", "unknown"),
+])
+def test_utf8_is_text_only_for_text_extensions(name, kind):
+    assert formats.sniff(io.BytesIO("Teksts ar garumzīmēm".encode("utf-8")), name) == kind
+
+
+def test_rtf_magic_wins_over_extension():
+    assert formats.sniff(io.BytesIO(b"{\\rtf1\\ansi Teksts}"), "saved-as-word.doc") == "text"
+
+
+def test_edoc_skips_meta_inf(tmp_path):
+    path = tmp_path / "container.edoc"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("mimetype", "application/vnd.etsi.asic-e+zip")
+        zf.writestr("META-INF/manifest.xml", "<manifest/>")
+        zf.writestr("META-INF/readme.txt", "metadati")
+        zf.writestr("iesniegums.txt", "Piedāvājums")
+
+    result = formats.parse_file(path)
+
+    assert result["type"] == "edoc"
+    assert [(d["name"], d["text"]) for d in result["documents"]] == [("iesniegums.txt", "Piedāvājums")]
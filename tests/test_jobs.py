@@ -0,0 +1,109 @@
+# test_jobs.py
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from jobs import JobRunner, JobStore
+from uploads import UploadBudget
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(tmp_path / "jobs.sqlite3", tmp_path / "files", max_attempts=2, lease_seconds=60)
+
+
+def _expire_lease(store, job_id):
+    with store._connect() as conn:
+        conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def test_claim_takes_oldest_queued_job_once(store):
+    store.enqueue("first", "compare", {"n": 1})
+    store.enqueue("second", "compare", {"n": 2})
+    store.enqueue("other", "report", {})
+
+    row = store.claim("w1", ["compare"])
+    assert row["id"] == "first"
+    assert row["status"] == "running"
+    assert row["attempts"] == 1
+    assert row["worker"] == "w1"
+
+    assert store.claim("w2", ["compare"])["id"] == "second"
+    assert store.claim("w3", ["compare"]) is None
+
+
+def test_expired_lease_returns_job_to_queue(store):
+    store.enqueue("job", "compare", {})
+    store.claim("dead", ["compare"])
+    _expire_lease(store, "job")
+
+    row = store.claim("alive", ["compare"])
+    assert row["id"] == "job"
+    assert row["worker"] == "alive"
+    assert row["attempts"] == 2
+    # Vecais darbinieks vairs nevar pabeigt pārņemtu uzdevumu
+    assert store.heartbeat("job", "dead", {}) is True
+
+
+def test_recover_fails_job_after_max_attempts(store):
+    store.enqueue("job", "compare", {})
+    for worker in ("w1", "w2"):
+        store.claim(worker, ["compare"])
+        _expire_lease(store, "job")
+
+    assert store.claim("w3", ["compare"]) is None
+    job = store.get("job")
+    assert job["status"] == "failed"
+    assert job["error"] == "Job exceeded the retry limit"
+
+
+def test_recover_cancels_requested_job(store):
+    store.enqueue("job", "compare", {})
+    store.claim("w1", ["compare"])
+    assert store.cancel("job") == "running"
+    _expire_lease(store, "job")
+
+    assert store.claim("w2", ["compare"]) is None
+    assert store.get("job")["status"] == "cancelled"
+
+
+def test_stop_releases_running_job(store):
+    started = asyncio.Event()
+
+    async def handler(payload, on_event):
+        started.set()
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        runner = JobRunner(store, workers=1, poll=0.01)
+        runner.register("compare", handler)
+        runner.start()
+        runner.submit("job", "compare", {})
+        await asyncio.wait_for(started.wait(), 5)
+        await runner.stop()
+
+    asyncio.run(scenario())
+    job = store.get("job")
+    assert job["status"] == "queued"
+    assert job["attempts"] == 0
+
+
+def test_rejected_job_upload_leaves_no_files(monkeypatch):
+    monkeypatch.setattr(main, "UploadBudget", lambda: UploadBudget(limit=8))
+
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/ai-tender/jobs",
+            files={
+                "requirements": ("prasibas.txt", b"Prasibas", "text/plain"),
+                "candidate_docs": ("piedavajums.txt", b"Piedavajums " * 10, "text/plain"),
+            },
+        )
+
+    assert response.status_code == 413
+    files_dir = main.job_store.files_dir
+    assert not files_dir.exists() or not any(files_dir.iterdir())
@@ -0,0 +1,62 @@
+# test_llm_cache.py
+
+import itertools
+
+import pytest
+
+import llm_cache as llm_cache_module
+from llm_cache import LLMResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1000.0}
+    ticks = itertools.count()
+    # Katrs izsaukums – nedaudz vēlāk, lai accessed_at secība būtu noteikta
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: now["t"] + next(ticks) * 0.001)
+    return now
+
+
+def _cache(tmp_path, **kwargs) -> LLMResponseCache:
+    return LLMResponseCache(db_path=tmp_path / "llm.sqlite3", enabled=True, **kwargs)
+
+
+def test_eviction_drops_least_recently_used(tmp_path, clock):
+    cache = _cache(tmp_path, max_bytes=300)
+    cache.put("a", "m", "a" * 100)
+    cache.put("b", "m", "b" * 100)
+    assert cache.get("a") == "a" * 100
+
+    cache.put("c", "m", "c" * 100)
+    cache.put("d", "m", "d" * 100)
+
+    # Virs limita – tiek dzēsti senāk izmantotie līdz 90%: "b", tad "a"
+    assert cache.get("b") is None
+    assert cache.get("a") is None
+    assert cache.get("c") == "c" * 100 and cache.get("d") == "d" * 100
+    stats = cache.stats()
+    assert stats["evictions"] == 2
+    assert stats["bytes"] == 200
+
+
+def test_expired_entries_are_evicted_first(tmp_path, clock):
+    cache = _cache(tmp_path, max_bytes=250, ttl=60)
+    cache.put("old", "m", "o" * 100)
+    clock["t"] += 120
+    cache.put("fresh", "m", "f" * 100)
+    assert cache.get("old") is None
+
+    cache.put("newer", "m", "n" * 100)
+
+    assert cache.get("fresh") == "f" * 100 and cache.get("newer") == "n" * 100
+    assert cache.stats()["evictions"] == 1
+
+
+def test_replacing_entry_keeps_size_accounting(tmp_path, clock):
+    cache = _cache(tmp_path, max_bytes=250)
+    cache.put("a", "m", "a" * 100)
+    cache.put("a", "m", "a" * 120)
+    cache.put("b", "m", "b" * 100)
+
+    assert cache.stats()["evictions"] == 0
+    assert cache.stats()["bytes"] == 220
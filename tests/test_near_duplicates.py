@@ -0,0 +1,63 @@
+# test_near_duplicates.py
+
+import random
+
+from near_duplicates import dedupe_passages, find_overlaps, reusable_candidates, signature, similarity
+
+
+def _text(seed: int, words: int = 300) -> str:
+    rng = random.Random(seed)
+    return " ".join(f"vārds{rng.randint(0, 5000)}" for _ in range(words))
+
+
+def test_signature_similarity_tracks_overlap():
+    base = _text(1)
+    assert similarity(signature(base), signature(base)) == 1.0
+    assert similarity(signature(base), signature(_text(2))) < 0.1
+    assert signature("pārāk īss teksts") is None
+
+
+def test_reusable_candidates_points_to_original():
+    original = _text(1)
+    texts = {
+        "SIA Alfa": original,
+        "SIA Beta": _text(2),
+        "SIA Gamma": original + " papildu",
+        "SIA Delta": original,
+    }
+
+    reuse = reusable_candidates(texts, threshold=0.9)
+
+    assert set(reuse) == {"SIA Gamma", "SIA Delta"}
+    # Atkārtoti izmantots kandidāts nekad nav oriģināls citam
+    assert reuse["SIA Gamma"]["candidate"] == "SIA Alfa"
+    assert reuse["SIA Delta"] == {"candidate": "SIA Alfa", "similarity": 1.0}
+
+
+def test_reusable_candidates_skips_short_and_disabled():
+    texts = {"A": "īss", "B": "īss", "C": _text(3), "D": _text(3)}
+
+    assert reusable_candidates(texts, threshold=0.9) == {"D": {"candidate": "C", "similarity": 1.0}}
+    assert reusable_candidates(texts, threshold=1.01) == {}
+
+
+def test_find_overlaps_and_dedupe_passages():
+    cv = _text(4)
+    documents = [
+        {"candidate": "A", "document": "cv.pdf", "text": cv},
+        {"candidate": "A", "document": "cv (1).pdf", "text": cv},
+        {"candidate": "B", "document": "cv.docx", "text": cv},
+        {"candidate": "B", "document": "piedāvājums.pdf", "text": _text(5)},
+    ]
+
+    overlaps = find_overlaps(documents)
+
+    assert [(o["candidate"], o["document"], o["same_candidate"]) for o in overlaps] == [
+        ("A", "cv (1).pdf", True),
+        ("B", "cv.docx", False),
+    ]
+    assert all(o["duplicate_of"] == {"candidate": "A", "document": "cv.pdf"} for o in overlaps)
+
+    kept, dropped = dedupe_passages([{"text": d["text"]} for d in documents] + [{"text": "īss"}])
+    assert dropped == 2
+    assert [p["text"] for p in kept] == [cv, _text(5), "īss"]
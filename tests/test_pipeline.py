@@ -0,0 +1,80 @@
+# test_pipeline.py
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from pipeline import ComparisonPipeline, PipelineInput
+from workers import WorkerQueueFull
+
+
+async def _queue_full(path, content_hash):
+    raise WorkerQueueFull("Worker queue is full")
+
+
+def test_worker_queue_full_is_not_a_file_error(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    inputs = [PipelineInput("tender", local_path=tmp_path / "a.txt"),
+              PipelineInput("candidate", local_path=tmp_path / "b.txt")]
+
+    with pytest.raises(WorkerQueueFull):
+        asyncio.run(asyncio.wait_for(ComparisonPipeline(_queue_full).run(inputs), 10))
+
+
+def test_compare_returns_503_when_worker_queue_full(monkeypatch):
+    monkeypatch.setattr(main, "_parse_for_pipeline", _queue_full)
+
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/ai-tender/compare",
+            files={
+                "requirements": ("prasibas.txt", b"Prasibas", "text/plain"),
+                "candidate_docs": ("piedavajums.txt", b"Piedavajums", "text/plain"),
+            },
+        )
+
+    assert response.status_code == 503
+    assert "full" in response.json()["error"]
+
+
+class _FakeDropboxClient:
+    def __init__(self, tmp_path):
+        self.tmp_path = tmp_path
+        self.downloads = []
+        self.released = []
+
+    def get_metadata(self, path):
+        from dropbox.files import FolderMetadata
+        return FolderMetadata(name="kandidats", path_lower=path, id="id:" + "a" * 20)
+
+    def list_tree(self, path):
+        return [{"path": f"{path}/{name}", "content_hash": name * 4} for name in ("b.txt", "a.txt")]
+
+    def download_file(self, dropbox_path, content_hash=None, pin=False):
+        self.downloads.append((dropbox_path, content_hash, pin))
+        local = self.tmp_path / dropbox_path.rsplit("/", 1)[-1]
+        local.write_text(dropbox_path)
+        return str(local)
+
+    def release(self, content_hash):
+        self.released.append(content_hash)
+
+
+def test_listed_content_hash_reaches_download_and_parse(tmp_path):
+    client = _FakeDropboxClient(tmp_path)
+    parsed = []
+
+    async def parse(path, content_hash):
+        parsed.append(content_hash)
+        return {"filename": path.name, "type": "text", "text": path.read_text()}
+
+    pipeline = ComparisonPipeline(parse, client)
+    result = asyncio.run(pipeline.run([PipelineInput("candidate", dropbox_path="/kandidats")]))
+
+    assert result.files("candidate") == ["a.txt", "b.txt"]
+    assert sorted(client.downloads) == [("/kandidats/a.txt", "a.txt" * 4, True),
+                                        ("/kandidats/b.txt", "b.txt" * 4, True)]
+    assert sorted(parsed) == sorted(client.released) == ["a.txt" * 4, "b.txt" * 4]
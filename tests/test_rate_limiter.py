@@ -0,0 +1,56 @@
+# test_rate_limiter.py
+
+import asyncio
+
+import pytest
+
+from rate_limiter import AdmissionScheduler
+
+
+async def _idle(scheduler: AdmissionScheduler) -> None:
+    # Dispečers apstrādā atcelšanas pamodināšanu – citādi asyncio.run to atceļ wait_for vidū
+    while scheduler._wakeup.is_set():
+        await asyncio.sleep(0)
+
+
+def test_cancel_after_admission_refunds_tokens():
+    async def scenario():
+        scheduler = AdmissionScheduler(rpm=10, tpm=1000)
+        task = asyncio.create_task(scheduler.acquire(400))
+        await asyncio.sleep(0)
+        waiter = scheduler._heap[0]
+
+        # Dispečers uzņem gaidītāju, bet klients atvienojas, pirms acquire atgriežas
+        while not waiter.future.done():
+            await asyncio.sleep(0)
+        assert not task.done()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await _idle(scheduler)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["admitted"] == 1 and stats["cancelled"] == 1
+    assert stats["tokens_available"] >= 999
+    assert stats["requests_available"] >= 9.99
+
+
+def test_cancel_while_queued_does_not_debit():
+    async def scenario():
+        scheduler = AdmissionScheduler(rpm=10, tpm=1000)
+        await scheduler.acquire(900)
+        task = asyncio.create_task(scheduler.acquire(900))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await _idle(scheduler)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["admitted"] == 1 and stats["cancelled"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["tokens_available"] < 200
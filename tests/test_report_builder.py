@@ -0,0 +1,27 @@
+# test_report_builder.py
+
+import io
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+import report_builder
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_build_docx_report_returns_docx_bytes():
+    data = report_builder.build_docx_report("SIA Kandidāts", "Prasības", "Piedāvājums")
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert "word/document.xml" in zf.namelist()
+        assert "SIA Kandidāts" in zf.read("word/document.xml").decode("utf-8")
+
+
+def test_import_has_no_app_side_effects():
+    # Tieši tā tiek importēts procesu pūla darbiniekā (spawn)
+    code = ("import sys, report_builder; "
+            "print(sorted(m for m in ('fastapi', 'extractor', 'main', 'dropbox', 'dropbox_client') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
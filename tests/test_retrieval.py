@@ -0,0 +1,29 @@
+# test_retrieval.py
+
+import subprocess
+import sys
+from pathlib import Path
+
+from retrieval import BM25Index
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_bm25_ranks_matching_passages_first():
+    index = BM25Index([
+        "kandidāta pieredze ceļu būvniecībā",
+        "sertifikāts elektroinstalācijas darbiem un pieredze",
+        "finanšu pārskats par iepriekšējo gadu",
+    ])
+
+    hits = index.search(["sertifikāts elektroinstalācijas darbiem", "nekas nesakrīt"], top_k=2)
+
+    assert [i for i, _ in hits[0]] == [1]
+    assert hits[1] == []
+
+
+def test_import_main_does_not_load_numpy_or_scipy():
+    # Servera starts un darbinieku pārstartēšana nemaksā par BM25/MinHash bibliotēkām
+    code = "import sys, main; print(sorted(m for m in ('numpy', 'scipy') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,32 @@
+# test_uploads.py
+
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import UploadFile
+
+import uploads
+from uploads import UploadTooLarge, save_upload
+
+
+def test_save_upload_writes_file_and_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 4)
+    data = b"piedavajuma saturs"
+
+    saved = asyncio.run(save_upload(UploadFile(io.BytesIO(data), filename="../kandidats.txt"), tmp_path))
+
+    assert saved.path == tmp_path / "kandidats.txt"
+    assert saved.path.read_bytes() == data
+    assert saved.sha256 == hashlib.sha256(data).hexdigest()
+    assert saved.size == len(data)
+
+
+def test_oversized_upload_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 4)
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(save_upload(UploadFile(io.BytesIO(b"x" * 20), filename="liels.pdf"), tmp_path, max_file_bytes=8))
+
+    assert not (tmp_path / "liels.pdf").exists()
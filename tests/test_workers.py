@@ -0,0 +1,85 @@
+# test_workers.py
+
+import time
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PyPDF2 import PdfWriter
+
+import pdf_pages
+import workers
+
+
+def _divide(a, b):
+    return a / b
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def fanout_budget(monkeypatch):
+    monkeypatch.setattr(workers, "PARSE_FANOUT_BUDGET", 2)
+    yield
+    workers._shutdown_fanout()
+
+
+def test_fanout_budget_is_shared_between_cpu_workers(monkeypatch):
+    monkeypatch.setattr(workers, "PARSE_FANOUT_BUDGET", 8)
+    monkeypatch.setattr(workers, "WORKER_PROCESSES", 4)
+
+    monkeypatch.setattr(workers, "_role", "cpu")
+    assert workers.fanout_workers() == 2
+    monkeypatch.setattr(workers, "_role", "fanout")
+    assert workers.fanout_workers() == 0
+    monkeypatch.setattr(workers, "_role", "main")
+    assert workers.fanout_workers() == 8
+
+
+def test_fanout_keeps_order_and_returns_errors_in_place(fanout_budget):
+    results = workers.fanout(_divide, [(1, 1), (1, 0), (4, 2)])
+
+    assert results[0] == 1.0
+    assert isinstance(results[1], ZeroDivisionError)
+    assert results[2] == 2.0
+
+
+def test_fanout_timeout_recycles_pool(fanout_budget):
+    started = time.monotonic()
+    results = workers.fanout(_sleep, [(0,), (60,)], timeout=2)
+
+    assert time.monotonic() - started < 30
+    assert results[0] == 0
+    assert isinstance(results[1], FuturesTimeout)
+    assert workers._fanout is None
+
+
+def test_fanout_runs_inline_without_budget(monkeypatch):
+    monkeypatch.setattr(workers, "_role", "fanout")
+    results = workers.fanout(_divide, [(1, 0), (2, 1)])
+
+    assert isinstance(results[0], ZeroDivisionError)
+    assert results[1] == 2.0
+    assert workers._fanout is None
+
+
+def test_extract_pages_maps_failed_ranges_to_page_markers(tmp_path, monkeypatch):
+    writer = PdfWriter()
+    for _ in range(3):
+        writer.add_blank_page(width=200, height=200)
+    path = tmp_path / "blank.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+
+    monkeypatch.setattr(pdf_pages, "PDF_PAGES_PER_TASK", 2)
+    monkeypatch.setattr(pdf_pages, "fanout",
+                        lambda fn, calls, timeout=None: [BrokenProcessPool("boom"), FuturesTimeout()])
+
+    pages = pdf_pages.extract_pages(path, parallel=True)
+
+    assert [p["page"] for p in pages] == [1, 2, 3]
+    assert "boom" in pages[0]["text"] and "boom" in pages[1]["text"]
+    assert "pārtraukta" in pages[2]["text"]
@@ -0,0 +1,109 @@
+# uploads.py
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import UploadFile
+
+from workers import run_io
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024
+MAX_UPLOAD_FILE_BYTES = int(os.getenv("MAX_UPLOAD_FILE_MB", "250")) * 1024 * 1024
+MAX_UPLOAD_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_MB", "500")) * 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Augšupielāde pārsniedz atļauto izmēru (failam vai pieprasījumam)."""
+
+
+@dataclass
+class SavedUpload:
+    path: Path
+    filename: str
+    sha256: str
+    size: int
+
+
+class UploadBudget:
+    """
+    Baitu limits vienam HTTP pieprasījumam (visiem tā failiem kopā).
+    """
+
+    def __init__(self, limit: int = MAX_UPLOAD_REQUEST_BYTES):
+        self.limit = limit
+        self.used = 0
+
+    def consume(self, n: int) -> None:
+        self.used += n
+        if self.used > self.limit:
+            raise UploadTooLarge(
+                f"Request uploads exceed the limit of {self.limit // (1024 * 1024)} MB"
+            )
+
+
+def safe_filename(name: Optional[str], default: str = "upload") -> str:
+    """
+    Atstāj tikai faila nosaukumu (bez ceļa), lai "../" nevarētu izkāpt no mapes.
+    """
+    name = Path(name or "").name
+    return name or default
+
+
+async def save_upload(
+    upload: UploadFile,
+    dest_dir: Path,
+    budget: Optional[UploadBudget] = None,
+    max_file_bytes: int = MAX_UPLOAD_FILE_BYTES,
+) -> SavedUpload:
+    """
+    Saglabā UploadFile diskā pa fiksēta izmēra gabaliem.
+    SHA-256 tiek rēķināts rakstīšanas laikā (der ekstrakcijas kešam),
+    tāpēc atmiņā vienlaikus ir tikai viens gabals neatkarīgi no faila izmēra.
+    """
+    filename = safe_filename(upload.filename)
+    dest_dir = Path(dest_dir)
+    target = dest_dir / filename
+
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        # Diska operācijas – I/O pavedienā, lai 1 MB rakstīšana nebloķētu event loop
+        await run_io(dest_dir.mkdir, parents=True, exist_ok=True)
+        f = await run_io(open, target, "wb")
+        try:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_file_bytes:
+                    raise UploadTooLarge(
+                        f"File '{filename}' exceeds the limit of {max_file_bytes // (1024 * 1024)} MB"
+                    )
+                if budget is not None:
+                    budget.consume(len(chunk))
+
+                await run_io(_write_chunk, f, digest, chunk)
+        finally:
+            await run_io(f.close)
+    except BaseException:
+        # Nepabeigtu failu neatstājam diskā
+        target.unlink(missing_ok=True)
+        raise
+    finally:
+        await upload.close()
+
+    return SavedUpload(path=target, filename=filename, sha256=digest.hexdigest(), size=size)
+
+
+def _write_chunk(f, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    f.write(chunk)
@@ -0,0 +1,297 @@
+# workers.py
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(os.cpu_count() or 2)))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "16"))
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "32"))
+WORKER_TASK_TIMEOUT = float(os.getenv("WORKER_TASK_TIMEOUT", "300"))
+WORKER_MAX_TASKS_PER_CHILD = int(os.getenv("WORKER_MAX_TASKS_PER_CHILD", "200"))
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "spawn")
+# Papildu procesi viena dokumenta sadalīšanai (PDF lapas, arhīva faili) – kopā visiem
+# cpu_pool darbiniekiem, nevis katram: katrs darbinieks saņem savu daļu no budžeta
+PARSE_FANOUT_BUDGET = int(os.getenv("PARSE_FANOUT_BUDGET", str(os.cpu_count() or 2)))
+
+
+class WorkerPoolError(Exception):
+    """Vispārēja darba pūla kļūda."""
+
+
+class WorkerQueueFull(WorkerPoolError):
+    """Rinda ir pilna – jauns uzdevums netiek pieņemts."""
+
+
+class WorkerTimeout(WorkerPoolError):
+    """Uzdevums nepaspēja izpildīties atvēlētajā laikā."""
+
+
+class BoundedPool:
+    """
+    Executor ar ierobežotu rindu un laika limitu katram uzdevumam.
+
+    Vienlaikus pieņem ne vairāk kā max_workers + queue_size uzdevumu;
+    pārējos uzreiz noraida ar WorkerQueueFull (backpressure, nevis
+    bezgalīga rinda atmiņā). Vieta rindā atbrīvojas tikai tad, kad
+    uzdevums patiešām beidzies, arī ja gaidītājs jau saņēma timeout.
+
+    propagate_context=True (pavedienu pūls) – uzdevums izpildās izsaucēja
+    contextvars kontekstā kā asyncio.to_thread (piem., pieprasījuma metrikas).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Executor],
+        max_workers: int,
+        queue_size: int,
+        default_timeout: Optional[float],
+        propagate_context: bool = False,
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.capacity = max_workers + queue_size
+        self.default_timeout = default_timeout
+        self.propagate_context = propagate_context
+
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failed = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._factory()
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        if self._in_flight >= self.capacity:
+            self.rejected += 1
+            raise WorkerQueueFull(f"{self.name} pool is full ({self.capacity} tasks in flight)")
+
+        task_name = getattr(fn, "__name__", fn)
+        if kwargs:
+            fn = functools.partial(fn, **kwargs)
+        if self.propagate_context:
+            fn = functools.partial(contextvars.copy_context().run, fn)
+
+        self._in_flight += 1
+        loop = asyncio.get_running_loop()
+        try:
+            cf_future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._in_flight -= 1
+            raise
+
+        def _on_done(_):
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                # Event loop jau slēgts (servera apturēšana)
+                pass
+
+        cf_future.add_done_callback(_on_done)
+
+        timeout = self.default_timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(cf_future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            cf_future.cancel()
+            raise WorkerTimeout(f"{self.name} task {task_name!r} exceeded {timeout}s")
+        except WorkerPoolError:
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "capacity": self.capacity,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "failed": self.failed,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _make_process_pool() -> Executor:
+    ctx = multiprocessing.get_context(WORKER_START_METHOD)
+    kwargs: Dict[str, Any] = {"max_workers": WORKER_PROCESSES, "mp_context": ctx,
+                              "initializer": _set_role, "initargs": ("cpu",)}
+    # max_tasks_per_child nav atļauts ar "fork"
+    if WORKER_MAX_TASKS_PER_CHILD > 0 and WORKER_START_METHOD != "fork":
+        kwargs["max_tasks_per_child"] = WORKER_MAX_TASKS_PER_CHILD
+    return ProcessPoolExecutor(**kwargs)
+
+
+def _make_thread_pool() -> Executor:
+    return ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="io-worker")
+
+
+# ======================================================
+# Kopīgie pūli visam procesam
+# ======================================================
+cpu_pool = BoundedPool("cpu", _make_process_pool, WORKER_PROCESSES, WORKER_QUEUE_SIZE, WORKER_TASK_TIMEOUT)
+io_pool = BoundedPool("io", _make_thread_pool, WORKER_THREADS, WORKER_QUEUE_SIZE * 4, WORKER_TASK_TIMEOUT,
+                     propagate_context=True)
+
+
+# ======================================================
+# Viena dokumenta sadalīšana (fanout)
+# ======================================================
+# "main" – API/CLI process, "cpu" – cpu_pool darbinieks, "fanout" – fanout darbinieks
+_role = "main"
+_fanout: Optional[ProcessPoolExecutor] = None
+_fanout_lock = threading.Lock()
+
+
+def _set_role(role: str) -> None:
+    global _role
+    _role = role
+
+
+def fanout_workers() -> int:
+    """
+    Cik fanout procesu drīkst izmantot šis process. cpu_pool darbinieks –
+    PARSE_FANOUT_BUDGET / WORKER_PROCESSES, lai kopā nebūtu vairāk par
+    budžetu; fanout darbinieks pats vairs nesadala (0).
+    """
+    if _role == "fanout":
+        return 0
+    if _role == "cpu":
+        return PARSE_FANOUT_BUDGET // max(WORKER_PROCESSES, 1)
+    return PARSE_FANOUT_BUDGET
+
+
+def fanout_executor() -> ProcessPoolExecutor:
+    """Šī procesa fanout pūls (fanout_workers procesi); parasti – caur fanout()."""
+    global _fanout
+    with _fanout_lock:
+        if _fanout is None:
+            _fanout = ProcessPoolExecutor(
+                max_workers=fanout_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_set_role,
+                initargs=("fanout",),
+            )
+            # Darbinieka beigās multiprocessing gaida bērnu procesus pirms atexit,
+            # tāpēc pūlu aizveram ar Finalize – pirms rindu Finalize (prioritāte 10),
+            # citādi darbinieks iestrēgst, beidzot darbu.
+            multiprocessing.util.Finalize(None, _shutdown_fanout, exitpriority=100)
+        return _fanout
+
+
+def _recycle_fanout(pool: ProcessPoolExecutor) -> None:
+    """
+    Aizstāj pūlu ar jaunu (nākamajā izsaukumā): cancel() neaptur jau
+    strādājošu uzdevumu, tāpēc iestrēgušie procesi tiek pārtraukti.
+    """
+    global _fanout
+    with _fanout_lock:
+        if _fanout is pool:
+            _fanout = None
+    for proc in list((getattr(pool, "_processes", None) or {}).values()):
+        proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _shutdown_fanout() -> None:
+    global _fanout
+    with _fanout_lock:
+        if _fanout is not None:
+            _fanout.shutdown(wait=True, cancel_futures=True)
+            _fanout = None
+
+
+def fanout(fn: Callable[..., Any], calls: Sequence[Sequence[Any]], timeout: Optional[float] = None) -> List[Any]:
+    """
+    fn(*args) katram calls elementam – paralēli fanout pūlā, ja šim procesam
+    atvēlēti vismaz 2 procesi (fanout_workers), citādi secīgi šajā procesā.
+    Kopīgs ceļš PDF lapām (pdf_pages.py) un arhīva failiem (archive_members.py).
+
+    Rezultāti – calls secībā; kļūdas gadījumā rezultāta vietā ir izņēmums
+    (arī BrokenProcessPool), bet uzdevumam, kas nepabeidzās kopējā timeout
+    laikā, – concurrent.futures.TimeoutError. fn jābūt pickle-ējamai.
+    """
+    if fanout_workers() < 2 or len(calls) < 2:
+        results: List[Any] = []
+        for args in calls:
+            try:
+                results.append(fn(*args))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    pool = fanout_executor()
+    futures = [pool.submit(fn, *args) for args in calls]
+    _, pending = wait(futures, timeout=timeout)
+
+    results = []
+    recycle = bool(pending)
+    for fut in futures:
+        if fut in pending:
+            fut.cancel()
+            results.append(FuturesTimeout(f"fanout task exceeded {timeout}s"))
+        elif fut.exception() is not None:
+            recycle = recycle or isinstance(fut.exception(), BrokenProcessPool)
+            results.append(fut.exception())
+        else:
+            results.append(fut.result())
+    if recycle:
+        _recycle_fanout(pool)
+    return results
+
+
+async def run_cpu(fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+    """
+    CPU-smagu darbu (PDF/DOCX parsēšana, DOCX ģenerēšana) izpilda procesu pūlā.
+    Funkcijai un argumentiem jābūt pickle-ējamiem (moduļa līmeņa funkcijas).
+    """
+    return await cpu_pool.run(fn, *args, timeout=timeout, **kwargs)
+
+
+async def run_io(fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+    """
+    Bloķējošu I/O (faili, Dropbox SDK, sinhronais OpenAI klients) izpilda pavedienu pūlā.
+    """
+    return await io_pool.run(fn, *args, timeout=timeout, **kwargs)
+
+
+def stats() -> Dict[str, Any]:
+    return {"cpu": cpu_pool.stats(), "io": io_pool.stats()}
+
+
+def shutdown() -> None:
+    cpu_pool.shutdown()
+    io_pool.shutdown()
+    _shutdown_fanout()
@@ -0,0 +1,238 @@
+# workspace.py
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from blob_store import blob_store
+from uploads import UploadTooLarge, safe_filename
+from workers import run_io
+
+# Konfigurācija – var pārrakstīt ar vides mainīgajiem
+WORKSPACE_ROOT = Path(os.getenv("WORKSPACE_ROOT", "/tmp/ai-iepirkumi-cache/workspaces"))
+WORKSPACE_QUOTA_MB = int(os.getenv("WORKSPACE_QUOTA_MB", "1024"))
+# Cik ilgi pamestu darba vietu (process nav nomiris) atstāj, pirms janitor to dzēš
+WORKSPACE_MAX_AGE = float(os.getenv("WORKSPACE_MAX_AGE_MINUTES", "60")) * 60
+WORKSPACE_JANITOR_INTERVAL = float(os.getenv("WORKSPACE_JANITOR_INTERVAL", "300"))
+
+_WORKSPACE_RE = re.compile(r"^ws-(\d+)-")
+
+
+class WorkspaceQuotaExceeded(UploadTooLarge):
+    """Pieprasījuma darba vieta pārsniedz atļauto baitu apjomu."""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Workspace:
+    """
+    Viena pieprasījuma (vai uzdevuma) izolēta mape ar baitu kvotu.
+
+    Der arī kā UploadBudget: save_upload(..., budget=workspace) ieskaita
+    katru ierakstīto gabalu kvotā. close() dzēš visu mapi.
+    """
+
+    def __init__(self, manager: "WorkspaceManager", path: Path, quota: int):
+        self.manager = manager
+        self.path = path
+        self.quota = quota
+        self.used = 0
+        self.closed = False
+
+    def subdir(self, name: str) -> Path:
+        """Apakšmape (piem. "tender", "candidate-3") – vienādi failu nosaukumi nesaduras."""
+        path = self.path / safe_filename(name, "files")
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def consume(self, n: int) -> None:
+        self.used += n
+        if self.used > self.quota:
+            self.manager.quota_exceeded += 1
+            raise WorkspaceQuotaExceeded(
+                f"Request workspace exceeds the limit of {self.quota // (1024 * 1024)} MB"
+            )
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.manager._release(self)
+
+
+class WorkspaceManager:
+    """
+    Izsniedz darba vietas zem WORKSPACE_ROOT un uztur fona "janitor".
+
+    Darba vietas nosaukumā ir procesa PID: janitor uzreiz dzēš mapes, kuru
+    process vairs nedarbojas, un jebkuras mapes, kas vecākas par max_age
+    un šajā procesā nav aktīvas. Tāpat tiek novākti nepabeigtu Dropbox
+    lejupielāžu (.part) faili. Janitor skar tikai lietotnes mapes
+    (WORKSPACE_ROOT, blob_store) – nekad kopīgo sistēmas /tmp.
+    """
+
+    def __init__(
+        self,
+        root: Path = WORKSPACE_ROOT,
+        quota: int = WORKSPACE_QUOTA_MB * 1024 * 1024,
+        max_age: float = WORKSPACE_MAX_AGE,
+        interval: float = WORKSPACE_JANITOR_INTERVAL,
+    ):
+        self.root = Path(root)
+        self.quota = quota
+        self.max_age = max_age
+        self.interval = interval
+
+        self._active: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.created = 0
+        self.reclaimed = 0
+        self.reclaimed_bytes = 0
+        self.quota_exceeded = 0
+
+    def create(self, quota: Optional[int] = None) -> Workspace:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = Path(tempfile.mkdtemp(prefix=f"ws-{os.getpid()}-", dir=self.root))
+        workspace = Workspace(self, path, self.quota if quota is None else quota)
+        with self._lock:
+            self._active.add(path)
+            self.created += 1
+        return workspace
+
+    def scratch_dir(self, prefix: str) -> Path:
+        """
+        Mape ārpus pieprasījuma (piem. unpack_edoc bez work_dir). Izsaucējam
+        tā jādzēš; ja tas nenotiek, janitor to novāks pēc max_age.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(prefix=f"ws-{os.getpid()}-{prefix}", dir=self.root))
+
+    def _release(self, workspace: Workspace) -> None:
+        with self._lock:
+            self._active.discard(workspace.path)
+
+    # =========================================================
+    # Janitor
+    # =========================================================
+    def sweep(self) -> int:
+        """Vienreizēja tīrīšana. Atgriež dzēsto ierakstu skaitu."""
+        now = time.time()
+        removed = 0
+
+        if self.root.is_dir():
+            with self._lock:
+                active = set(self._active)
+            for path in self.root.iterdir():
+                if path in active:
+                    continue
+                m = _WORKSPACE_RE.match(path.name)
+                orphaned = m is not None and int(m.group(1)) != os.getpid() and not _pid_alive(int(m.group(1)))
+                if orphaned or self._age(path, now) > self.max_age:
+                    removed += self._remove(path)
+
+        removed += blob_store.sweep_incoming(self.max_age)
+        return removed
+
+    @staticmethod
+    def _age(path: Path, now: float) -> float:
+        try:
+            return now - path.stat().st_mtime
+        except OSError:
+            return 0.0
+
+    def _remove(self, path: Path) -> int:
+        size = _tree_size(path)
+        try:
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except OSError:
+            return 0
+        with self._lock:
+            self.reclaimed += 1
+            self.reclaimed_bytes += size
+        return 1
+
+    def start_janitor(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._janitor_loop, name="workspace-janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _janitor_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                # Tīrīšana nedrīkst apturēt pavedienu – mēģinām nākamajā ciklā
+                pass
+            self._stop.wait(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = list(self._active)
+        return {
+            "root": str(self.root),
+            "active": len(active),
+            "active_bytes": sum(_tree_size(p) for p in active),
+            "quota_bytes": self.quota,
+            "created": self.created,
+            "reclaimed": self.reclaimed,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "quota_exceeded": self.quota_exceeded,
+            "max_age_seconds": self.max_age,
+        }
+
+
+def _tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+# Viens kopīgs pārvaldnieks visam procesam
+workspace_manager = WorkspaceManager()
+
+
+async def request_workspace() -> AsyncIterator[Workspace]:
+    """
+    FastAPI atkarība: darba vieta pieprasījumam, kas tiek dzēsta pēc
+    apstrādes – arī kļūdas gadījumā. StreamingResponse gadījumā jālieto
+    workspace_manager.create() un jāaizver straumes beigās.
+    """
+    workspace = workspace_manager.create()
+    try:
+        yield workspace
+    finally:
+        await run_io(workspace.close)